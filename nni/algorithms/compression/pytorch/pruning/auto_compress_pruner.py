@@ -90,6 +90,14 @@ class AutoCompressPruner(Pruner):
         Cool down rate of the temperature.
     perturbation_magnitude : float
         Initial perturbation magnitude to the sparsities. The magnitude decreases with current temperature.
+    num_perturbations : int
+        Number of perturbations evaluated together in each step of the simulated annealing process, by default 1.
+    num_workers : int
+        Number of processes to evaluate the perturbations of the simulated annealing process, by default 1.
+        See :class:`SimulatedAnnealingPruner`.
+    cache_decimals : int
+        The number of decimals of the sparsities to cache the evaluation results in the simulated annealing process,
+        by default `None`, i.e., every perturbation is evaluated.
     admm_num_iterations : int
         Number of iterations of ADMM Pruner.
     admm_training_epochs : int
@@ -104,6 +112,7 @@ class AutoCompressPruner(Pruner):
                  num_iterations=3, optimize_mode='maximize', base_algo='l1',
                  # SimulatedAnnealing related
                  start_temperature=100, stop_temperature=20, cool_down_rate=0.9, perturbation_magnitude=0.35,
+                 num_perturbations=1, num_workers=1, cache_decimals=None,
                  # ADMM related
                  admm_num_iterations=30, admm_training_epochs=5, row=1e-4,
                  experiment_data_dir='./'):
@@ -122,6 +131,9 @@ class AutoCompressPruner(Pruner):
         self._stop_temperature = stop_temperature
         self._cool_down_rate = cool_down_rate
         self._perturbation_magnitude = perturbation_magnitude
+        self._num_perturbations = num_perturbations
+        self._num_workers = num_workers
+        self._cache_decimals = cache_decimals
 
         # hyper parameters for ADMM algorithm
         self._admm_num_iterations = admm_num_iterations
@@ -195,7 +207,10 @@ class AutoCompressPruner(Pruner):
                 stop_temperature=self._stop_temperature,
                 cool_down_rate=self._cool_down_rate,
                 perturbation_magnitude=self._perturbation_magnitude,
-                experiment_data_dir=self._experiment_data_dir)
+                experiment_data_dir=self._experiment_data_dir,
+                num_perturbations=self._num_perturbations,
+                num_workers=self._num_workers,
+                cache_decimals=self._cache_decimals)
             config_list = SApruner.compress(return_config_list=True)
             _logger.info("Generated config_list : %s", config_list)
 
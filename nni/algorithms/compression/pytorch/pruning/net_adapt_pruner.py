@@ -2,9 +2,12 @@
 # Licensed under the MIT license.
 
 import logging
+import multiprocessing
 import os
 import copy
 import json
+import random
+import numpy as np
 import torch
 from schema import And, Optional
 
@@ -18,6 +21,67 @@ from .constants_pruner import PRUNER_DICT
 
 _logger = logging.getLogger(__name__)
 
+# the model to prune, the base pruning algorithm, the fine tuner and the evaluator inherited by the forked worker processes
+_worker_context = None
+
+
+def _init_worker(model, base_algo, short_term_fine_tuner, evaluator, num_threads):
+    global _worker_context
+    torch.set_num_threads(num_threads)
+    _worker_context = (model, base_algo, short_term_fine_tuner, evaluator)
+
+
+def _evaluate_in_worker(task):
+    return _evaluate_candidate(*_worker_context, *task)
+
+
+def _evaluate_in_process(*args):
+    """
+    Evaluate a candidate like :func:`_evaluate_candidate`, with the random states of the caller restored afterwards.
+    """
+    python_state, numpy_state = random.getstate(), np.random.get_state()
+    try:
+        with torch.random.fork_rng():
+            return _evaluate_candidate(*args)
+    finally:
+        random.setstate(python_state)
+        np.random.set_state(numpy_state)
+
+
+def _evaluate_candidate(model, base_algo, short_term_fine_tuner, evaluator, op_name, config_list, seed):
+    '''
+    Prune a copy of the model with the config_list, fine tune and evaluate it with the random states seeded.
+
+    Returns
+    -------
+    tuple
+        the performance, the masks of op_name, and the state_dict of the masked weights as exported by the pruner
+    '''
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    pruner = PRUNER_DICT[base_algo](copy.deepcopy(model), config_list)
+    model_masked = pruner.compress()
+
+    # Short-term fine tune the pruned model
+    short_term_fine_tuner(model_masked)
+
+    performance = evaluator(model_masked)
+    # find weight mask of this layer
+    for w in pruner.get_modules_wrapper():
+        if w.name == op_name:
+            masks = {'weight_mask': w.weight_mask,
+                     'bias_mask': w.bias_mask}
+            break
+    # the weights are kept in memory rather than exported to a file, only the ones of the best layer are used
+    pruner._unwrap_model()
+    for w in pruner.get_modules_wrapper():
+        if w.weight_mask is not None:
+            w.module.weight.data = w.module.weight.data.mul(w.weight_mask)
+        if w.bias_mask is not None:
+            w.module.bias.data = w.module.bias.data.mul(w.bias_mask)
+    return performance, masks, pruner.bound_model.state_dict()
+
 
 class NetAdaptPruner(Pruner):
     """
@@ -80,10 +144,18 @@ class NetAdaptPruner(Pruner):
     experiment_data_dir : str
         PATH to save experiment data,
         including the config_list generated for the base pruning algorithm and the performance of the pruned model.
+    num_workers : int
+        Number of processes to prune, fine tune and evaluate the layers in each iteration, by default 1.
+        With more than one worker, the layers are dispatched to a pool of forked processes, which read the weights
+        of the model to prune from shared memory. The fine tuner and the evaluator are inherited by the processes
+        instead of being pickled, and CUDA can not be used in them, so this option is for the models on CPU.
+        The random states are seeded for each layer, so that the result does not depend on the number of workers,
+        and the random states of the caller are restored after each layer.
     """
 
     def __init__(self, model, config_list, short_term_fine_tuner, evaluator,
-                 optimize_mode='maximize', base_algo='l1', sparsity_per_iteration=0.05, experiment_data_dir='./'):
+                 optimize_mode='maximize', base_algo='l1', sparsity_per_iteration=0.05, experiment_data_dir='./',
+                 num_workers=1):
         # models used for iterative pruning and evaluation
         self._model_to_prune = copy.deepcopy(model)
         self._base_algo = base_algo
@@ -107,7 +179,7 @@ class NetAdaptPruner(Pruner):
         if not os.path.exists(self._experiment_data_dir):
             os.makedirs(self._experiment_data_dir)
 
-        self._tmp_model_path = os.path.join(self._experiment_data_dir, 'tmp_model.pth')
+        self._num_workers = num_workers
 
     def validate_config(self, model, config_list):
         """
@@ -239,6 +311,42 @@ class NetAdaptPruner(Pruner):
         """
         _logger.info('Starting NetAdapt Compression...')
 
+        # the layers are seeded from the random state at the beginning, which is not affected by the layers
+        base_seed = random.randrange(1 << 31)
+        pool = None
+        if self._num_workers > 1:
+            # the weights updated after each iteration are shared with the workers
+            self._model_to_prune.share_memory()
+            num_threads = max(1, torch.get_num_threads() // self._num_workers)
+            pool = multiprocessing.get_context('fork').Pool(
+                self._num_workers, _init_worker,
+                (self._model_to_prune, self._base_algo, self._short_term_fine_tuner, self._evaluator, num_threads))
+        try:
+            self._search(base_seed, pool)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        # load weights parameters
+        self.load_model_state_dict(self._model_to_prune.state_dict())
+
+        _logger.info('----------Compression finished--------------')
+        _logger.info('config_list generated: %s', self._config_list_generated)
+        _logger.info("Performance after pruning: %s", self._final_performance)
+        _logger.info("Masked sparsity: %.6f", self._final_sparsity)
+
+        # save best config found and best performance
+        with open(os.path.join(self._experiment_data_dir, 'search_result.json'), 'w') as jsonfile:
+            json.dump({
+                'performance': self._final_performance,
+                'config_list': json.dumps(self._config_list_generated)
+            }, jsonfile)
+
+        _logger.info('search history and result saved to foler : %s', self._experiment_data_dir)
+
+        return self.bound_model
+
+    def _search(self, base_seed, pool):
         pruning_iteration = 0
         current_sparsity = 0
         delta_num_weights_per_iteration = \
@@ -254,7 +362,8 @@ class NetAdaptPruner(Pruner):
             # variable to store the info of the best layer found in this iteration
             best_op = {}
 
-            for wrapper in self.get_modules_wrapper():
+            tasks = []
+            for idx, wrapper in enumerate(self.get_modules_wrapper()):
                 _logger.debug("op name : %s", wrapper.name)
                 _logger.debug("op weights : %d", wrapper.weight_mask.numel())
                 _logger.debug("op left weights : %d", wrapper.weight_mask.sum().item())
@@ -271,36 +380,30 @@ class NetAdaptPruner(Pruner):
 
                 config_list = self._update_config_list(self._config_list_generated, wrapper.name, target_op_sparsity)
                 _logger.debug("config_list used : %s", config_list)
-
-                pruner = PRUNER_DICT[self._base_algo](copy.deepcopy(self._model_to_prune), config_list)
-                model_masked = pruner.compress()
-
-                # Short-term fine tune the pruned model
-                self._short_term_fine_tuner(model_masked)
-
-                performance = self._evaluator(model_masked)
-                _logger.info("Layer : %s, evaluation result after short-term fine tuning : %s", wrapper.name, performance)
+                seed = (base_seed + pruning_iteration * 1000003 + idx) % (1 << 31)
+                tasks.append((wrapper.name, target_op_sparsity, (wrapper.name, config_list, seed)))
+
+            if pool is not None:
+                results = pool.imap(_evaluate_in_worker, [task for _, _, task in tasks])
+            else:
+                results = (_evaluate_in_process(self._model_to_prune, self._base_algo, self._short_term_fine_tuner,
+                                                self._evaluator, *task) for _, _, task in tasks)
+            # the layers are compared in order, so that the best layer does not depend on the number of workers
+            for (op_name, target_op_sparsity, _), (performance, masks, state_dict) in zip(tasks, results):
+                _logger.info("Layer : %s, evaluation result after short-term fine tuning : %s", op_name, performance)
 
                 if not best_op \
                     or (self._optimize_mode is OptimizeMode.Maximize and performance > best_op['performance']) \
                     or (self._optimize_mode is OptimizeMode.Minimize and performance < best_op['performance']):
-                    _logger.debug("updating best layer to %s...", wrapper.name)
-                    # find weight mask of this layer
-                    for w in pruner.get_modules_wrapper():
-                        if w.name == wrapper.name:
-                            masks = {'weight_mask': w.weight_mask,
-                                     'bias_mask': w.bias_mask}
-                            break
+                    _logger.debug("updating best layer to %s...", op_name)
                     best_op = {
-                        'op_name': wrapper.name,
+                        'op_name': op_name,
                         'sparsity': target_op_sparsity,
                         'performance': performance,
-                        'masks': masks
+                        'masks': masks,
+                        'state_dict': state_dict
                     }
 
-                    # save model weights
-                    pruner.export_model(self._tmp_model_path)
-
             if not best_op:
                 # decrease pruning step
                 self._sparsity_per_iteration *= 0.5
@@ -313,7 +416,7 @@ class NetAdaptPruner(Pruner):
                 self._config_list_generated, best_op['op_name'], best_op['sparsity'])
 
             # update weights parameters
-            self._model_to_prune.load_state_dict(torch.load(self._tmp_model_path))
+            self._model_to_prune.load_state_dict(best_op['state_dict'])
 
             # update mask of the chosen op
             for wrapper in self.get_modules_wrapper():
@@ -329,23 +432,4 @@ class NetAdaptPruner(Pruner):
             pruning_iteration += 1
 
             self._final_performance = best_op['performance']
-
-        # load weights parameters
-        self.load_model_state_dict(torch.load(self._tmp_model_path))
-        os.remove(self._tmp_model_path)
-
-        _logger.info('----------Compression finished--------------')
-        _logger.info('config_list generated: %s', self._config_list_generated)
-        _logger.info("Performance after pruning: %s", self._final_performance)
-        _logger.info("Masked sparsity: %.6f", current_sparsity)
-
-        # save best config found and best performance
-        with open(os.path.join(self._experiment_data_dir, 'search_result.json'), 'w') as jsonfile:
-            json.dump({
-                'performance': self._final_performance,
-                'config_list': json.dumps(self._config_list_generated)
-            }, jsonfile)
-
-        _logger.info('search history and result saved to foler : %s', self._experiment_data_dir)
-
-        return self.bound_model
+        self._final_sparsity = current_sparsity
@@ -3,7 +3,7 @@
 
 import logging
 from schema import And, Optional, SchemaError
-from nni.common.graph_utils import TorchModuleGraph
+from nni.common.graph_utils import get_module_graph
 from nni.compression.pytorch.utils.shape_dependency import ChannelDependency, GroupDependency
 from .constants import MASKER_DICT
 from nni.compression.pytorch.utils.config_validation import CompressorSchema
@@ -164,7 +164,7 @@ class _StructuredFilterPruner(OneshotPruner):
             # Get the TorchModuleGraph of the target model
             # to trace the model, we need to unwrap the wrappers
             self._unwrap_model()
-            self.graph = TorchModuleGraph(model, dummy_input)
+            self.graph = get_module_graph(model, dummy_input)
             self._wrap_model()
             self.channel_depen = ChannelDependency(
                 traced_model=self.graph.trace)
@@ -2,12 +2,15 @@
 # Licensed under the MIT license.
 
 import logging
+import multiprocessing
 import os
 import math
 import copy
 import csv
 import json
+import time
 import numpy as np
+import torch
 from schema import And, Optional
 
 from nni.utils import OptimizeMode
@@ -19,6 +22,21 @@ from .constants_pruner import PRUNER_DICT
 
 _logger = logging.getLogger(__name__)
 
+# the model, the base pruning algorithm and the evaluator inherited by the forked worker processes
+_worker_context = None
+
+
+def _init_worker(model, base_algo, evaluator, num_threads):
+    global _worker_context
+    torch.set_num_threads(num_threads)
+    _worker_context = (model, base_algo, evaluator)
+
+
+def _evaluate_in_worker(config_list):
+    model, base_algo, evaluator = _worker_context
+    pruner = PRUNER_DICT[base_algo](copy.deepcopy(model), config_list)
+    return evaluator(pruner.compress())
+
 
 class SimulatedAnnealingPruner(Pruner):
     """
@@ -67,11 +85,25 @@ class SimulatedAnnealingPruner(Pruner):
     experiment_data_dir : string
         PATH to save experiment data,
         including the config_list generated for the base pruning algorithm, the performance of the pruned model and the pruning history.
-
+    num_perturbations : int
+        Number of perturbations generated and evaluated together in each step, by default 1.
+        They are accepted or rejected in order, and the ones after the accepted perturbation are discarded.
+        All of them are generated before the random draws of acceptance, so the random sequence differs
+        from the one of generating them one by one.
+    num_workers : int
+        Number of processes to evaluate the perturbations, by default 1. With more than one worker, the perturbations
+        are evaluated in a pool of forked processes, each of which prunes its own replicas of the model.
+        The evaluator is inherited by the processes instead of being pickled, and CUDA can not be used in them,
+        so this option is for the models on CPU.
+    cache_decimals : int
+        The sparsities are rounded to this number of decimals as the key of the cache of the evaluation results,
+        so that the configurations visited again are not evaluated again. By default `None`, i.e., the cache is
+        disabled and every perturbation is evaluated, which is expected with a stochastic evaluator.
     """
 
     def __init__(self, model, config_list, evaluator, optimize_mode='maximize', base_algo='l1',
-                 start_temperature=100, stop_temperature=20, cool_down_rate=0.9, perturbation_magnitude=0.35, experiment_data_dir='./'):
+                 start_temperature=100, stop_temperature=20, cool_down_rate=0.9, perturbation_magnitude=0.35, experiment_data_dir='./',
+                 num_perturbations=1, num_workers=1, cache_decimals=None):
         # original model
         self._model_to_prune = copy.deepcopy(model)
         self._base_algo = base_algo
@@ -100,6 +132,14 @@ class SimulatedAnnealingPruner(Pruner):
 
         self._search_history = []
 
+        self._num_perturbations = num_perturbations
+        self._num_workers = num_workers
+        self._pool = None
+        # rounded sparsities -> evaluation result
+        self._cache_decimals = cache_decimals
+        self._evaluation_cache = {}
+        self._iteration_timings = []
+
         self._experiment_data_dir = experiment_data_dir
         if not os.path.exists(self._experiment_data_dir):
             os.makedirs(self._experiment_data_dir)
@@ -248,6 +288,50 @@ class SimulatedAnnealingPruner(Pruner):
                 _logger.info("Sparsities perturbated:%s", sparsities)
                 return sparsities
 
+    def _evaluate_perturbations(self, candidates):
+        '''
+        Evaluate the perturbated sparsities, which are looked up in the cache first,
+        and evaluated in the pool of processes if there are more than one to evaluate.
+
+        Parameters
+        ----------
+        candidates : list
+            list of tuples of the perturbated sparsities and their config_list
+
+        Returns
+        -------
+        list, int
+            the evaluation results, and the number of evaluations
+        '''
+        results = [None] * len(candidates)
+        # key -> indices of the candidates to evaluate
+        pending = {}
+        for idx, (sparsities, _) in enumerate(candidates):
+            if self._cache_decimals is None:
+                pending[idx] = [idx]
+                continue
+            key = tuple(np.round(np.sort(sparsities), self._cache_decimals))
+            if key in self._evaluation_cache:
+                results[idx] = self._evaluation_cache[key]
+            else:
+                pending.setdefault(key, []).append(idx)
+
+        config_lists = [candidates[indices[0]][1] for indices in pending.values()]
+        if self._pool is not None and len(config_lists) > 1:
+            evaluated = self._pool.map(_evaluate_in_worker, config_lists)
+        else:
+            evaluated = []
+            for config_list in config_lists:
+                pruner = PRUNER_DICT[self._base_algo](copy.deepcopy(self._model_to_prune), config_list)
+                evaluated.append(self._evaluator(pruner.compress()))
+
+        for (key, indices), evaluation_result in zip(pending.items(), evaluated):
+            if self._cache_decimals is not None:
+                self._evaluation_cache[key] = evaluation_result
+            for idx in indices:
+                results[idx] = evaluation_result
+        return results, len(config_lists)
+
     def calc_mask(self, wrapper, **kwargs):
         return None
 
@@ -263,64 +347,18 @@ class SimulatedAnnealingPruner(Pruner):
         _logger.info('Starting Simulated Annealing Compression...')
 
         # initiaze a randomized action
-        pruning_iteration = 0
         self._init_sparsities()
 
-        # stop condition
-        self._current_temperature = self._start_temperature
-        while self._current_temperature > self._stop_temperature:
-            _logger.info('Pruning iteration: %d', pruning_iteration)
-            _logger.info('Current temperature: %d, Stop temperature: %d',
-                         self._current_temperature, self._stop_temperature)
-            while True:
-                # generate perturbation
-                sparsities_perturbated = self._generate_perturbations()
-                config_list = self._sparsities_2_config_list(
-                    sparsities_perturbated)
-                _logger.info(
-                    "config_list for Pruner generated: %s", config_list)
-
-                # fast evaluation
-                pruner = PRUNER_DICT[self._base_algo](copy.deepcopy(self._model_to_prune), config_list)
-                model_masked = pruner.compress()
-                evaluation_result = self._evaluator(model_masked)
-
-                self._search_history.append(
-                    {'sparsity': self._sparsity, 'performance': evaluation_result, 'config_list': config_list})
-
-                if self._optimize_mode is OptimizeMode.Minimize:
-                    evaluation_result *= -1
-
-                # if better evaluation result, then accept the perturbation
-                if evaluation_result > self._current_performance:
-                    self._current_performance = evaluation_result
-                    self._sparsities = sparsities_perturbated
-
-                    # save best performance and best params
-                    if evaluation_result > self._best_performance:
-                        _logger.info('updating best model...')
-                        self._best_performance = evaluation_result
-                        self._best_config_list = config_list
-
-                        # save the overall best masked model
-                        self.bound_model = model_masked
-                        # the ops with sparsity 0 are not included in this modules_wrapper
-                        modules_wrapper_final = pruner.get_modules_wrapper()
-                    break
-                # if not, accept with probability e^(-deltaE/current_temperature)
-                else:
-                    delta_E = np.abs(evaluation_result -
-                                     self._current_performance)
-                    probability = math.exp(-1 * delta_E /
-                                           self._current_temperature)
-                    if np.random.uniform(0, 1) < probability:
-                        self._current_performance = evaluation_result
-                        self._sparsities = sparsities_perturbated
-                        break
-
-            # cool down
-            self._current_temperature *= self._cool_down_rate
-            pruning_iteration += 1
+        if self._num_workers > 1:
+            num_threads = max(1, torch.get_num_threads() // self._num_workers)
+            self._pool = multiprocessing.get_context('fork').Pool(
+                self._num_workers, _init_worker, (self._model_to_prune, self._base_algo, self._evaluator, num_threads))
+        try:
+            self._anneal()
+        finally:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool = None
 
         _logger.info('----------Compression finished--------------')
         _logger.info('Best performance: %s', self._best_performance)
@@ -334,6 +372,11 @@ class SimulatedAnnealingPruner(Pruner):
             for item in self._search_history:
                 writer.writerow({'sparsity': item['sparsity'], 'performance': item['performance'], 'config_list': json.dumps(
                     item['config_list'])})
+        with open(os.path.join(self._experiment_data_dir, 'search_timings.csv'), 'w') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=['iteration', 'temperature', 'perturbations', 'evaluations',
+                                                         'evaluation_time', 'iteration_time'])
+            writer.writeheader()
+            writer.writerows(self._iteration_timings)
 
         # save best config found and best performance
         if self._optimize_mode is OptimizeMode.Minimize:
@@ -350,8 +393,89 @@ class SimulatedAnnealingPruner(Pruner):
         if return_config_list:
             return self._best_config_list
 
+        # the overall best masked model, which is pruned again instead of kept during the annealing process
+        pruner = PRUNER_DICT[self._base_algo](copy.deepcopy(self._model_to_prune), self._best_config_list)
+        self.bound_model = pruner.compress()
         # This should be done only at the final stage,
         # because the modules_wrapper with all the ops are used during the annealing process
-        self.modules_wrapper = modules_wrapper_final
+        # the ops with sparsity 0 are not included in this modules_wrapper
+        self.modules_wrapper = pruner.get_modules_wrapper()
 
         return self.bound_model
+
+    def _anneal(self):
+        pruning_iteration = 0
+        # stop condition
+        self._current_temperature = self._start_temperature
+        while self._current_temperature > self._stop_temperature:
+            _logger.info('Pruning iteration: %d', pruning_iteration)
+            _logger.info('Current temperature: %d, Stop temperature: %d',
+                         self._current_temperature, self._stop_temperature)
+            iteration_start = time.time()
+            num_candidates, num_evaluations, evaluation_time = 0, 0, 0.
+            accepted = False
+            while not accepted:
+                # generate perturbation
+                candidates = []
+                for _ in range(self._num_perturbations):
+                    sparsities_perturbated = self._generate_perturbations()
+                    config_list = self._sparsities_2_config_list(
+                        sparsities_perturbated)
+                    _logger.info(
+                        "config_list for Pruner generated: %s", config_list)
+                    candidates.append((sparsities_perturbated, config_list))
+
+                # fast evaluation
+                evaluation_start = time.time()
+                evaluation_results, evaluations = self._evaluate_perturbations(candidates)
+                evaluation_time += time.time() - evaluation_start
+                num_candidates += len(candidates)
+                num_evaluations += evaluations
+
+                for (sparsities_perturbated, config_list), evaluation_result in zip(candidates, evaluation_results):
+                    # the perturbations after the accepted one are discarded, and not recorded
+                    self._search_history.append(
+                        {'sparsity': self._sparsity, 'performance': evaluation_result, 'config_list': config_list})
+                    if self._optimize_mode is OptimizeMode.Minimize:
+                        evaluation_result *= -1
+
+                    # if better evaluation result, then accept the perturbation
+                    if evaluation_result > self._current_performance:
+                        self._current_performance = evaluation_result
+                        self._sparsities = sparsities_perturbated
+
+                        # save best performance and best params
+                        if evaluation_result > self._best_performance:
+                            _logger.info('updating best model...')
+                            self._best_performance = evaluation_result
+                            self._best_config_list = config_list
+                        accepted = True
+                        break
+                    # if not, accept with probability e^(-deltaE/current_temperature)
+                    else:
+                        delta_E = np.abs(evaluation_result -
+                                         self._current_performance)
+                        probability = math.exp(-1 * delta_E /
+                                               self._current_temperature)
+                        if np.random.uniform(0, 1) < probability:
+                            self._current_performance = evaluation_result
+                            self._sparsities = sparsities_perturbated
+                            accepted = True
+                            break
+
+            timing = {
+                'iteration': pruning_iteration,
+                'temperature': self._current_temperature,
+                'perturbations': num_candidates,
+                'evaluations': num_evaluations,
+                'evaluation_time': evaluation_time,
+                'iteration_time': time.time() - iteration_start
+            }
+            self._iteration_timings.append(timing)
+            _logger.info('Pruning iteration %d finished in %.2fs: %d perturbations, %d evaluated in %.2fs, %d from cache',
+                         pruning_iteration, timing['iteration_time'], num_candidates, num_evaluations, evaluation_time,
+                         num_candidates - num_evaluations)
+
+            # cool down
+            self._current_temperature *= self._cool_down_rate
+            pruning_iteration += 1
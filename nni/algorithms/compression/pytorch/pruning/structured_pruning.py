@@ -414,49 +414,36 @@ class FPGMPrunerMasker(StructuredWeightMasker):
                 base_mask['bias_mask'][idx] = 0.
         return base_mask
 
+    # number of filters whose distances to all the filters are computed at a time,
+    # which bounds the temporary distance matrix of very wide layers
+    distance_chunk_size = 1024
+
     def _get_min_gm_kernel_idx(self, num_prune, wrapper, wrapper_idx, channel_masks):
         channel_dist = self.get_channel_sum(wrapper, wrapper_idx)
         if channel_masks is not None:
             channel_dist = channel_dist * channel_masks
-        dist_list = [(channel_dist[i], i)
-                     for i in range(channel_dist.size(0))]
-        min_gm_kernels = sorted(dist_list, key=lambda x: x[0])[:num_prune]
-        return [x[1] for x in min_gm_kernels]
+        # stable, so that the masked channels with the same zero distance are pruned from the lowest index
+        return torch.sort(channel_dist, stable=True).indices[:num_prune].tolist()
 
-    def _get_distance_sum(self, weight, out_idx):
+    def get_channel_sum(self, wrapper, wrapper_idx):
         """
-        Calculate the total distance between a specified filter (by out_idex and in_idx) and
-        all other filters.
-        Parameters
-        ----------
-        weight: Tensor
-            convolutional filter weight
-        out_idx: int
-            output channel index of specified filter, this method calculates the total distance
-            between this specified filter and all other filters.
+        Calculate the total distance between each filter and all the filters,
+        with the pairwise distances of a chunk of filters computed in a batch.
+
         Returns
         -------
-        float32
-            The total distance
+        Tensor
+            The total distance of each output channel
         """
-        logger.debug('weight size: %s', weight.size())
-        assert len(weight.size()) in [3, 4], 'unsupported weight shape'
-
-        w = weight.view(weight.size(0), -1)
-        anchor_w = w[out_idx].unsqueeze(0).expand(w.size(0), w.size(1))
-        x = w - anchor_w
-        x = (x * x).sum(-1)
-        x = torch.sqrt(x)
-        return x.sum()
-
-    def get_channel_sum(self, wrapper, wrapper_idx):
         weight = wrapper.module.weight.data
-        assert len(weight.size()) in [3, 4]
-        dist_list = []
-        for out_i in range(weight.size(0)):
-            dist_sum = self._get_distance_sum(weight, out_i)
-            dist_list.append(dist_sum)
-        return torch.Tensor(dist_list).to(weight.device)
+        assert len(weight.size()) in [3, 4], 'unsupported weight shape'
+        logger.debug('weight size: %s', weight.size())
+        w = weight.reshape(weight.size(0), -1)
+        dist_sum = torch.empty(w.size(0), dtype=w.dtype, device=w.device)
+        for start in range(0, w.size(0), self.distance_chunk_size):
+            end = start + self.distance_chunk_size
+            dist_sum[start:end] = torch.cdist(w[start:end], w).sum(1)
+        return dist_sum
 
 
 class TaylorFOWeightFilterPrunerMasker(StructuredWeightMasker):
@@ -7,6 +7,7 @@ import torch
 from schema import Schema, And, Or, Optional
 from nni.compression.pytorch.utils.config_validation import CompressorSchema
 from nni.compression.pytorch.compressor import Quantizer, QuantGrad, QuantType
+from nni.compression.pytorch.utils.utils import fold_batch_norm
 
 __all__ = ['NaiveQuantizer', 'QAT_Quantizer', 'DoReFaQuantizer', 'BNNQuantizer']
 
@@ -41,6 +42,16 @@ class NaiveQuantizer(Quantizer):
         wrapper.module.weight = weight
         return weight
 
+    def get_export_weight(self, wrapper):
+        return self.quantize_weight(wrapper)
+
+    def get_calibration_config(self, wrapper):
+        if not hasattr(wrapper.module, 'old_weight'):
+            return {}
+        if wrapper.name not in self.layer_scale:
+            self.quantize_weight(wrapper)
+        return {'weight_bits': 8, 'weight_scale': float(self.layer_scale[wrapper.name]), 'weight_zero_point': 0}
+
 def update_ema(biased_ema, value, decay, step):
     """
     calculate biased stat and unbiased stat in each step using exponential moving average method
@@ -98,6 +109,9 @@ def update_quantization_param(bits, rmin, rmax):
 
     # First determine the scale.
     scale = (rmax - rmin) / (qmax - qmin)
+    # all the values are zero (e.g., a zero-initialized bias), which are represented exactly by any scale
+    if scale == 0:
+        scale = torch.ones_like(scale)
 
     # Zero-point computation.
     initial_zero_point = qmin - rmin / scale
@@ -127,7 +141,7 @@ class QAT_Quantizer(Quantizer):
     http://openaccess.thecvf.com/content_cvpr_2018/papers/Jacob_Quantization_and_Training_CVPR_2018_paper.pdf
     """
 
-    def __init__(self, model, config_list, optimizer=None):
+    def __init__(self, model, config_list, optimizer=None, dummy_input=None):
         """
         Parameters
         ----------
@@ -146,8 +160,13 @@ class QAT_Quantizer(Quantizer):
                     state where activation quantization ranges do not exclude a signiﬁcant fraction of values, default value is 0
                 - op_types : list of string
                     types of nn.module you want to apply quantization, eg. 'Conv2d'
+        optimizer : torch.optim.Optimizer
+            optimizer used to train the model
+        dummy_input : torch.Tensor or tuple of torch.Tensor
+            the dummy input to trace the model, with which the batch normalizations following the convolutions
+            with quantized weights are folded into the weights. ```None``` for no folding.
         """
-        super().__init__(model, config_list, optimizer)
+        super().__init__(model, config_list, optimizer, dummy_input)
         modules_to_compress = self.get_modules_to_compress()
         self.bound_model.register_buffer("steps", torch.Tensor([1]))
         for layer, config in modules_to_compress:
@@ -230,10 +249,12 @@ class QAT_Quantizer(Quantizer):
         real_val = op.scale * (quantized_val - op.zero_point)
         return real_val
 
-    def quantize_weight(self, wrapper, **kwargs):
+    def quantize_weight(self, wrapper, weight=None, **kwargs):
         config = wrapper.config
         module = wrapper.module
-        weight = copy.deepcopy(wrapper.module.old_weight.data)
+        if weight is None:
+            weight = wrapper.module.old_weight
+        weight = copy.deepcopy(weight.data)
         weight_bits = get_bits_length(config, 'weight')
         quant_start_step = config.get('quant_start_step', 0)
         assert weight_bits >= 1, "quant bits length should be at least 1"
@@ -283,9 +304,41 @@ class QAT_Quantizer(Quantizer):
         out = self._dequantize(module, out)
         return out
 
-    def fold_bn(self, config, **kwargs):
-        # TODO simulate folded weight
-        pass
+    def fold_bn(self, *inputs, wrapper):
+        """
+        Simulate batch normalization folding. In training, the running statistics of the batch normalization
+        are updated with the output of the module before folding, then the weight and bias are folded with
+        the running statistics, which are the same as those in inference.
+        """
+        module = wrapper.module
+        bias = getattr(module, 'old_bias', None)
+        if wrapper.training:
+            with torch.no_grad():
+                module.weight = module.old_weight.data
+                module.bias = bias.data if bias is not None else None
+                wrapper.bn_module(module(*inputs))
+        return fold_batch_norm(module.old_weight, bias, wrapper.bn_module)
+
+    def get_calibration_config(self, wrapper):
+        config = wrapper.config
+        module = wrapper.module
+        calibration = {}
+        if hasattr(module, 'old_weight'):
+            weight = module.old_weight
+            if wrapper.bn_module is not None:
+                weight, _ = fold_batch_norm(weight, getattr(module, 'old_bias', None), wrapper.bn_module)
+                calibration['bn_module'] = wrapper.bn_name
+            weight_bits = get_bits_length(config, 'weight')
+            scale, zero_point = update_quantization_param(weight_bits, torch.min(weight), torch.max(weight))
+            calibration.update(weight_bits=weight_bits, weight_scale=float(scale), weight_zero_point=int(zero_point))
+        if 'output' in config['quant_types']:
+            output_bits = get_bits_length(config, 'output')
+            scale, zero_point = update_quantization_param(output_bits, module.tracked_min, module.tracked_max)
+            if scale > 0:
+                calibration.update(output_bits=output_bits, output_scale=float(scale), output_zero_point=int(zero_point))
+            else:
+                logger.warning('Output range of %s is not collected, its output is not exported as quantized', wrapper.name)
+        return calibration
 
     def step_with_optimizer(self):
         """
@@ -339,6 +392,16 @@ class DoReFaQuantizer(Quantizer):
         output = torch.round(input_ri * scale) / scale
         return output
 
+    def get_export_weight(self, wrapper):
+        return self.quantize_weight(wrapper)
+
+    def get_calibration_config(self, wrapper):
+        if not hasattr(wrapper.module, 'old_weight'):
+            return {}
+        # the quantized weight 2 * q / (2 ** bits - 1) - 1 is exported as (2 * q - 2 ** bits + 1) / (2 ** bits - 1)
+        weight_bits = get_bits_length(wrapper.config, 'weight')
+        return {'weight_bits': weight_bits, 'weight_scale': 1 / (pow(2, weight_bits) - 1), 'weight_zero_point': 0}
+
 
 class ClipGrad(QuantGrad):
     @staticmethod
@@ -392,3 +455,13 @@ class BNNQuantizer(Quantizer):
         # remove zeros
         out[out == 0] = 1
         return out
+
+    def get_export_weight(self, wrapper):
+        return self.quantize_weight(wrapper)
+
+    def get_calibration_config(self, wrapper):
+        if 'output' in wrapper.config['quant_types']:
+            logger.warning('Binarized output of %s is not an affine quantization, and is not exported', wrapper.name)
+        if not hasattr(wrapper.module, 'old_weight'):
+            return {}
+        return {'weight_bits': 1, 'weight_scale': 1.0, 'weight_zero_point': 0}
@@ -9,6 +9,7 @@ import sys
 import math
 import logging
 import json_tricks
+import numpy as np
 from schema import Schema, Optional
 import ConfigSpace as CS
 import ConfigSpace.hyperparameters as CSH
@@ -335,6 +336,8 @@ class BOHB(MsgDispatcherBase):
         self.job_id_para_id_map = dict()
         # record the unsatisfied parameter request from trial jobs
         self.unsatisfied_jobs = []
+        # state loaded from checkpoint, restored when config generator is created
+        self._checkpoint_state = None
 
     def handle_initialize(self, data):
         """Initialize Tuner, including creating Bayesian optimization-based parametric models
@@ -365,10 +368,42 @@ class BOHB(MsgDispatcherBase):
                               min_bandwidth=self.min_bandwidth)
         else:
             raise ValueError('Error: Search space is None')
+        if self._checkpoint_state is not None:
+            self._restore_checkpoint()
         # generate first brackets
         self.generate_new_bracket()
         send(CommandType.Initialized, '')
 
+    def load_checkpoint(self):
+        state = self._load_state()
+        if state is None:
+            return
+        global _next_parameter_id
+        _next_parameter_id = state['next_parameter_id']
+        self._set_data_record_state(state)
+        self._checkpoint_state = state
+
+    def save_checkpoint(self):
+        if self.cg is None:
+            return
+        state = self._get_data_record_state()
+        state['next_parameter_id'] = _next_parameter_id
+        state['curr_s'] = self.curr_s
+        # budgets are float, so observations are saved as a list instead of a dict
+        state['observations'] = [[budget, np.array(self.cg.configs[budget]), np.array(self.cg.losses[budget])]
+                                 for budget in self.cg.configs]
+        self._save_state(state)
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint_state
+        self._checkpoint_state = None
+        configs = {budget: list(budget_configs) for budget, budget_configs, _ in state['observations']}
+        losses = {budget: budget_losses.tolist() for budget, _, budget_losses in state['observations']}
+        self.cg.load_observations(configs, losses)
+        # the bracket running at checkpoint time is started over
+        self.curr_s = state['curr_s']
+        logger.info('Restored %d results from checkpoint', sum(len(value) for value in losses.values()))
+
     def generate_new_bracket(self):
         """generate a new bracket"""
         logger.debug(
@@ -645,6 +680,7 @@ class BOHB(MsgDispatcherBase):
         """
         for entry in data:
             entry['value'] = json_tricks.loads(entry['value'])
+        data = self._skip_checkpointed_data(data)
         _completed_num = 0
         for trial_info in data:
             logger.info("Importing data, current processing progress %s / %s", _completed_num, len(data))
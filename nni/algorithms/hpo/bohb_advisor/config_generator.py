@@ -306,6 +306,29 @@ class CG_BOHB:
         if not update_model:
             return
 
+        self._update_model(budget)
+
+    def load_observations(self, configs, losses):
+        """
+        Restore registered runs, e.g., from a checkpoint, fitting the model of each budget only once.
+
+        Parameters:
+        -----------
+        configs: dict
+            numerical representations of the configurations of each budget
+        losses: dict
+            losses of the configurations of each budget
+        """
+        for budget in sorted(configs):
+            self.configs[budget] = [np.asarray(config) for config in configs[budget]]
+            self.losses[budget] = list(losses[budget])
+            if len(self.configs[budget]) > self.min_points_in_model - 1:
+                self._update_model(budget)
+
+    def _update_model(self, budget):
+        """
+        Refit KDE of ``budget`` with all the runs registered on it.
+        """
         train_configs = np.array(self.configs[budget])
         train_losses = np.array(self.losses[budget])
 
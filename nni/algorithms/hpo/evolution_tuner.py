@@ -16,7 +16,7 @@ from schema import Schema, Optional
 import nni
 from nni import ClassArgsValidator
 from nni.tuner import Tuner
-from nni.utils import OptimizeMode, extract_scalar_reward, split_index, json2parameter, json2space
+from nni.utils import OptimizeMode, extract_scalar_reward, split_index, CompiledSearchSpace
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +85,8 @@ class EvolutionTuner(Tuner):
         self.credit = 0 # record the unsatisfied trial requests
         self.send_trial_callback = None
         self.param_ids = deque()
+        # checkpoint loaded before search space is received
+        self._checkpoint_state = None
 
     def update_search_space(self, search_space):
         """
@@ -97,11 +99,16 @@ class EvolutionTuner(Tuner):
         search_space : dict
         """
         self.searchspace_json = search_space
-        self.space = json2space(self.searchspace_json)
+        self.compiled_space = CompiledSearchSpace(self.searchspace_json)
+        self.space = self.compiled_space.names
 
         self.random_state = np.random.RandomState()
         self.population = []
 
+        if self._checkpoint_state is not None:
+            self._restore_checkpoint()
+            return
+
         for _ in range(self.population_size):
             self._random_generate_individual()
 
@@ -166,11 +173,7 @@ class EvolutionTuner(Tuner):
         return result
 
     def _random_generate_individual(self):
-        is_rand = dict()
-        for item in self.space:
-            is_rand[item] = True
-
-        config = json2parameter(self.searchspace_json, is_rand, self.random_state)
+        config = self.compiled_space.sample(self.random_state)
         self.population.append(Individual(config=config))
 
     def _generate_individual(self, parameter_id):
@@ -206,15 +209,10 @@ class EvolutionTuner(Tuner):
                 self.population[0] = self.population[1]
 
             # mutation on the worse individual
-            space = json2space(self.searchspace_json,
-                               self.population[0].config)
-            is_rand = dict()
+            space = self.compiled_space.space(self.population[0].config)
             mutation_pos = space[random.randint(0, len(space)-1)]
-
-            for i in range(len(self.space)):
-                is_rand[self.space[i]] = (self.space[i] == mutation_pos)
-            config = json2parameter(
-                self.searchspace_json, is_rand, self.random_state, self.population[0].config)
+            config = self.compiled_space.sample(
+                self.random_state, self.population[0].config, {mutation_pos: True})
 
             if len(self.population) > 1:
                 self.population.pop(1)
@@ -281,3 +279,42 @@ class EvolutionTuner(Tuner):
 
     def import_data(self, data):
         pass
+
+    def save_checkpoint(self):
+        """
+        Save the population and random state.
+        Configurations of running trials are saved as unevaluated individuals,
+        because running trials are not resumed with the experiment.
+        """
+        if self.population is None:
+            return
+        individuals = [(indiv.config, indiv.result) for indiv in self.population] + \
+            [(indiv.config, None) for indiv in self.running_trials.values()]
+        self._save_state({
+            'configs': [config for config, _ in individuals],
+            'results': [result for _, result in individuals],
+            'random_state': list(self.random_state.get_state())
+        })
+
+    def load_checkpoint(self):
+        """
+        Load the checkpoint saved by :meth:`save_checkpoint`. The population is restored in :meth:`update_search_space`.
+
+        Returns
+        -------
+        bool
+            Whether a checkpoint is found.
+        """
+        state = self._load_state()
+        if state is None:
+            return False
+        self._checkpoint_state = state
+        return True
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint_state
+        self._checkpoint_state = None
+        self.population = [Individual(config=config, result=result)
+                           for config, result in zip(state['configs'], state['results'])]
+        self.random_state.set_state(tuple(state['random_state']))
+        logger.info('Restored population of %d individuals from checkpoint', len(self.population))
@@ -17,7 +17,7 @@ from sklearn.gaussian_process import GaussianProcessRegressor
 
 from nni import ClassArgsValidator
 from nni.tuner import Tuner
-from nni.utils import OptimizeMode, extract_scalar_reward
+from nni.utils import OptimizeMode, extract_scalar_reward, split_import_data
 
 from .target_space import TargetSpace
 from .util import UtilityFunction, acq_max
@@ -97,6 +97,9 @@ class GPTuner(Tuner):
         # num of imported data
         self._supplement_data_num = 0
 
+        # checkpoint loaded before search space is received
+        self._checkpoint_state = None
+
     def update_search_space(self, search_space):
         """
         Update the self.bounds and self.types by the search_space.json file.
@@ -104,6 +107,8 @@ class GPTuner(Tuner):
         Override of the abstract method in :class:`~nni.tuner.Tuner`.
         """
         self._space = TargetSpace(search_space, self._random_state)
+        if self._checkpoint_state is not None:
+            self._restore_checkpoint()
 
     def generate_parameters(self, parameter_id, **kwargs):
         """
@@ -157,25 +162,53 @@ class GPTuner(Tuner):
     def import_data(self, data):
         """
         Import additional data for tuning.
+        All records are registered to the target space at once.
+
+        Override of the abstract method in :class:`~nni.tuner.Tuner`.
+        """
+        parameters, values = split_import_data(data)
+        if not parameters:
+            return
+        if self._optimize_mode == OptimizeMode.Minimize:
+            values = [-value for value in values]
+        self._supplement_data_num += len(parameters)
+        self._space.register_batch([self._space.params_to_array(params) for params in parameters], values)
+        logger.info("Successfully import %d data to GP tuner.", len(parameters))
+
+    def save_checkpoint(self):
+        """
+        Save registered observations and random state.
+
+        Override of the abstract method in :class:`~nni.tuner.Tuner`.
+        """
+        if self._space is None:
+            return
+        self._save_state({
+            'params': self._space.params,
+            'target': self._space.target,
+            'supplement_data_num': self._supplement_data_num,
+            'random_state': list(self._random_state.get_state())
+        })
+
+    def load_checkpoint(self):
+        """
+        Load the checkpoint saved by :meth:`save_checkpoint`.
+        Observations are registered once the search space is received.
 
         Override of the abstract method in :class:`~nni.tuner.Tuner`.
         """
-        _completed_num = 0
-        for trial_info in data:
-            logger.info(
-                "Importing data, current processing progress %s / %s", _completed_num, len(data))
-            _completed_num += 1
-            assert "parameter" in trial_info
-            _params = trial_info["parameter"]
-            assert "value" in trial_info
-            _value = trial_info['value']
-            if not _value:
-                logger.info(
-                    "Useless trial data, value is %s, skip this trial data.", _value)
-                continue
-            self._supplement_data_num += 1
-            _parameter_id = '_'.join(
-                ["ImportData", str(self._supplement_data_num)])
-            self.receive_trial_result(
-                parameter_id=_parameter_id, parameters=_params, value=_value)
-        logger.info("Successfully import data to GP tuner.")
+        state = self._load_state()
+        if state is None:
+            return False
+        self._checkpoint_state = state
+        if self._space is not None:
+            self._restore_checkpoint()
+        return True
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint_state
+        self._checkpoint_state = None
+        self._space.register_batch(state['params'], state['target'])
+        self._supplement_data_num = state['supplement_data_num']
+        self._random_state.set_state(tuple(state['random_state']))
+        logger.info("Restored %d observations from checkpoint.", self._space.len())
@@ -226,6 +226,26 @@ class TargetSpace():
         self._params = np.concatenate([self._params, x.reshape(1, -1)])
         self._target = np.concatenate([self._target, [target]])
 
+    def register_batch(self, params, target):
+        """
+        Append points and their target values to the known data at once.
+
+        Parameters
+        ----------
+        params : numpy array
+            array format of parameters, one row for each point
+
+        target : numpy array
+            target function values
+        """
+        params = np.asarray(params, dtype=float).reshape(-1, self.dim)
+        target = np.asarray(target, dtype=float).ravel()
+        for x, y in zip(params, target):
+            self._cache[_hashable(x)] = y
+
+        self._params = np.concatenate([self._params, params])
+        self._target = np.concatenate([self._target, target])
+
     def random_sample(self):
         """
         Creates a random point within the bounds of the space.
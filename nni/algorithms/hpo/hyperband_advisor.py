@@ -5,7 +5,6 @@
 hyperband_advisor.py
 """
 
-import copy
 import logging
 import math
 import sys
@@ -18,8 +17,7 @@ from nni import ClassArgsValidator
 from nni.runtime.common import multi_phase_enabled
 from nni.runtime.msg_dispatcher_base import MsgDispatcherBase
 from nni.runtime.protocol import CommandType, send
-from nni.utils import NodeType, OptimizeMode, MetricType, extract_scalar_reward
-from nni import parameter_expressions
+from nni.utils import OptimizeMode, MetricType, CompiledSearchSpace, extract_scalar_reward, split_index
 
 _logger = logging.getLogger(__name__)
 
@@ -66,43 +64,6 @@ def create_bracket_parameter_id(brackets_id, brackets_curr_decay, increased_id=-
     return params_id
 
 
-def json2parameter(ss_spec, random_state):
-    """Randomly generate values for hyperparameters from hyperparameter space i.e., x.
-
-    Parameters
-    ----------
-    ss_spec:
-        hyperparameter space
-    random_state:
-        random operator to generate random values
-
-    Returns
-    -------
-    Parameter:
-        Parameters in this experiment
-    """
-    if isinstance(ss_spec, dict):
-        if NodeType.TYPE in ss_spec.keys():
-            _type = ss_spec[NodeType.TYPE]
-            _value = ss_spec[NodeType.VALUE]
-            if _type == 'choice':
-                _index = random_state.randint(len(_value))
-                chosen_params = json2parameter(ss_spec[NodeType.VALUE][_index], random_state)
-            else:
-                chosen_params = getattr(parameter_expressions, _type)(*(_value + [random_state]))
-        else:
-            chosen_params = dict()
-            for key in ss_spec.keys():
-                chosen_params[key] = json2parameter(ss_spec[key], random_state)
-    elif isinstance(ss_spec, list):
-        chosen_params = list()
-        for _, subspec in enumerate(ss_spec):
-            chosen_params.append(json2parameter(subspec, random_state))
-    else:
-        chosen_params = copy.deepcopy(ss_spec)
-    return chosen_params
-
-
 class Bracket():
     """A bracket in Hyperband, all the information of a bracket is managed by an instance of this class
 
@@ -215,13 +176,19 @@ class Bracket():
             return [[key, value] for key, value in hyper_configs.items()]
         return None
 
-    def get_hyperparameter_configurations(self, num, r, searchspace_json, random_state):
+    def get_hyperparameter_configurations(self, num, r, search_space, random_state):
         """Randomly generate num hyperparameter configurations from search space
 
         Parameters
         ----------
         num: int
             the number of hyperparameter configurations
+        r: int
+            the budget of the configurations
+        search_space: CompiledSearchSpace
+            the compiled search space
+        random_state: numpy.random.RandomState
+            random operator to generate random values
 
         Returns
         -------
@@ -233,7 +200,7 @@ class Bracket():
         hyperparameter_configs = dict()
         for _ in range(num):
             params_id = create_bracket_parameter_id(self.bracket_id, self.i)
-            params = json2parameter(searchspace_json, random_state)
+            params = split_index(search_space.sample(random_state))
             params[_KEY] = r
             hyperparameter_configs[params_id] = params
         self._record_hyper_configs(hyperparameter_configs)
@@ -296,6 +263,7 @@ class Hyperband(MsgDispatcherBase):
         self.curr_bracket_id = None
 
         self.searchspace_json = None
+        self.compiled_space = None
         self.random_state = None
         self.optimize_mode = OptimizeMode(optimize_mode)
 
@@ -349,9 +317,9 @@ class Hyperband(MsgDispatcherBase):
                 self.brackets[self.curr_bracket_id] = Bracket(self.curr_bracket_id, self.curr_s, self.s_max, self.eta, self.R, self.optimize_mode)
                 next_n, next_r = self.brackets[self.curr_bracket_id].get_n_r()
                 _logger.debug('new bracket, next_n=%d, next_r=%d', next_n, next_r)
-                assert self.searchspace_json is not None and self.random_state is not None
+                assert self.compiled_space is not None and self.random_state is not None
                 generated_hyper_configs = self.brackets[self.curr_bracket_id].get_hyperparameter_configurations(next_n, next_r,
-                                                                                                    self.searchspace_json,
+                                                                                                    self.compiled_space,
                                                                                                     self.random_state)
                 self.generated_hyper_configs = generated_hyper_configs.copy()
                 self.curr_s -= 1
@@ -377,6 +345,8 @@ class Hyperband(MsgDispatcherBase):
         """data: JSON object, which is search space
         """
         self.searchspace_json = data
+        # nested search spaces without '_name' are accepted, since only whole parameters are sampled
+        self.compiled_space = CompiledSearchSpace(data, require_name=False)
         self.random_state = np.random.RandomState()
 
     def _handle_trial_end(self, parameter_id):
@@ -13,7 +13,7 @@ import numpy as np
 from schema import Optional, Schema
 from nni import ClassArgsValidator
 from nni.tuner import Tuner
-from nni.utils import NodeType, OptimizeMode, extract_scalar_reward, split_index
+from nni.utils import NodeType, OptimizeMode, extract_scalar_reward, split_import_data, split_index
 
 logger = logging.getLogger('hyperopt_AutoML')
 
@@ -180,6 +180,13 @@ def _add_index(in_x, parameter):
             return parameter
     return None  # note: this is not written by original author, feel free to modify if you think it's incorrect
 
+def _to_python(value):
+    """
+    Convert numpy scalars in hyperopt trials to python numbers.
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
 class HyperoptClassArgsValidator(ClassArgsValidator):
     def validate_class_args(self, **kwargs):
         Schema({
@@ -213,6 +220,7 @@ class HyperoptTuner(Tuner):
         self.total_data = {}
         self.rval = None
         self.supplement_data_num = 0
+        self._checkpoint_state = None
 
         self.parallel = parallel_optimize
         if self.parallel:
@@ -262,6 +270,8 @@ class HyperoptTuner(Tuner):
                                 rstate=rstate,
                                 verbose=0)
         self.rval.catch_eval_exceptions = False
+        if self._checkpoint_state is not None:
+            self._restore_checkpoint()
 
     def generate_parameters(self, parameter_id, **kwargs):
         """
@@ -380,6 +390,35 @@ class HyperoptTuner(Tuner):
         trials.insert_trial_docs([trial])
         trials.refresh()
 
+    def _insert_trials(self, rval, vals_list, losses):
+        """
+        Insert finished trials into ``rval.trials`` in one batch.
+
+        Parameters
+        ----------
+        rval : hyperopt.FMinIter
+        vals_list : list of dict
+            ``misc['vals']`` of each trial, i.e., mapping from hyperopt label to a list with zero or one value.
+        losses : list of float
+            Loss of each trial, already negated when maximizing.
+        """
+        domain = rval.domain
+        trials = rval.trials
+        start_id = len(trials)
+        new_ids = list(range(start_id, start_id + len(vals_list)))
+        specs = [None] * len(new_ids)
+        results = [{'loss': loss, 'status': 'ok'} for loss in losses]
+        miscs = []
+        for tid, vals in zip(new_ids, vals_list):
+            miscs.append(dict(tid=tid, cmd=domain.cmd, workdir=domain.workdir,
+                              idxs={key: [tid] if val else [] for key, val in vals.items()},
+                              vals=vals))
+        docs = trials.new_trial_docs(new_ids, specs, results, miscs)
+        for doc in docs:
+            doc['state'] = hp.JOB_STATE_DONE
+        trials.insert_trial_docs(docs)
+        trials.refresh()
+
     def miscs_update_idxs_vals(self,
                                miscs,
                                idxs,
@@ -468,32 +507,85 @@ class HyperoptTuner(Tuner):
 
     def import_data(self, data):
         """
-        Import additional data for tuning
+        Import additional data for tuning.
+        All records are inserted into hyperopt trials in one batch, which is refreshed only once.
 
         Parameters
         ----------
         data:
             a list of dictionarys, each of which has at least two keys, 'parameter' and 'value'
         """
-        _completed_num = 0
-        for trial_info in data:
-            logger.info("Importing data, current processing progress %s / %s", _completed_num, len(data))
-            _completed_num += 1
-            if self.algorithm_name == 'random_search':
-                return
-            assert "parameter" in trial_info
-            _params = trial_info["parameter"]
-            assert "value" in trial_info
-            _value = trial_info['value']
-            if not _value:
-                logger.info("Useless trial data, value is %s, skip this trial data.", _value)
-                continue
+        if self.algorithm_name == 'random_search':
+            return
+        parameters, rewards = split_import_data(data)
+        vals_list = []
+        losses = []
+        for _params, reward in zip(parameters, rewards):
             self.supplement_data_num += 1
             _parameter_id = '_'.join(
                 ["ImportData", str(self.supplement_data_num)])
             self.total_data[_parameter_id] = _add_index(in_x=self.json,
                                                         parameter=_params)
-            self.receive_trial_result(parameter_id=_parameter_id,
-                                      parameters=_params,
-                                      value=_value)
-        logger.info("Successfully import data to TPE/Anneal tuner.")
+            out_y = dict()
+            json2vals(self.json, self.total_data[_parameter_id], out_y)
+            vals = dict()
+            for key in self.rval.domain.params:
+                if key in [NodeType.VALUE, NodeType.INDEX]:
+                    continue
+                if key not in out_y or out_y[key] is None or (isinstance(out_y[key], list) and not out_y[key]):
+                    vals[key] = []
+                else:
+                    vals[key] = [out_y[key]]
+            vals_list.append(vals)
+            losses.append(-reward if self.optimize_mode is OptimizeMode.Maximize else reward)
+        if vals_list:
+            self._insert_trials(self.rval, vals_list, losses)
+        logger.info("Successfully import %d data to TPE/Anneal tuner.", len(vals_list))
+
+    def save_checkpoint(self):
+        """
+        Save finished trials of hyperopt, generated parameters and random state.
+        """
+        if self.rval is None:
+            return
+        trials = [trial for trial in self.rval.trials.trials if trial['state'] == hp.JOB_STATE_DONE]
+        state = {
+            'vals': [{key: [_to_python(v) for v in val] for key, val in trial['misc']['vals'].items()}
+                     for trial in trials],
+            'losses': np.array([trial['result']['loss'] for trial in trials], dtype=float),
+            'total_data': [[key, value] for key, value in self.total_data.items()],
+            'supplement_data_num': self.supplement_data_num,
+            'rstate': list(self.rval.rstate.get_state())
+        }
+        if self.parallel:
+            state['optimal_y'] = self.optimal_y
+        self._save_state(state)
+
+    def load_checkpoint(self):
+        """
+        Load the checkpoint saved by :meth:`save_checkpoint`.
+        The checkpoint is applied once hyperopt is initialized in :meth:`update_search_space`.
+
+        Returns
+        -------
+        bool
+            Whether a checkpoint is found.
+        """
+        state = self._load_state()
+        if state is None:
+            return False
+        self._checkpoint_state = state
+        if self.rval is not None:
+            self._restore_checkpoint()
+        return True
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint_state
+        self._checkpoint_state = None
+        self._insert_trials(self.rval, state['vals'], state['losses'].tolist())
+        self.total_data = dict(state['total_data'])
+        self.supplement_data_num = state['supplement_data_num']
+        self.rval.rstate.set_state(tuple(state['rstate']))
+        if self.parallel:
+            self.optimal_y = state['optimal_y']
+        logger.info("Restored %d trials from checkpoint.", len(state['losses']))
@@ -24,7 +24,7 @@ from .Regression_GP import OutlierDetection as gp_outlier_detection
 from .Regression_GP import Prediction as gp_prediction
 from .Regression_GP import Selection as gp_selection
 from nni.tuner import Tuner
-from nni.utils import OptimizeMode, extract_scalar_reward
+from nni.utils import OptimizeMode, extract_scalar_reward, split_import_data
 
 logger = logging.getLogger("Metis_Tuner_AutoML")
 
@@ -523,33 +523,72 @@ class MetisTuner(Tuner):
 
     def import_data(self, data):
         """
-        Import additional data for tuning
+        Import additional data for tuning.
+        Samples are merged in one pass, using a hash index instead of searching ``samples_x`` for each record.
 
         Parameters
         ----------
         data : a list of dict
                each of which has at least two keys: 'parameter' and 'value'.
         """
-        _completed_num = 0
-        for trial_info in data:
-            logger.info("Importing data, current processing progress %s / %s", _completed_num, len(data))
-            _completed_num += 1
-            assert "parameter" in trial_info
-            _params = trial_info["parameter"]
-            assert "value" in trial_info
-            _value = trial_info['value']
-            if not _value:
-                logger.info("Useless trial data, value is %s, skip this trial data.", _value)
-                continue
+        parameters, values = split_import_data(data)
+        sample_index = {tuple(sample_x): idx for idx, sample_x in enumerate(self.samples_x)}
+        updated = set()
+        for _params, value in zip(parameters, values):
+            if self.optimize_mode == OptimizeMode.Maximize:
+                value = -value
             self.supplement_data_num += 1
-            _parameter_id = '_'.join(
-                ["ImportData", str(self.supplement_data_num)])
             self.total_data.append(_params)
-            self.receive_trial_result(
-                parameter_id=_parameter_id,
-                parameters=_params,
-                value=_value)
-        logger.info("Successfully import data to metis tuner.")
+
+            sample_x = [0 for i in range(len(self.key_order))]
+            for key in _params:
+                sample_x[self.key_order.index(key)] = _params[key]
+            key = tuple(sample_x)
+            if key in sample_index:
+                idx = sample_index[key]
+                self.samples_y[idx].append(value)
+                updated.add(idx)
+            else:
+                sample_index[key] = len(self.samples_x)
+                self.samples_x.append(sample_x)
+                self.samples_y.append([value])
+                self.samples_y_aggregation.append([value])
+        # calculate y aggregation of duplicated samples once
+        for idx in updated:
+            self.samples_y_aggregation[idx] = [get_median(self.samples_y[idx])]
+        logger.info("Successfully import %d data to metis tuner.", len(parameters))
+
+    def save_checkpoint(self):
+        """
+        Save observed samples. Models are refitted from them on every generation, so no model is saved.
+        """
+        self._save_state({
+            'samples_x': self.samples_x,
+            'samples_y': self.samples_y,
+            'samples_y_aggregation': self.samples_y_aggregation,
+            'total_data': self.total_data,
+            'supplement_data_num': self.supplement_data_num
+        })
+
+    def load_checkpoint(self):
+        """
+        Restore observed samples saved by :meth:`save_checkpoint`.
+
+        Returns
+        -------
+        bool
+            Whether the checkpoint is restored.
+        """
+        state = self._load_state()
+        if state is None:
+            return False
+        self.samples_x = state['samples_x']
+        self.samples_y = state['samples_y']
+        self.samples_y_aggregation = state['samples_y_aggregation']
+        self.total_data = state['total_data']
+        self.supplement_data_num = state['supplement_data_num']
+        logger.info("Restored %d samples from checkpoint.", len(self.samples_x))
+        return True
 
 
 def _rand_with_constraints(x_bounds, x_types):
@@ -2,13 +2,15 @@
 # Licensed under the MIT license.
 
 import math
+import multiprocessing
 import random
+import time
 from copy import deepcopy
 from functools import total_ordering
 from queue import PriorityQueue
 
 import numpy as np
-from scipy.linalg import LinAlgError, cho_solve, cholesky, solve_triangular
+from scipy.linalg import LinAlgError, cho_solve, cholesky
 from scipy.optimize import linear_sum_assignment
 from sklearn.metrics.pairwise import rbf_kernel
 
@@ -94,6 +96,127 @@ def skip_connections_distance(list_a, list_b):
     )
 
 
+def layer_signature(layer):
+    """A hashable signature of a layer. The distance between two layers only depends on their signatures."""
+    if is_layer(layer, "Conv"):
+        return (type(layer), layer.filters, layer.kernel_size, layer.stride)
+    if is_layer(layer, "Pooling"):
+        return (type(layer), layer.padding, layer.kernel_size, layer.stride)
+    return (type(layer),)
+
+
+def descriptor_key(descriptor):
+    """A hashable key of a NetworkDescriptor. Descriptors with the same key have zero distance.
+    The key is computed once and kept in the descriptor until it is modified."""
+    key = getattr(descriptor, "key", None)
+    if key is None:
+        key = (tuple(layer_signature(layer) for layer in descriptor.layers),
+               tuple(descriptor.skip_connections))
+        descriptor.key = key
+    return key
+
+
+def batch_layers_distance(distance_list):
+    """The distances between the layers of one neural network and the layers of several others.
+    It is the same dynamic programming as ``layers_distance``, run across all the pairs at once,
+    and each row is solved with a prefix minimum instead of a loop.
+    Args:
+        distance_list: A list of layer distance matrices, one for each pair,
+            with the layers of the first network as rows.
+    Returns:
+        A numpy array of the layers distances.
+    """
+    len_a = distance_list[0].shape[0]
+    len_b = np.array([distance.shape[1] for distance in distance_list])
+    max_len_b = len_b.max()
+    layer_dist = np.zeros((len(distance_list), len_a, max_len_b))
+    for index, distance in enumerate(distance_list):
+        layer_dist[index, :, :distance.shape[1]] = distance
+    columns = np.arange(max_len_b + 1, dtype=float)
+    # f[:, j] is the distance between the first i layers of a and the first j layers of b
+    f = np.tile(columns, (len(distance_list), 1))
+    for i in range(len_a):
+        candidates = np.empty_like(f)
+        candidates[:, 0] = i + 1
+        candidates[:, 1:] = np.minimum(f[:, 1:] + 1, f[:, :-1] + layer_dist[:, i])
+        # f[j] = min(candidates[j], f[j - 1] + 1)
+        f = np.minimum.accumulate(candidates - columns, axis=1) + columns
+    return f[np.arange(len(distance_list)), len_b]
+
+
+class EditDistanceCache:
+    """Cache of the edit-distances between neural architectures.
+    Descriptors are identified by ``descriptor_key``, and layer distances are computed once for each pair of
+    layer signatures, so that the distances of new descriptors can be computed in batch.
+    Attributes:
+        max_size: The maximum number of cached distances. The cache is cleared when it is exceeded.
+    """
+
+    def __init__(self, max_size=200000):
+        self.max_size = max_size
+        self._signature_index = {}
+        self._layers = []
+        self._layer_distance = np.zeros((0, 0))
+        self._distances = {}
+
+    def _layer_indices(self, descriptor):
+        indices = []
+        new_layers = []
+        for layer in descriptor.layers:
+            signature = layer_signature(layer)
+            if signature not in self._signature_index:
+                self._signature_index[signature] = len(self._layers) + len(new_layers)
+                new_layers.append(layer)
+            indices.append(self._signature_index[signature])
+        if new_layers:
+            old_num = len(self._layers)
+            self._layers.extend(new_layers)
+            layer_distance_matrix = np.zeros((len(self._layers), len(self._layers)))
+            layer_distance_matrix[:old_num, :old_num] = self._layer_distance
+            for i, layer_a in enumerate(self._layers):
+                for j, layer_b in enumerate(self._layers):
+                    if i >= old_num or j >= old_num:
+                        layer_distance_matrix[i][j] = layer_distance(layer_a, layer_b)
+            self._layer_distance = layer_distance_matrix
+        return np.array(indices, dtype=int)
+
+    def distances(self, x, y_list):
+        """The edit-distances between one neural architecture and several others.
+        Args:
+            x: An instance of NetworkDescriptor.
+            y_list: A list of NetworkDescriptor.
+        Returns:
+            A numpy array of the edit-distances.
+        """
+        key_x = descriptor_key(x)
+        keys = [descriptor_key(y) for y in y_list]
+        ret = np.zeros(len(y_list))
+        missing = {}
+        for index, key in enumerate(keys):
+            if (key_x, key) in self._distances:
+                ret[index] = self._distances[(key_x, key)]
+            else:
+                missing.setdefault(key, []).append(index)
+        if not missing:
+            return ret
+        if len(self._distances) + len(missing) > self.max_size:
+            self._distances.clear()
+        missing_keys = list(missing.keys())
+        missing_y = [y_list[missing[key][0]] for key in missing_keys]
+        indices_x = self._layer_indices(x)
+        if len(indices_x) > 0:
+            indices_y = [self._layer_indices(y) for y in missing_y]
+            distance_list = [self._layer_distance[np.ix_(indices_x, indices)] for indices in indices_y]
+            distance = batch_layers_distance(distance_list)
+        else:
+            distance = np.array([float(len(y.layers)) for y in missing_y])
+        for key, y, value in zip(missing_keys, missing_y, distance):
+            value += Constant.KERNEL_LAMBDA * skip_connections_distance(x.skip_connections, y.skip_connections)
+            self._distances[(key_x, key)] = value
+            ret[missing[key]] = value
+        return ret
+
+
 def edit_distance(x, y):
     """The distance between two neural networks.
     Args:
@@ -124,6 +247,8 @@ class IncrementalGaussianProcess:
         self._first_fitted = False
         self._l_matrix = None
         self._alpha_vector = None
+        self._k_inv = None
+        self.distance_cache = EditDistanceCache()
 
     @property
     def kernel_matrix(self):
@@ -151,9 +276,9 @@ class IncrementalGaussianProcess:
         train_x, train_y = np.array(train_x), np.array(train_y)
 
         # Incrementally compute K
-        up_right_k = edit_distance_matrix(self._x, train_x)
+        up_right_k = edit_distance_matrix(self._x, train_x, self.distance_cache)
         down_left_k = np.transpose(up_right_k)
-        down_right_k = edit_distance_matrix(train_x)
+        down_right_k = edit_distance_matrix(train_x, cache=self.distance_cache)
         up_k = np.concatenate((self._distance_matrix, up_right_k), axis=1)
         down_k = np.concatenate((down_left_k, down_right_k), axis=1)
         temp_distance_matrix = np.concatenate((up_k, down_k), axis=0)
@@ -173,6 +298,7 @@ class IncrementalGaussianProcess:
 
         self._alpha_vector = cho_solve(
             (self._l_matrix, True), self._y)  # Line 3
+        self._update_k_inv()
 
         return self
 
@@ -189,7 +315,7 @@ class IncrementalGaussianProcess:
         self._x = np.copy(train_x)
         self._y = np.copy(train_y)
 
-        self._distance_matrix = edit_distance_matrix(self._x)
+        self._distance_matrix = edit_distance_matrix(self._x, cache=self.distance_cache)
         k_matrix = bourgain_embedding_matrix(self._distance_matrix)
         k_matrix[np.diag_indices_from(k_matrix)] += self.alpha
 
@@ -197,10 +323,16 @@ class IncrementalGaussianProcess:
 
         self._alpha_vector = cho_solve(
             (self._l_matrix, True), self._y)  # Line 3
+        self._update_k_inv()
 
         self._first_fitted = True
         return self
 
+    def _update_k_inv(self):
+        """Compute the inverse of K from its Cholesky decomposition once per fit,
+        so that it is not recomputed for every prediction."""
+        self._k_inv = cho_solve((self._l_matrix, True), np.eye(self._l_matrix.shape[0]))
+
     def predict(self, train_x):
         """Predict the result.
         Args:
@@ -209,18 +341,12 @@ class IncrementalGaussianProcess:
             y_mean: The predicted mean.
             y_std: The predicted standard deviation.
         """
-        k_trans = np.exp(-np.power(edit_distance_matrix(train_x, self._x), 2))
+        k_trans = np.exp(-np.power(edit_distance_matrix(train_x, self._x, self.distance_cache), 2))
         y_mean = k_trans.dot(self._alpha_vector)  # Line 4 (y_mean = f_star)
 
-        # compute inverse K_inv of K based on its Cholesky
-        # decomposition L and its inverse L_inv
-        l_inv = solve_triangular(
-            self._l_matrix.T, np.eye(
-                self._l_matrix.shape[0]))
-        k_inv = l_inv.dot(l_inv.T)
         # Compute variance of predictive distribution
-        y_var = np.ones(len(train_x), dtype=np.float)
-        y_var -= np.einsum("ij,ij->i", np.dot(k_trans, k_inv), k_trans)
+        y_var = np.ones(len(train_x), dtype=float)
+        y_var -= np.einsum("ij,ij->i", np.dot(k_trans, self._k_inv), k_trans)
 
         # Check if any of the variances is negative because of
         # numerical issues. If yes: set the variance to 0.
@@ -230,29 +356,27 @@ class IncrementalGaussianProcess:
         return y_mean, np.sqrt(y_var)
 
 
-def edit_distance_matrix(train_x, train_y=None):
+def edit_distance_matrix(train_x, train_y=None, cache=None):
     """Calculate the edit distance.
     Args:
         train_x: A list of neural architectures.
         train_y: A list of neural architectures.
+        cache: An instance of EditDistanceCache to reuse the computed distances.
     Returns:
         An edit-distance matrix.
     """
+    if cache is None:
+        cache = EditDistanceCache()
     if train_y is None:
-        ret = np.zeros((train_x.shape[0], train_x.shape[0]))
+        ret = np.zeros((len(train_x), len(train_x)))
         for x_index, x in enumerate(train_x):
-            for y_index, y in enumerate(train_x):
-                if x_index == y_index:
-                    ret[x_index][y_index] = 0
-                elif x_index < y_index:
-                    ret[x_index][y_index] = edit_distance(x, y)
-                else:
-                    ret[x_index][y_index] = ret[y_index][x_index]
-        return ret
-    ret = np.zeros((train_x.shape[0], train_y.shape[0]))
+            if x_index + 1 < len(train_x):
+                ret[x_index, x_index + 1:] = cache.distances(x, list(train_x[x_index + 1:]))
+        return ret + ret.T
+    ret = np.zeros((len(train_x), len(train_y)))
     for x_index, x in enumerate(train_x):
-        for y_index, y in enumerate(train_y):
-            ret[x_index][y_index] = edit_distance(x, y)
+        if len(train_y) > 0:
+            ret[x_index] = cache.distances(x, list(train_y))
     return ret
 
 
@@ -302,15 +426,22 @@ class BayesianOptimizer:
         gpr: A GaussianProcessRegressor for bayesian optimization.
         beta: The beta in acquisition function. (refer to our paper)
         search_tree: The network morphism search tree.
+        num_workers: The number of processes transforming graphs. With more than one worker,
+            up to ``num_workers`` graphs accepted by simulated annealing are transformed at the same time,
+            and all their children are estimated with one prediction.
+        time_budget: The seconds after which ``generate`` stops searching once a new architecture is found.
     """
 
-    def __init__(self, searcher, t_min, optimizemode, beta=None):
+    def __init__(self, searcher, t_min, optimizemode, beta=None, num_workers=1, time_budget=None):
         self.searcher = searcher
         self.t_min = t_min
         self.optimizemode = optimizemode
         self.gpr = IncrementalGaussianProcess()
         self.beta = beta if beta is not None else Constant.BETA
         self.search_tree = SearchTree()
+        self.num_workers = num_workers
+        self.time_budget = time_budget
+        self.pool = None
 
     def fit(self, x_queue, y_queue):
         """ Fit the optimizer with new architectures and performances.
@@ -354,30 +485,44 @@ class BayesianOptimizer:
         t_min = self.t_min
         alpha = 0.9
         opt_acq = self._get_init_opt_acq_value()
+        deadline = None if self.time_budget is None else time.time() + self.time_budget
         while not pq.empty() and t > t_min:
-            elem = pq.get()
-            if self.optimizemode is OptimizeMode.Maximize:
-                temp_exp = min((elem.metric_value - opt_acq) / t, 1.0)
-            else:
-                temp_exp = min((opt_acq - elem.metric_value) / t, 1.0)
-            ap = math.exp(temp_exp)
-            if ap >= random.uniform(0, 1):
-                for temp_graph in transform(elem.graph):
-                    if contain(descriptors, temp_graph.extract_descriptor()):
+            if deadline is not None and father_id is not None and time.time() > deadline:
+                break
+            accepted = []
+            while not pq.empty() and t > t_min and len(accepted) < self.num_workers:
+                elem = pq.get()
+                if self.optimizemode is OptimizeMode.Maximize:
+                    temp_exp = min((elem.metric_value - opt_acq) / t, 1.0)
+                else:
+                    temp_exp = min((opt_acq - elem.metric_value) / t, 1.0)
+                ap = math.exp(temp_exp)
+                if ap >= random.uniform(0, 1):
+                    accepted.append(elem)
+                t *= alpha
+            if not accepted:
+                continue
+            # check duplication one by one since the accepted children become searched descriptors,
+            # then estimate all the new children with one prediction
+            new_graphs = []
+            for elem, children in zip(accepted, self._transform([elem.graph for elem in accepted])):
+                for temp_graph, temp_descriptor in children:
+                    if contain(descriptors, temp_descriptor, self.gpr.distance_cache):
                         continue
-
-                    temp_acq_value = self.acq(temp_graph)
+                    descriptors.append(temp_descriptor)
+                    new_graphs.append((elem.father_id, temp_graph, temp_descriptor))
+            if new_graphs:
+                mean, std = self.gpr.predict(np.array([descriptor for _, _, descriptor in new_graphs]))
+                for (temp_father_id, temp_graph, _), temp_acq_value in zip(new_graphs, self._acq_value(mean, std)):
                     pq.put(
                         elem_class(
                             temp_acq_value,
-                            elem.father_id,
+                            temp_father_id,
                             temp_graph))
-                    descriptors.append(temp_graph.extract_descriptor())
                     if self._accept_new_acq_value(opt_acq, temp_acq_value):
                         opt_acq = temp_acq_value
-                        father_id = elem.father_id
+                        father_id = temp_father_id
                         target_graph = deepcopy(temp_graph)
-            t *= alpha
 
         # Did not found a not duplicated architecture
         if father_id is None:
@@ -387,10 +532,32 @@ class BayesianOptimizer:
             getattr(nm_graph, args[0])(*list(args[1:]))
         return nm_graph, father_id
 
+    def _transform(self, graphs):
+        """Transform the graphs, in the pool of processes if there are more than one.
+        Returns:
+            A list of lists of the children and their descriptors, one list for each graph.
+        """
+        if self.num_workers <= 1 or len(graphs) <= 1:
+            return [_transform_with_descriptors((graph, None)) for graph in graphs]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.num_workers)
+        # the processes are seeded from the random state of this process, so that the search is reproducible
+        seeds = [random.randrange(1 << 32) for _ in graphs]
+        return self.pool.map(_transform_with_descriptors, zip(graphs, seeds))
+
+    def close(self):
+        """Terminate the pool of processes."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
     def acq(self, graph):
         ''' estimate the value of generated graph
         '''
         mean, std = self.gpr.predict(np.array([graph.extract_descriptor()]))
+        return self._acq_value(mean, std)
+
+    def _acq_value(self, mean, std):
         if self.optimizemode is OptimizeMode.Maximize:
             return mean + self.beta * std
         return mean - self.beta * std
@@ -417,6 +584,13 @@ class BayesianOptimizer:
         self.search_tree.add_child(father_id, model_id)
 
 
+def _transform_with_descriptors(args):
+    graph, seed = args
+    if seed is not None:
+        random.seed(seed)
+    return [(temp_graph, temp_graph.extract_descriptor()) for temp_graph in transform(graph)]
+
+
 @total_ordering
 class Elem:
     """Elements to be sorted according to metric value."""
@@ -440,12 +614,13 @@ class ReverseElem(Elem):
         return self.metric_value > other.metric_value
 
 
-def contain(descriptors, target_descriptor):
+def contain(descriptors, target_descriptor, cache=None):
     """Check if the target descriptor is in the descriptors."""
-    for descriptor in descriptors:
-        if edit_distance(descriptor, target_descriptor) < 1e-5:
-            return True
-    return False
+    if not descriptors:
+        return False
+    if cache is None:
+        cache = EditDistanceCache()
+    return bool(np.any(cache.distances(target_descriptor, descriptors) < 1e-5))
 
 
 class SearchTree:
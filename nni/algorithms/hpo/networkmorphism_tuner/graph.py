@@ -50,6 +50,7 @@ class NetworkDescriptor:
     def __init__(self):
         self.skip_connections = []
         self.layers = []
+        self.key = None
 
     @property
     def n_layers(self):
@@ -68,6 +69,7 @@ class NetworkDescriptor:
                 "or NetworkDescriptor.ADD_CONNECT."
             )
         self.skip_connections.append((u, v, connection_type))
+        self.key = None
 
     def to_json(self):
         ''' NetworkDescriptor to json representation
@@ -83,6 +85,7 @@ class NetworkDescriptor:
         '''
 
         self.layers.append(layer)
+        self.key = None
 
 
 class Node:
@@ -931,8 +934,9 @@ def graph_to_json(graph, json_model_path):
     return json_out
 
 
-def json_to_graph(json_model: str):
-    json_model = json.loads(json_model)
+def json_to_graph(json_model):
+    if isinstance(json_model, str):
+        json_model = json.loads(json_model)
     # restore graph data from json data
     input_shape = tuple(json_model["input_shape"])
     node_list = list()
@@ -0,0 +1,174 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+model_store.py
+"""
+
+import json
+import os
+import zlib
+from collections import OrderedDict
+from copy import deepcopy
+
+from .graph import json_to_graph
+from .layers import layer_description_builder, layer_description_extractor
+from .utils import Constant
+
+DATA_FILE = "models.dat"
+INDEX_FILE = "models.idx"
+
+
+class ModelStore:
+    """
+    Append-only store of the graphs generated by network morphism.
+
+    A morphed graph is stored as a delta, i.e., the id of its father and the morphism operations applied to it,
+    and every ``snapshot_interval`` deltas in a chain the full graph is stored instead, so that materializing
+    a graph replays a bounded number of operations. Records are compressed and appended to a single data file,
+    whose offsets are appended to an index file. Recently materialized graphs are kept in an LRU cache.
+
+    Attributes
+    ----------
+    path : str
+        The directory of the data file and the index file.
+    cache_size : int
+        The number of materialized graphs in the cache. (default: ``Constant.MODEL_CACHE_SIZE``)
+    snapshot_interval : int
+        The max number of deltas between two full graphs in a chain. (default: ``Constant.MODEL_SNAPSHOT_INTERVAL``)
+    index : dict
+        Model id to a tuple of offset, length, father id (``-1`` for a full graph) and depth in the chain.
+    """
+
+    def __init__(self, path, cache_size=Constant.MODEL_CACHE_SIZE,
+                 snapshot_interval=Constant.MODEL_SNAPSHOT_INTERVAL, append=False):
+        """
+        Create a store in ``path``, truncating the existing one unless ``append`` is true.
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.path = path
+        self.cache_size = cache_size
+        self.snapshot_interval = snapshot_interval
+        self.index = {}
+        self.cache = OrderedDict()
+
+        data_path = os.path.join(path, DATA_FILE)
+        index_path = os.path.join(path, INDEX_FILE)
+        if append and os.path.exists(data_path) and os.path.exists(index_path):
+            self._load_index(index_path, os.path.getsize(data_path))
+            self.data_file = open(data_path, "a+b")
+            self.index_file = open(index_path, "a")
+        else:
+            self.data_file = open(data_path, "w+b")
+            self.index_file = open(index_path, "w")
+
+    def _load_index(self, index_path, data_size):
+        with open(index_path) as fin:
+            for line in fin:
+                items = line.split()
+                # skip the last line if it is partially written
+                if len(items) != 5 or not line.endswith("\n"):
+                    break
+                model_id, offset, length, father_id, depth = map(int, items)
+                if offset + length > data_size:
+                    break
+                self.index[model_id] = (offset, length, father_id, depth)
+
+    def __contains__(self, model_id):
+        return model_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, model_id, graph, father_id=-1):
+        """
+        Append a graph to the store. The graph is stored as a delta of its father if its operation history
+        extends that of the father, otherwise as a full graph.
+
+        Parameters
+        ----------
+        model_id : int
+        graph : Graph
+        father_id : int
+            The id of the father in the search tree, ``-1`` for none.
+        """
+        record = None
+        depth = 0
+        if father_id in self.index and self.index[father_id][3] < self.snapshot_interval:
+            father = self._materialize(father_id)
+            n_father_operations = len(father.operation_history)
+            operations = _describe_operations(graph)
+            if len(operations) > n_father_operations and \
+                    operations[:n_father_operations] == _describe_operations(father):
+                record = {"father_id": father_id, "operations": operations[n_father_operations:]}
+                depth = self.index[father_id][3] + 1
+        if record is None:
+            father_id = -1
+            record = {"graph": graph.produce_json_model()}
+
+        data = zlib.compress(json.dumps(record, separators=(",", ":")).encode())
+        self.data_file.seek(0, os.SEEK_END)
+        offset = self.data_file.tell()
+        self.data_file.write(data)
+        self.data_file.flush()
+        self.index[model_id] = (offset, len(data), father_id, depth)
+        self.index_file.write("%d %d %d %d %d\n" % (model_id, offset, len(data), father_id, depth))
+        self.index_file.flush()
+        self._cache(model_id, deepcopy(graph))
+
+    def get(self, model_id):
+        """
+        Get a copy of the graph of ``model_id``, which can be modified by the caller.
+        """
+        return deepcopy(self._materialize(model_id))
+
+    def _materialize(self, model_id):
+        if model_id in self.cache:
+            self.cache.move_to_end(model_id)
+            return self.cache[model_id]
+        if model_id not in self.index:
+            raise KeyError("Model {} is not in the store.".format(model_id))
+        offset, length, father_id, _ = self.index[model_id]
+        self.data_file.seek(offset)
+        record = json.loads(zlib.decompress(self.data_file.read(length)).decode())
+        if father_id < 0:
+            graph = json_to_graph(record["graph"])
+        else:
+            graph = deepcopy(self._materialize(father_id))
+            for operation in record["operations"]:
+                _apply_operation(graph, operation)
+        self._cache(model_id, graph)
+        return graph
+
+    def _cache(self, model_id, graph):
+        self.cache[model_id] = graph
+        self.cache.move_to_end(model_id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def close(self):
+        self.data_file.close()
+        self.index_file.close()
+
+
+def _describe_operations(graph):
+    # the layer inserted by ``to_deeper_model`` is described without its input and output nodes,
+    # which are connected when the operation is applied
+    operations = []
+    for operation in graph.operation_history:
+        if operation[0] == "to_deeper_model":
+            description = list(layer_description_extractor(operation[2], graph.node_to_id))
+            description[1] = description[2] = None
+            operations.append([operation[0], operation[1], description])
+        else:
+            operations.append(list(operation))
+    return operations
+
+
+def _apply_operation(graph, operation):
+    if operation[0] == "to_deeper_model":
+        new_layer = layer_description_builder(operation[2], {None: None})
+        graph.to_deeper_model(operation[1], new_layer)
+    else:
+        getattr(graph, operation[0])(*operation[1:])
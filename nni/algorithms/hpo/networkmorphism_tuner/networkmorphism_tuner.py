@@ -5,15 +5,16 @@
 networkmorphsim_tuner.py
 """
 
+import json
 import logging
 import os
-from schema import Optional, Schema
+from schema import And, Optional, Or, Schema
 from nni.tuner import Tuner
 from nni.utils import OptimizeMode, extract_scalar_reward
 from .bayesian import BayesianOptimizer
 from .nn import CnnGenerator, MlpGenerator
 from .utils import Constant
-from .graph import graph_to_json, json_to_graph
+from .model_store import ModelStore
 from nni import ClassArgsValidator
 
 logger = logging.getLogger("NetworkMorphism_AutoML")
@@ -25,7 +26,11 @@ class NetworkMorphismClassArgsValidator(ClassArgsValidator):
             Optional('task'): self.choices('task', 'cv', 'nlp', 'common'),
             Optional('input_width'): int,
             Optional('input_channel'): int,
-            Optional('n_output_node'): int
+            Optional('n_output_node'): int,
+            Optional('generate_workers'): self.range('generate_workers', int, 1, 99999),
+            # an integer number of seconds is accepted as well
+            Optional('generate_time_budget'): And(Or(int, float), lambda n: 0 <= n <= 99999,
+                                                  error='generate_time_budget should be a number in range of (0, 99999)!')
         }).validate(kwargs)
 
 class NetworkMorphismTuner(Tuner):
@@ -56,6 +61,13 @@ class NetworkMorphismTuner(Tuner):
         default model length (default: ``Constant.MODEL_LEN``)
     default_model_width : int
         default model width (default: ``Constant.MODEL_WIDTH``)
+    generate_workers : int
+        The number of processes transforming graphs when generating a new architecture. (default: ``1``)
+    generate_time_budget : float
+        The seconds after which generating stops searching once a new architecture is found.
+        (default: ``None``, i.e., no limit)
+    model_store : ModelStore
+        The store of generated model graphs in ``path``.
     search_space : dict
     """
 
@@ -74,6 +86,8 @@ class NetworkMorphismTuner(Tuner):
             max_model_size=Constant.MAX_MODEL_SIZE,
             default_model_len=Constant.MODEL_LEN,
             default_model_width=Constant.MODEL_WIDTH,
+            generate_workers=1,
+            generate_time_budget=None,
     ):
         """
         initilizer of the NetworkMorphismTuner.
@@ -103,10 +117,11 @@ class NetworkMorphismTuner(Tuner):
         self.model_count = 0
 
         self.bo = BayesianOptimizer(
-            self, self.t_min, self.optimize_mode, self.beta)
+            self, self.t_min, self.optimize_mode, self.beta, generate_workers, generate_time_budget)
         self.training_queue = []
         self.descriptors = []
         self.history = []
+        self.model_store = ModelStore(self.path)
 
         self.max_model_size = max_model_size
         self.default_model_len = default_model_len
@@ -114,6 +129,18 @@ class NetworkMorphismTuner(Tuner):
 
         self.search_space = dict()
 
+    def close(self):
+        """
+        Terminate the processes generating architectures and close the files of the model store.
+        """
+        self.bo.close()
+        self.model_store.close()
+
+    def _on_exit(self):
+        self.close()
+
+    def _on_error(self):
+        self.close()
 
     def update_search_space(self, search_space):
         """
@@ -144,9 +171,8 @@ class NetworkMorphismTuner(Tuner):
 
         graph, father_id, model_id = self.training_queue.pop(0)
 
-        # from graph to json
-        json_model_path = os.path.join(self.path, str(model_id) + ".json")
-        json_out = graph_to_json(graph, json_model_path)
+        self.model_store.add(model_id, graph, father_id)
+        json_out = json.dumps(graph.produce_json_model())
         self.total_data[parameter_id] = (json_out, father_id, model_id)
 
         return json_out
@@ -287,12 +313,7 @@ class NetworkMorphismTuner(Tuner):
         load_model : Graph
             the model graph representation
         """
-
-        with open(os.path.join(self.path, str(model_id) + ".json")) as fin:
-            json_str = fin.read().replace("\n", "")
-
-        load_model = json_to_graph(json_str)
-        return load_model
+        return self.model_store.get(model_id)
 
     def load_best_model(self):
         """
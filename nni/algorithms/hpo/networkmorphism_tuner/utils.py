@@ -21,3 +21,5 @@ class Constant:
     CONV_BLOCK_DISTANCE = 2
     BATCH_SIZE = 128
     T_MIN = 0.0001
+    MODEL_CACHE_SIZE = 128
+    MODEL_SNAPSHOT_INTERVAL = 16
@@ -5,6 +5,11 @@ import copy
 import logging
 import os
 import random
+import shutil
+import threading
+import time
+from functools import partial
+from multiprocessing.dummy import Pool as ThreadPool
 import numpy as np
 from schema import Schema, Optional
 
@@ -12,7 +17,7 @@ import nni
 from nni import ClassArgsValidator
 import nni.parameter_expressions
 from nni.tuner import Tuner
-from nni.utils import OptimizeMode, extract_scalar_reward, split_index, json2parameter, json2space
+from nni.utils import OptimizeMode, extract_scalar_reward, split_index, CompiledSearchSpace
 
 
 logger = logging.getLogger('pbt_tuner_AutoML')
@@ -144,6 +149,42 @@ def exploit_and_explore(bot_trial_info, top_trial_info, factor, resample_probabi
     bot_trial_info.clean_id()
 
 
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def copy_checkpoint(src, dst):
+    """
+    Copy checkpoint directory ``src`` to ``dst``.
+    Files are hard linked when the file system supports it, otherwise copied.
+    The directory is copied to a temporary location first and then renamed,
+    so ``dst`` either does not exist or contains the complete checkpoint.
+
+    Parameters
+    ----------
+    src : str
+        checkpoint directory to copy from
+    dst : str
+        checkpoint directory to copy to
+
+    Returns
+    -------
+    float
+        seconds used for copying
+    """
+    start_time = time.time()
+    tmp_dst = dst + '.tmp'
+    for path in [tmp_dst, dst]:
+        if os.path.exists(path):
+            shutil.rmtree(path)
+    shutil.copytree(src, tmp_dst, copy_function=_link_or_copy)
+    os.replace(tmp_dst, dst)
+    return time.time() - start_time
+
+
 class TrialInfo:
     """
     Information of each trial, refresh for each epoch
@@ -159,6 +200,13 @@ class TrialInfo:
     def clean_id(self):
         self.parameter_id = None
 
+    def to_dict(self):
+        return {
+            'checkpoint_dir': self.checkpoint_dir,
+            'hyper_parameters': self.hyper_parameters,
+            'score': self.score
+        }
+
 class PBTClassArgsValidator(ClassArgsValidator):
     def validate_class_args(self, **kwargs):
         Schema({
@@ -167,11 +215,13 @@ class PBTClassArgsValidator(ClassArgsValidator):
             Optional('population_size'): self.range('population_size', int, 0, 99999),
             Optional('factors'): float,
             Optional('fraction'): float,
+            Optional('copy_checkpoint'): bool,
+            Optional('copy_workers'): self.range('copy_workers', int, 1, 99999),
         }).validate(kwargs)
 
 class PBTTuner(Tuner):
     def __init__(self, optimize_mode="maximize", all_checkpoint_dir=None, population_size=10, factor=0.2,
-                 resample_probability=0.25, fraction=0.2):
+                 resample_probability=0.25, fraction=0.2, copy_checkpoint=False, copy_workers=4):
         """
         Initialization
 
@@ -189,6 +239,12 @@ class PBTTuner(Tuner):
             probability for resampling
         fraction : float
             fraction for selecting bottom and top trials
+        copy_checkpoint : bool
+            whether to copy the checkpoint of a top trial into the directory of the bottom trial exploiting it.
+            If false, the bottom trial loads the checkpoint from the directory of the top trial directly.
+            Copies are made in background, and each trial is started as soon as its own copy completes.
+        copy_workers : int
+            number of threads for copying checkpoints
         """
         self.optimize_mode = OptimizeMode(optimize_mode)
         if all_checkpoint_dir is None:
@@ -199,6 +255,8 @@ class PBTTuner(Tuner):
         self.factor = factor
         self.resample_probability = resample_probability
         self.fraction = fraction
+        self.copy_checkpoint = copy_checkpoint
+        self.copy_workers = copy_workers
         # defined in trial code
         #self.perturbation_interval = perturbation_interval
 
@@ -215,6 +273,13 @@ class PBTTuner(Tuner):
         self.space = None
 
         self.send_trial_callback = None
+        # checkpoint copies in progress, [key, value] = [id of TrialInfo, source directory]
+        self.copying = {}
+        self.copy_pool = None
+        # copies complete in pool threads, which send parameters of the waiting trials
+        self.lock = threading.RLock()
+        # checkpoint loaded before search space is received
+        self._checkpoint_state = None
 
         logger.info('PBT tuner initialization')
 
@@ -229,23 +294,20 @@ class PBTTuner(Tuner):
         """
         logger.info('Update search space %s', search_space)
         self.searchspace_json = search_space
-        self.space = json2space(self.searchspace_json)
+        self.compiled_space = CompiledSearchSpace(self.searchspace_json)
+        self.space = self.compiled_space.names
 
         self.random_state = np.random.RandomState()
         self.population = []
-        is_rand = dict()
-
-        for item in self.space:
-            is_rand[item] = True
 
         for i in range(self.population_size):
-            hyper_parameters = json2parameter(
-                self.searchspace_json, is_rand, self.random_state)
-            hyper_parameters = split_index(hyper_parameters)
+            hyper_parameters = split_index(self.compiled_space.sample(self.random_state))
             checkpoint_dir = os.path.join(self.all_checkpoint_dir, str(i))
             hyper_parameters['load_checkpoint_dir'] = os.path.join(checkpoint_dir, str(self.epoch))
             hyper_parameters['save_checkpoint_dir'] = os.path.join(checkpoint_dir, str(self.epoch))
             self.population.append(TrialInfo(checkpoint_dir=checkpoint_dir, hyper_parameters=hyper_parameters))
+        if self._checkpoint_state is not None:
+            self._restore_checkpoint()
 
     def generate_multiple_parameters(self, parameter_id_list, **kwargs):
         """
@@ -295,17 +357,78 @@ class PBTTuner(Tuner):
             One newly generated configuration
 
         """
-        if self.pos == self.population_size - 1:
-            logger.debug('Credit added by one in parameters request')
-            self.credit += 1
-            self.param_ids.append(parameter_id)
-            raise nni.NoMoreTrialError('No more parameters now.')
+        with self.lock:
+            index = self._next_ready_trial()
+            if index is None:
+                logger.debug('Credit added by one in parameters request')
+                self.credit += 1
+                self.param_ids.append(parameter_id)
+                raise nni.NoMoreTrialError('No more parameters now.')
+            trial_info = self._start_trial(index, parameter_id)
+        logger.info('Generate parameter : %s', trial_info.hyper_parameters)
+        return trial_info.hyper_parameters
+
+    def _next_ready_trial(self):
+        """
+        Index of the first trial in population which is not started and whose checkpoint is ready,
+        ``None`` if there is no such trial.
+        """
+        for index in range(self.pos + 1, len(self.population)):
+            if id(self.population[index]) not in self.copying:
+                return index
+        return None
+
+    def _start_trial(self, index, parameter_id):
+        """
+        Move the trial at ``index`` to the position of the next trial and mark it as running.
+        """
         self.pos += 1
+        self.population[self.pos], self.population[index] = self.population[index], self.population[self.pos]
         trial_info = self.population[self.pos]
         trial_info.parameter_id = parameter_id
         self.running[parameter_id] = trial_info
-        logger.info('Generate parameter : %s', trial_info.hyper_parameters)
-        return trial_info.hyper_parameters
+        return trial_info
+
+    def _send_ready_trials(self):
+        """
+        Send parameters of ready trials to the parameter requests which are not satisfied yet.
+        """
+        while self.credit > 0:
+            index = self._next_ready_trial()
+            if index is None:
+                break
+            self.credit -= 1
+            parameter_id = self.param_ids.pop()
+            trial_info = self._start_trial(index, parameter_id)
+            self.send_trial_callback(parameter_id, trial_info.hyper_parameters)
+
+    def _copy_checkpoint_async(self, trial_info):
+        """
+        Copy the checkpoint that ``trial_info`` should load into its own directory in background.
+        The trial is not started until the copy completes.
+        """
+        if self.copy_pool is None:
+            self.copy_pool = ThreadPool(self.copy_workers)
+        src = trial_info.hyper_parameters['load_checkpoint_dir']
+        dst = os.path.join(trial_info.checkpoint_dir, 'exploit', str(self.epoch))
+        trial_info.hyper_parameters['load_checkpoint_dir'] = dst
+        self.copying[id(trial_info)] = src
+        self.copy_pool.apply_async(copy_checkpoint, (src, dst),
+                                   callback=partial(self._on_copy_done, trial_info, src, dst),
+                                   error_callback=partial(self._on_copy_failed, trial_info, src))
+
+    def _on_copy_done(self, trial_info, src, dst, seconds):
+        with self.lock:
+            logger.info('Copied checkpoint %s to %s in %.3f seconds', src, dst, seconds)
+            self.copying.pop(id(trial_info), None)
+            self._send_ready_trials()
+
+    def _on_copy_failed(self, trial_info, src, error):
+        with self.lock:
+            logger.warning('Failed to copy checkpoint %s, the trial will load it directly: %s', src, error)
+            trial_info.hyper_parameters['load_checkpoint_dir'] = src
+            self.copying.pop(id(trial_info), None)
+            self._send_ready_trials()
 
     def _proceed_next_epoch(self):
         """
@@ -324,6 +447,8 @@ class PBTTuner(Tuner):
         for bottom in bottoms:
             top = np.random.choice(tops)
             exploit_and_explore(bottom, top, self.factor, self.resample_probability, self.epoch, self.searchspace_json)
+            if self.copy_checkpoint:
+                self._copy_checkpoint_async(bottom)
         for trial in self.finished:
             if trial not in bottoms:
                 trial.clean_id()
@@ -333,14 +458,7 @@ class PBTTuner(Tuner):
         for _ in range(self.population_size):
             trial_info = self.finished.pop()
             self.population.append(trial_info)
-        while self.credit > 0 and self.pos + 1 < len(self.population):
-            self.credit -= 1
-            self.pos += 1
-            parameter_id = self.param_ids.pop()
-            trial_info = self.population[self.pos]
-            trial_info.parameter_id = parameter_id
-            self.running[parameter_id] = trial_info
-            self.send_trial_callback(parameter_id, trial_info.hyper_parameters)
+        self._send_ready_trials()
 
     def receive_trial_result(self, parameter_id, parameters, value, **kwargs):
         """
@@ -358,12 +476,13 @@ class PBTTuner(Tuner):
         """
         logger.info('Get one trial result, id = %d, value = %s', parameter_id, value)
         value = extract_scalar_reward(value)
-        trial_info = self.running.pop(parameter_id, None)
-        trial_info.score = value
-        self.finished.append(trial_info)
-        self.finished_trials += 1
-        if self.finished_trials == self.population_size:
-            self._proceed_next_epoch()
+        with self.lock:
+            trial_info = self.running.pop(parameter_id, None)
+            trial_info.score = value
+            self.finished.append(trial_info)
+            self.finished_trials += 1
+            if self.finished_trials == self.population_size:
+                self._proceed_next_epoch()
 
     def trial_end(self, parameter_id, success, **kwargs):
         """
@@ -384,12 +503,13 @@ class PBTTuner(Tuner):
             value = float('inf')
         else:
             value = float('-inf')
-        trial_info = self.running.pop(parameter_id, None)
-        trial_info.score = value
-        self.finished.append(trial_info)
-        self.finished_trials += 1
-        if self.finished_trials == self.population_size:
-            self._proceed_next_epoch()
+        with self.lock:
+            trial_info = self.running.pop(parameter_id, None)
+            trial_info.score = value
+            self.finished.append(trial_info)
+            self.finished_trials += 1
+            if self.finished_trials == self.population_size:
+                self._proceed_next_epoch()
 
     def import_data(self, data):
         """
@@ -454,3 +574,54 @@ class PBTTuner(Tuner):
         logger.info("Successfully import data to PBT tuner, total data: %d, imported data: %d.", len(data), self.population_size)
         logger.info("Start from epoch %d ...", self.epoch)
         return self.epoch # return for test
+
+    def save_checkpoint(self):
+        """
+        Save the population of current epoch.
+        Running trials are saved as not started, because they are not resumed with the experiment.
+        """
+        if self.population is None:
+            return
+        with self.lock:
+            pending = []
+            for trial_info in self.population:
+                if any(trial_info is t for t in self.finished):
+                    continue
+                trial_dict = trial_info.to_dict()
+                if id(trial_info) in self.copying:
+                    # copy may be incomplete, load from the source directly after resuming
+                    trial_dict['hyper_parameters'] = dict(trial_dict['hyper_parameters'],
+                                                          load_checkpoint_dir=self.copying[id(trial_info)])
+                pending.append(trial_dict)
+            self._save_state({
+                'epoch': self.epoch,
+                'finished': [trial_info.to_dict() for trial_info in self.finished],
+                'pending': pending
+            })
+
+    def load_checkpoint(self):
+        """
+        Load the checkpoint saved by :meth:`save_checkpoint`. The population is restored in :meth:`update_search_space`.
+
+        Returns
+        -------
+        bool
+            Whether a checkpoint is found.
+        """
+        state = self._load_state()
+        if state is None:
+            return False
+        self._checkpoint_state = state
+        return True
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint_state
+        self._checkpoint_state = None
+        self.epoch = state['epoch']
+        self.finished = [TrialInfo(**trial_info) for trial_info in state['finished']]
+        self.population = self.finished + [TrialInfo(**trial_info) for trial_info in state['pending']]
+        self.finished_trials = len(self.finished)
+        self.pos = self.finished_trials - 1
+        self.running = {}
+        logger.info('Restored epoch %d from checkpoint, %d of %d trials finished',
+                    self.epoch, self.finished_trials, len(self.population))
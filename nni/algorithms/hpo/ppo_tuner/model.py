@@ -116,6 +116,20 @@ class Model:
         self.initial_state = act_model.initial_state
 
         initialize()
+        self.variables = tf.global_variables()
+
+    def get_weights(self):
+        """
+        Get values of all the variables (including optimizer states) as a list of numpy arrays.
+        """
+        return self.sess.run(self.variables)
+
+    def set_weights(self, weights):
+        """
+        Set values of all the variables from the list returned by :meth:`get_weights`.
+        """
+        for var, value in zip(self.variables, weights):
+            var.load(value, self.sess)
 
     def train(self, lr, cliprange, obs, returns, masks, actions, values, neglogpacs, states=None):
         """
@@ -8,6 +8,9 @@ ppo_tuner.py including:
 
 import copy
 import logging
+import threading
+import time
+from multiprocessing.dummy import Pool as ThreadPool
 import numpy as np
 from gym import spaces
 from schema import Schema, Optional
@@ -76,6 +79,24 @@ class TrialsInfo:
         self.inf_batch_size = inf_batch_size
         #self.states = None
 
+        self.results = [None for _ in range(inf_batch_size)] # final results of the trials
+        self.finished = 0                                    # number of finished trials
+
+    def set_result(self, idx, value):
+        """
+        Record final result of the ``idx``-th trial, returns whether all the trials of this batch are finished
+        """
+        self.results[idx] = value
+        self.finished += 1
+        return self.finished == self.inf_batch_size
+
+    def mean_result(self):
+        """
+        Mean of final results of the finished trials, 0 if no trial is finished
+        """
+        values = [val for val in self.results if val is not None]
+        return (sum(values) / len(values)) if values else 0
+
     def get_next(self):
         """
         Get actions of the next trial
@@ -148,6 +169,8 @@ class PPOModel:
                            max_grad_norm=model_config.max_grad_norm, np_mask=self.np_mask)
 
         self.states = self.model.initial_state
+        # inference and training could run in different threads, weights should not change in an inference
+        self.lock = threading.Lock()
 
         logger.info('=== finished PPOModel initialization')
 
@@ -176,6 +199,10 @@ class PPOModel:
         last_values : tensorflow tensor
             The last values of the ``num`` configurations, got with session run
         """
+        with self.lock:
+            return self._inference(num)
+
+    def _inference(self, num):
         # Here, we init the lists that will contain the mb of experiences
         mb_obs, mb_actions, mb_values, mb_dones, mb_neglogpacs = [], [], [], [], []
         # initial observation
@@ -276,16 +303,26 @@ class PPOModel:
         envsperbatch = nenvs // self.model_config.nminibatches
         envinds = np.arange(nenvs)
         flatinds = np.arange(nenvs * self.model_config.nsteps).reshape(nenvs, self.model_config.nsteps)
-        for _ in range(self.model_config.noptepochs):
-            np.random.shuffle(envinds)
-            for start in range(0, nenvs, envsperbatch):
-                end = start + envsperbatch
-                mbenvinds = envinds[start:end]
-                mbflatinds = flatinds[mbenvinds].ravel()
-                slices = (arr[mbflatinds] for arr in (trials_info.obs, trials_info.returns, trials_info.dones,
-                                                      trials_info.actions, trials_info.values, trials_info.neglogpacs))
-                mbstates = states[mbenvinds]
-                self.model.train(lrnow, cliprangenow, *slices, mbstates)
+        # inference should not run with the weights of a partial update
+        with self.lock:
+            for _ in range(self.model_config.noptepochs):
+                np.random.shuffle(envinds)
+                for start in range(0, nenvs, envsperbatch):
+                    end = start + envsperbatch
+                    mbenvinds = envinds[start:end]
+                    mbflatinds = flatinds[mbenvinds].ravel()
+                    slices = (arr[mbflatinds] for arr in (trials_info.obs, trials_info.returns, trials_info.dones,
+                                                          trials_info.actions, trials_info.values,
+                                                          trials_info.neglogpacs))
+                    mbstates = states[mbenvinds]
+                    self.model.train(lrnow, cliprangenow, *slices, mbstates)
+
+    def get_weights(self):
+        """
+        Get weights of the policy/value network, consistent even if training is in progress
+        """
+        with self.lock:
+            return self.model.get_weights()
 
 class PPOClassArgsValidator(ClassArgsValidator):
     def validate_class_args(self, **kwargs):
@@ -301,6 +338,7 @@ class PPOClassArgsValidator(ClassArgsValidator):
             Optional('gamma'):  float,
             Optional('lam'):  float,
             Optional('cliprange'): float,
+            Optional('max_pending_batches'): self.range('max_pending_batches', int, 1, 99999),
         }).validate(kwargs)
 
 class PPOTuner(Tuner):
@@ -311,7 +349,8 @@ class PPOTuner(Tuner):
     """
 
     def __init__(self, optimize_mode, trials_per_update=20, epochs_per_update=4, minibatch_size=4,
-                 ent_coef=0.0, lr=3e-4, vf_coef=0.5, max_grad_norm=0.5, gamma=0.99, lam=0.95, cliprange=0.2):
+                 ent_coef=0.0, lr=3e-4, vf_coef=0.5, max_grad_norm=0.5, gamma=0.99, lam=0.95, cliprange=0.2,
+                 max_pending_batches=1):
         """
         Initialization, PPO model is not initialized here as search space is not received yet.
 
@@ -339,25 +378,37 @@ class PPOTuner(Tuner):
             Advantage estimation discounting factor (lambda in the paper)
         cliprange : float
             Cliprange in the PPO algorithm, constant
+        max_pending_batches : int
+            Maximum number of inference batches which are generated but not used to update the model yet.
+            With 1, a new batch is generated after the model is updated with the previous batch.
+            With a larger number, new batches are generated with the current model when all the trials of
+            previous batches are running, so that trial concurrency can exceed ``trials_per_update``.
         """
         self.optimize_mode = OptimizeMode(optimize_mode)
         self.model_config = ModelConfig()
         self.model = None
         self.search_space = None
-        self.running_trials = {}                  # key: parameter_id, value: actions/states/etc.
+        self.running_trials = {}                  # key: parameter_id, value: (TrialsInfo, index of the trial in it)
         self.inf_batch_size = trials_per_update   # number of trials to generate in one inference
-        self.first_inf = True                     # indicate whether it is the first time to inference new trials
-        self.trials_result = [None for _ in range(self.inf_batch_size)] # results of finished trials
+        self.max_pending_batches = max_pending_batches
 
         self.credit = 0 # record the unsatisfied trial requests
         self.param_ids = []
-        self.finished_trials = 0
         self.chosen_arch_template = {}
 
         self.actions_spaces = None
         self.actions_to_config = None
         self.full_act_space = None
-        self.trials_info = None
+        self.batches = []          # inference batches whose trials are not all finished
+        self.training_batches = 0  # number of finished batches waiting for or in training
+
+        # training runs in background, the lock protects the states above shared with it
+        self.lock = threading.RLock()
+        # notified with the lock held when a training finishes
+        self.train_done = threading.Condition(self.lock)
+        self.train_pool = None
+        # key: 'inference' or 'train', value: dict of count, total and last seconds
+        self.timings = {}
 
         self.all_trials = {} # used to dedup the same trial, key: config, value: final result
 
@@ -366,6 +417,8 @@ class PPOTuner(Tuner):
         self.model_config.nminibatches = minibatch_size
 
         self.send_trial_callback = None
+        # checkpoint loaded before search space is received
+        self._checkpoint_state = None
         logger.info('Finished PPOTuner initialization')
 
     def _process_nas_space(self, search_space):
@@ -463,6 +516,8 @@ class PPOTuner(Tuner):
 
         assert self.model is None
         self.model = PPOModel(self.model_config, mask)
+        if self._checkpoint_state is not None:
+            self._restore_checkpoint()
 
     def _actions_to_config(self, actions):
         """
@@ -534,58 +589,108 @@ class PPOTuner(Tuner):
             One newly generated configuration
 
         """
-        if self.first_inf:
-            self.trials_result = [None for _ in range(self.inf_batch_size)]
-            mb_obs, mb_actions, mb_values, mb_neglogpacs, mb_dones, last_values = self.model.inference(self.inf_batch_size)
-            self.trials_info = TrialsInfo(mb_obs, mb_actions, mb_values, mb_neglogpacs,
-                                          mb_dones, last_values, self.inf_batch_size)
-            self.first_inf = False
+        with self.lock:
+            trial = self._next_trial()
+            if trial is None:
+                logger.debug('Credit added by one in parameters request')
+                self.credit += 1
+                self.param_ids.append(parameter_id)
+                raise nni.NoMoreTrialError('no more parameters now.')
+            self.running_trials[parameter_id] = trial[:2]
+            return self._actions_to_config(trial[2])
 
-        trial_info_idx, actions = self.trials_info.get_next()
-        if trial_info_idx is None:
-            logger.debug('Credit added by one in parameters request')
-            self.credit += 1
-            self.param_ids.append(parameter_id)
-            raise nni.NoMoreTrialError('no more parameters now.')
+    def _record_timing(self, name, seconds):
+        timing = self.timings.setdefault(name, {'count': 0, 'total': 0., 'last': 0.})
+        timing['count'] += 1
+        timing['total'] += seconds
+        timing['last'] = seconds
+        logger.info('PPO %s %d took %.3f seconds', name, timing['count'], seconds)
 
-        self.running_trials[parameter_id] = trial_info_idx
-        new_config = self._actions_to_config(actions)
-        return new_config
-
-    def _next_round_inference(self):
+    def _inference(self):
         """
-        Run a inference to generate next batch of configurations
+        Run a inference to generate next batch of configurations in one batched forward pass
         """
-        logger.debug('Start next round inference...')
-        self.finished_trials = 0
-        self.model.compute_rewards(self.trials_info, self.trials_result)
-        self.model.train(self.trials_info, self.inf_batch_size)
-        self.running_trials = {}
-        # generate new trials
-        self.trials_result = [None for _ in range(self.inf_batch_size)]
+        start_time = time.time()
         mb_obs, mb_actions, mb_values, mb_neglogpacs, mb_dones, last_values = self.model.inference(self.inf_batch_size)
-        self.trials_info = TrialsInfo(mb_obs, mb_actions,
-                                      mb_values, mb_neglogpacs,
-                                      mb_dones, last_values,
-                                      self.inf_batch_size)
-        logger.debug('Next round inference complete.')
-        # check credit and submit new trials
-        for _ in range(self.credit):
-            trial_info_idx, actions = self.trials_info.get_next()
-            if trial_info_idx is None:
-                logger.warning('No enough trial config, trials_per_update is suggested to be larger than trialConcurrency')
+        trials_info = TrialsInfo(mb_obs, mb_actions, mb_values, mb_neglogpacs,
+                                 mb_dones, last_values, self.inf_batch_size)
+        self._record_timing('inference', time.time() - start_time)
+        return trials_info
+
+    def _next_trial(self):
+        """
+        Get the next trial to run, generate a new batch if there is no trial left and pending batches are allowed.
+
+        Returns
+        -------
+        tuple
+            (TrialsInfo, index of the trial, actions), or ``None`` if no trial is available now
+        """
+        for trials_info in self.batches:
+            trial_info_idx, actions = trials_info.get_next()
+            if trial_info_idx is not None:
+                return trials_info, trial_info_idx, actions
+        if len(self.batches) + self.training_batches >= self.max_pending_batches:
+            return None
+        trials_info = self._inference()
+        self.batches.append(trials_info)
+        trial_info_idx, actions = trials_info.get_next()
+        return trials_info, trial_info_idx, actions
+
+    def _send_pending_trials(self):
+        """
+        Send new trials for unsatisfied trial requests
+        """
+        while self.credit > 0:
+            trial = self._next_trial()
+            if trial is None:
                 break
             assert self.param_ids
             param_id = self.param_ids.pop()
-            self.running_trials[param_id] = trial_info_idx
-            new_config = self._actions_to_config(actions)
+            self.running_trials[param_id] = trial[:2]
+            new_config = self._actions_to_config(trial[2])
             self.send_trial_callback(param_id, new_config)
             self.credit -= 1
             logger.debug('Send new trial (%d, %s) for reducing credit', param_id, new_config)
 
+    def _finish_trial(self, trials_info, trial_info_idx, value):
+        """
+        Record result of a trial, and update the model in background when all the trials of its batch are finished
+        """
+        if not trials_info.set_result(trial_info_idx, value):
+            return
+        logger.debug('Start model update with a finished batch...')
+        self.batches.remove(trials_info)
+        self.training_batches += 1
+        if self.train_pool is None:
+            self.train_pool = ThreadPool(1)
+        self.train_pool.apply_async(self._train, (trials_info,),
+                                    callback=self._on_train_done, error_callback=self._on_train_failed)
+
+    def _train(self, trials_info):
+        start_time = time.time()
+        self.model.compute_rewards(trials_info, trials_info.results)
+        self.model.train(trials_info, self.inf_batch_size)
+        return time.time() - start_time
+
+    def _on_train_done(self, seconds):
+        with self.lock:
+            self._record_timing('train', seconds)
+            self.training_batches -= 1
+            # generate trials with the updated model
+            self._send_pending_trials()
+            self.train_done.notify_all()
+
+    def _on_train_failed(self, error):
+        with self.lock:
+            logger.error('Failed to update PPO model: %s', error)
+            self.training_batches -= 1
+            self._send_pending_trials()
+            self.train_done.notify_all()
+
     def receive_trial_result(self, parameter_id, parameters, value, **kwargs):
         """
-        Receive trial's result. if the number of finished trials equals self.inf_batch_size, start the next update to
+        Receive trial's result. if all the trials of an inference batch are finished, start the next update to
         train the model.
 
         Parameters
@@ -597,26 +702,22 @@ class PPOTuner(Tuner):
         value : dict
             Result from trial (the return value of :func:`nni.report_final_result`).
         """
-        trial_info_idx = self.running_trials.pop(parameter_id, None)
-        assert trial_info_idx is not None
-
         value = extract_scalar_reward(value)
         if self.optimize_mode == OptimizeMode.Minimize:
             value = -value
 
-        self.trials_result[trial_info_idx] = value
-        self.finished_trials += 1
-
-        logger.debug('receive_trial_result, parameter_id %d, trial_info_idx %d, finished_trials %d, inf_batch_size %d',
-                     parameter_id, trial_info_idx, self.finished_trials, self.inf_batch_size)
-        if self.finished_trials == self.inf_batch_size:
-            logger.debug('Start next round inference in receive_trial_result')
-            self._next_round_inference()
+        with self.lock:
+            trial = self.running_trials.pop(parameter_id, None)
+            assert trial is not None
+            trials_info, trial_info_idx = trial
+            logger.debug('receive_trial_result, parameter_id %d, trial_info_idx %d, finished_trials %d, inf_batch_size %d',
+                         parameter_id, trial_info_idx, trials_info.finished + 1, self.inf_batch_size)
+            self._finish_trial(trials_info, trial_info_idx, value)
 
     def trial_end(self, parameter_id, success, **kwargs):
         """
         To deal with trial failure. If a trial fails, it is popped out from ``self.running_trials``,
-        and the final result of this trial is assigned with the average of the finished trials.
+        and the final result of this trial is assigned with the average of the finished trials of its batch.
 
         Parameters
         ----------
@@ -628,19 +729,15 @@ class PPOTuner(Tuner):
             Not used
         """
         if not success:
-            if parameter_id not in self.running_trials:
-                logger.warning('The trial is failed, but self.running_trial does not have this trial')
-                return
-            trial_info_idx = self.running_trials.pop(parameter_id, None)
-            assert trial_info_idx is not None
-            # use mean of finished trials as the result of this failed trial
-            values = [val for val in self.trials_result if val is not None]
-            logger.warning('In trial_end, values: %s', values)
-            self.trials_result[trial_info_idx] = (sum(values) / len(values)) if values else 0
-            self.finished_trials += 1
-            if self.finished_trials == self.inf_batch_size:
-                logger.debug('Start next round inference in trial_end')
-                self._next_round_inference()
+            with self.lock:
+                if parameter_id not in self.running_trials:
+                    logger.warning('The trial is failed, but self.running_trial does not have this trial')
+                    return
+                trials_info, trial_info_idx = self.running_trials.pop(parameter_id)
+                # use mean of finished trials as the result of this failed trial
+                value = trials_info.mean_result()
+                logger.warning('In trial_end, use mean of finished trials as the result: %s', value)
+                self._finish_trial(trials_info, trial_info_idx, value)
 
     def import_data(self, data):
         """
@@ -652,3 +749,62 @@ class PPOTuner(Tuner):
             A list of dictionarys, each of which has at least two keys, ``parameter`` and ``value``
         """
         logger.warning('PPOTuner cannot leverage imported data.')
+
+    def save_checkpoint(self):
+        """
+        Save weights of the policy/value network and the trials of inference batches which are not finished.
+        It waits for the training of the finished batches, so that the weights are consistent with the batches.
+        """
+        if self.model is None:
+            return
+        with self.lock:
+            # training holds the model lock for a whole update, and needs this lock to finish,
+            # so the weights are read after it finishes, with this lock released while waiting
+            self.train_done.wait_for(lambda: self.training_batches == 0)
+            state = {
+                'weights': self.model.get_weights(),
+                'cur_update': self.model.cur_update,
+                'batches': [{
+                    'iter': trials_info.iter,
+                    'obs': trials_info.obs,
+                    'actions': trials_info.actions,
+                    'values': trials_info.values,
+                    'neglogpacs': trials_info.neglogpacs,
+                    'dones': trials_info.dones,
+                    'last_value': trials_info.last_value,
+                    'results': trials_info.results
+                } for trials_info in self.batches]
+            }
+        self._save_state(state)
+
+    def load_checkpoint(self):
+        """
+        Load the checkpoint saved by :meth:`save_checkpoint`. The model is restored in :meth:`update_search_space`.
+
+        Returns
+        -------
+        bool
+            Whether a checkpoint is found.
+        """
+        state = self._load_state()
+        if state is None:
+            return False
+        self._checkpoint_state = state
+        return True
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint_state
+        self._checkpoint_state = None
+        self.model.model.set_weights(state['weights'])
+        self.model.cur_update = state['cur_update']
+        for info in state['batches']:
+            trials_info = TrialsInfo(info['obs'], info['actions'], info['values'], info['neglogpacs'],
+                                     info['dones'], info['last_value'], self.inf_batch_size)
+            trials_info.iter = info['iter']
+            self.batches.append(trials_info)
+            # trials running when checkpoint was saved are not resumed, handle them as failed trials
+            finished = [val for val in info['results'] if val is not None]
+            mean_result = (sum(finished) / len(finished)) if finished else 0
+            for idx, value in enumerate(info['results'][:trials_info.iter]):
+                self._finish_trial(trials_info, idx, value if value is not None else mean_result)
+        logger.info('Restored PPO model of update %d from checkpoint', self.model.cur_update)
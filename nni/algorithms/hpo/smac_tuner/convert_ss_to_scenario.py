@@ -111,6 +111,52 @@ def generate_pcs(nni_search_space_content):
     return None
 
 
+def _hashable(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, sort_keys=True)
+
+
+def encode_parameters(parameters, categorical_dict, loguniform_keys):
+    """
+    Convert parameters in NNI format to the values of SMAC3 configurations, i.e., logarithm of ``loguniform`` values
+    and index of categorical values. Values are converted column by column.
+
+    Parameters
+    ----------
+    parameters: list of dict
+        Parameters in NNI format.
+    categorical_dict: dict
+        Categories of each categorical key, returned by :func:`generate_scenario`.
+    loguniform_keys: set
+        Keys of ``loguniform`` type.
+
+    Returns
+    -------
+    list
+        Converted parameters, or ``None`` for those with a categorical value not in the search space.
+    """
+    keys = set().union(*parameters) if parameters else set()
+    valid = np.ones(len(parameters), dtype=bool)
+    columns = {}
+    for key in keys:
+        present = np.array([key in params for params in parameters])
+        if key in loguniform_keys:
+            # 1 is a placeholder of absent values, which are dropped below
+            columns[key] = np.log(np.array([params.get(key, 1.) for params in parameters], dtype=float)).tolist()
+        elif key in categorical_dict:
+            index = {}
+            for i, category in enumerate(categorical_dict[key]):
+                index.setdefault(_hashable(category), i)
+            columns[key] = [index.get(_hashable(params[key])) if key in params else None for params in parameters]
+            valid &= ~present | np.array([i is not None for i in columns[key]])
+        else:
+            columns[key] = [params.get(key) for params in parameters]
+    return [{key: columns[key][i] for key in params} if valid[i] else None for i, params in enumerate(parameters)]
+
+
 def generate_scenario(ss_content):
     """
     Generate the scenario. The scenario-object (smac.scenario.scenario.Scenario) is used to configure SMAC and
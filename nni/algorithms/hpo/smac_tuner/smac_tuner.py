@@ -7,6 +7,9 @@ smac_tuner.py
 
 import logging
 import sys
+import threading
+from collections import deque
+from multiprocessing.dummy import Pool as ThreadPool
 
 import numpy as np
 from schema import Schema, Optional
@@ -22,9 +25,9 @@ from ConfigSpaceNNI import Configuration
 import nni
 from nni import ClassArgsValidator
 from nni.tuner import Tuner
-from nni.utils import OptimizeMode, extract_scalar_reward
+from nni.utils import OptimizeMode, extract_scalar_reward, split_import_data
 
-from .convert_ss_to_scenario import generate_scenario
+from .convert_ss_to_scenario import encode_parameters, generate_scenario
 
 logger = logging.getLogger('smac_AutoML')
 
@@ -32,16 +35,23 @@ class SMACClassArgsValidator(ClassArgsValidator):
     def validate_class_args(self, **kwargs):
         Schema({
             'optimize_mode': self.choices('optimize_mode', 'maximize', 'minimize'),
-            Optional('config_dedup'): bool
+            Optional('config_dedup'): bool,
+            Optional('proposals_per_fit'): self.range('proposals_per_fit', int, 1, 99999),
+            Optional('background_fit'): bool
         }).validate(kwargs)
 
+
+def _config_key(config):
+    return tuple(sorted(config.get_dictionary().items()))
+
+
 class SMACTuner(Tuner):
     """
     This is a wrapper of [SMAC](https://github.com/automl/SMAC3) following NNI tuner interface.
     It only supports ``SMAC`` mode, and does not support the multiple instances of SMAC3 (i.e.,
     the same configuration is run multiple times).
     """
-    def __init__(self, optimize_mode="maximize", config_dedup=False):
+    def __init__(self, optimize_mode="maximize", config_dedup=False, proposals_per_fit=1, background_fit=False):
         """
         Parameters
         ----------
@@ -50,6 +60,13 @@ class SMACTuner(Tuner):
         config_dedup : bool
             If True, the tuner will not generate a configuration that has been already generated.
             If False, a configuration may be generated twice, but it is rare for relatively large search space.
+        proposals_per_fit : int
+            Number of challengers taken from one fit of the random forest. Parameter requests are served from them
+            until they are used up, before the model is fitted again. With 1, the model is fitted for each request.
+        background_fit : bool
+            If True, received results are fed to SMAC3 and the model is fitted in a background thread,
+            while parameter requests are served with challengers of the previous fit.
+            Requests only wait for a fit when all the challengers of the previous one are used up.
         """
         self.logger = logger
         self.optimize_mode = OptimizeMode(optimize_mode)
@@ -62,6 +79,26 @@ class SMACTuner(Tuner):
         self.categorical_dict = {}
         self.cs = None
         self.dedup = config_dedup
+        self.proposals_per_fit = proposals_per_fit
+        self.background_fit = background_fit
+        # checkpoint loaded before search space is received
+        self._checkpoint_state = None
+
+        # keys of the proposed configurations, for dedup
+        self._proposed = set()
+        self._num_received = 0
+        # challengers of the latest fit which are not proposed yet
+        self._challengers = deque()
+        # SMAC3 is not thread safe, it is only used by one thread at a time
+        self._smac_lock = threading.Lock()
+        # with background fitting, challengers of a finished fit replace the above on the next request,
+        # the condition protects the states below shared with the fitting thread
+        self._fit_cond = threading.Condition()
+        self._next_challengers = None
+        self._pending_runs = []
+        self._fitting = False
+        self._fit_error = None
+        self._fit_pool = None
 
     def _main_cli(self):
         """
@@ -153,6 +190,8 @@ class SMACTuner(Tuner):
             self.smbo_solver = self.optimizer.solver
             self.loguniform_key = {key for key in search_space.keys() if search_space[key]['_type'] == 'loguniform'}
             self.update_ss_done = True
+            if self._checkpoint_state is not None:
+                self._restore_checkpoint()
         else:
             self.logger.warning('update search space is not supported.')
 
@@ -181,11 +220,35 @@ class SMACTuner(Tuner):
 
         if parameter_id not in self.total_data:
             raise RuntimeError('Received parameter_id not in total_data.')
+        self._receive_run(self.total_data[parameter_id], reward)
+
+    def _receive_run(self, config, cost):
+        """
+        Feed a finished run into SMAC3. With background fitting, the run is fed before the next fit in background.
+
+        Parameters
+        ----------
+        config : Configuration
+            The configuration of the run.
+        cost : float
+            The cost to minimize.
+        """
+        if self.background_fit:
+            with self._fit_cond:
+                self._num_received += 1
+                self._pending_runs.append((config, cost))
+                if not self._fitting:
+                    self._start_fit(self.proposals_per_fit)
+        else:
+            self._num_received += 1
+            self._feed_run(config, cost)
+
+    def _feed_run(self, config, cost):
         if self.first_one:
-            self.smbo_solver.nni_smac_receive_first_run(self.total_data[parameter_id], reward)
+            self.smbo_solver.nni_smac_receive_first_run(config, cost)
             self.first_one = False
         else:
-            self.smbo_solver.nni_smac_receive_runs(self.total_data[parameter_id], reward)
+            self.smbo_solver.nni_smac_receive_runs(config, cost)
 
     def param_postprocess(self, challenger_dict):
         """
@@ -217,6 +280,114 @@ class SMACTuner(Tuner):
                 converted_dict[key] = value
         return converted_dict
 
+    def _select_challengers(self, challengers, num):
+        """
+        Take at most ``num`` challengers from SMAC3's ``challengers``, skipping proposed ones if ``config_dedup``.
+        """
+        selected = []
+        keys = set()
+        for challenger in challengers:
+            if len(selected) >= num:
+                break
+            if self.dedup:
+                key = _config_key(challenger)
+                if key in self._proposed or key in keys:
+                    continue
+                keys.add(key)
+            selected.append(challenger)
+        return selected
+
+    def _fit(self, num):
+        """
+        Feed the pending runs, fit the model, and return ``num`` challengers of it.
+        """
+        with self._smac_lock:
+            with self._fit_cond:
+                runs, self._pending_runs = self._pending_runs, []
+            for config, cost in runs:
+                self._feed_run(config, cost)
+            return self._select_challengers(self.smbo_solver.nni_smac_request_challengers(), num)
+
+    def _start_fit(self, num):
+        """
+        Start fitting in background. Must be called with ``self._fit_cond`` held.
+        """
+        self._fitting = True
+        if self._fit_pool is None:
+            self._fit_pool = ThreadPool(1)
+        self._fit_pool.apply_async(self._fit, (num,),
+                                   callback=self._on_fit_done, error_callback=self._on_fit_failed)
+
+    def _on_fit_done(self, challengers):
+        with self._fit_cond:
+            self._fitting = False
+            self._next_challengers = challengers
+            # results received during the fit are used by the next one
+            if self._pending_runs:
+                self._start_fit(self.proposals_per_fit)
+            self._fit_cond.notify_all()
+
+    def _on_fit_failed(self, error):
+        with self._fit_cond:
+            self.logger.error('Failed to fit SMAC model: %s', error)
+            self._fitting = False
+            self._fit_error = error
+            self._fit_cond.notify_all()
+
+    def _pop_challenger(self):
+        while self._challengers:
+            challenger = self._challengers.popleft()
+            # challengers of a fit may have been proposed after it was selected
+            if not self.dedup or _config_key(challenger) not in self._proposed:
+                return challenger
+        return None
+
+    def _next_challenger(self, num):
+        """
+        The next challenger to propose, or ``None`` if there is no new one.
+        ``num`` is the number of challengers wanted, if the model has to be fitted for them.
+        """
+        num = max(num, self.proposals_per_fit)
+        if not self.background_fit:
+            challenger = self._pop_challenger()
+            if challenger is None:
+                self._challengers.extend(self._fit(num))
+                challenger = self._pop_challenger()
+            return challenger
+
+        with self._fit_cond:
+            fitted = False
+            while True:
+                if self._next_challengers is not None:
+                    self._challengers = deque(self._next_challengers)
+                    self._next_challengers = None
+                    fitted = True
+                challenger = self._pop_challenger()
+                if challenger is not None or fitted:
+                    return challenger
+                if self._fit_error is not None:
+                    error, self._fit_error = self._fit_error, None
+                    raise RuntimeError('Failed to fit SMAC model') from error
+                if not self._fitting:
+                    self._start_fit(num)
+                self._fit_cond.wait()
+
+    def _next_config(self, parameter_id, num):
+        """
+        Get the configuration for ``parameter_id``, which is SMAC3's initial challenger before any result is received.
+        Returns ``None`` if there is no new configuration.
+        """
+        if self._num_received == 0:
+            with self._smac_lock:
+                challenger = self.smbo_solver.nni_smac_start()
+        else:
+            challenger = self._next_challenger(num)
+            if challenger is None:
+                return None
+        self.total_data[parameter_id] = challenger
+        self._proposed.add(_config_key(challenger))
+        return self.param_postprocess(challenger.get_dictionary())
+
     def generate_parameters(self, parameter_id, **kwargs):
         """
         Generate one instance of hyperparameters (i.e., one configuration).
@@ -234,31 +405,17 @@ class SMACTuner(Tuner):
         dict
             One newly generated configuration
         """
-        if self.first_one:
-            init_challenger = self.smbo_solver.nni_smac_start()
-            self.total_data[parameter_id] = init_challenger
-            return self.param_postprocess(init_challenger.get_dictionary())
-        else:
-            challengers = self.smbo_solver.nni_smac_request_challengers()
-            challengers_empty = True
-            for challenger in challengers:
-                challengers_empty = False
-                if self.dedup:
-                    match = [v for k, v in self.total_data.items() \
-                             if v.get_dictionary() == challenger.get_dictionary()]
-                    if match:
-                        continue
-                self.total_data[parameter_id] = challenger
-                return self.param_postprocess(challenger.get_dictionary())
-            assert challengers_empty is False, 'The case that challengers is empty is not handled.'
+        params = self._next_config(parameter_id, 1)
+        if params is None:
             self.logger.info('In generate_parameters: No more new parameters.')
             raise nni.NoMoreTrialError('No more new parameters.')
+        return params
 
     def generate_multiple_parameters(self, parameter_id_list, **kwargs):
         """
         Generate mutiple instances of hyperparameters. If it is a first request,
-        retrieve the instances from initial challengers. While if it is not, request
-        new challengers and retrieve instances from the requested challengers.
+        retrieve the instances from initial challengers. While if it is not,
+        the instances are challengers of one fit of the model.
 
         Parameters
         ----------
@@ -273,29 +430,13 @@ class SMACTuner(Tuner):
         list
             a list of newly generated configurations
         """
-        if self.first_one:
-            params = []
-            for one_id in parameter_id_list:
-                init_challenger = self.smbo_solver.nni_smac_start()
-                self.total_data[one_id] = init_challenger
-                params.append(self.param_postprocess(init_challenger.get_dictionary()))
-        else:
-            challengers = self.smbo_solver.nni_smac_request_challengers()
-            cnt = 0
-            params = []
-            for challenger in challengers:
-                if cnt >= len(parameter_id_list):
-                    break
-                if self.dedup:
-                    match = [v for k, v in self.total_data.items() \
-                             if v.get_dictionary() == challenger.get_dictionary()]
-                    if match:
-                        continue
-                self.total_data[parameter_id_list[cnt]] = challenger
-                params.append(self.param_postprocess(challenger.get_dictionary()))
-                cnt += 1
-            if self.dedup and not params:
+        params = []
+        for i, parameter_id in enumerate(parameter_id_list):
+            one_params = self._next_config(parameter_id, len(parameter_id_list) - i)
+            if one_params is None:
                 self.logger.info('In generate_multiple_parameters: No more new parameters.')
+                break
+            params.append(one_params)
         return params
 
     def import_data(self, data):
@@ -307,40 +448,69 @@ class SMACTuner(Tuner):
         data : list of dict
             Each of which has at least two keys, ``parameter`` and ``value``.
         """
+        parameters, values = split_import_data(data)
+        # convert the values in loguniform and categorical types
+        encoded = encode_parameters(parameters, self.categorical_dict, self.loguniform_key)
+        costs = np.asarray(values, dtype=float)
+        if self.optimize_mode is OptimizeMode.Maximize:
+            costs = -costs
         _completed_num = 0
-        for trial_info in data:
-            self.logger.info("Importing data, current processing progress %s / %s", _completed_num, len(data))
-            # simply validate data format
-            assert "parameter" in trial_info
-            _params = trial_info["parameter"]
-            assert "value" in trial_info
-            _value = trial_info['value']
-            if not _value:
-                self.logger.info("Useless trial data, value is %s, skip this trial data.", _value)
-                continue
-            _value = extract_scalar_reward(_value)
-            # convert the keys in loguniform and categorical types
-            valid_entry = True
-            for key, value in _params.items():
-                if key in self.loguniform_key:
-                    _params[key] = np.log(value)
-                elif key in self.categorical_dict:
-                    if value in self.categorical_dict[key]:
-                        _params[key] = self.categorical_dict[key].index(value)
-                    else:
-                        self.logger.info("The value %s of key %s is not in search space.", str(value), key)
-                        valid_entry = False
-                        break
-            if not valid_entry:
+        for _params, cost in zip(encoded, costs.tolist()):
+            if _params is None:
                 continue
-            # start import this data entry
             _completed_num += 1
-            config = Configuration(self.cs, values=_params)
-            if self.optimize_mode is OptimizeMode.Maximize:
-                _value = -_value
-            if self.first_one:
-                self.smbo_solver.nni_smac_receive_first_run(config, _value)
-                self.first_one = False
-            else:
-                self.smbo_solver.nni_smac_receive_runs(config, _value)
+            self._receive_run(Configuration(self.cs, values=_params), cost)
+        if _completed_num < len(parameters):
+            self.logger.info("%d entries have values not in search space.", len(parameters) - _completed_num)
         self.logger.info("Successfully import data to smac tuner, total data: %d, imported data: %d.", len(data), _completed_num)
+
+    def save_checkpoint(self):
+        """
+        Save finished runs in SMAC3's run history as encoded configuration vectors and costs.
+        """
+        if self.smbo_solver is None:
+            return
+        configs = []
+        costs = []
+        with self._smac_lock:
+            runhistory = self.smbo_solver.runhistory
+            for run_key, run_value in runhistory.data.items():
+                configs.append(runhistory.ids_config[run_key.config_id].get_array())
+                costs.append(run_value.cost)
+            # runs received but not fed to SMAC3 yet with background fitting
+            with self._fit_cond:
+                for config, cost in self._pending_runs:
+                    configs.append(config.get_array())
+                    costs.append(cost)
+        self._save_state({
+            'configs': np.array(configs, dtype=float),
+            'costs': np.array(costs, dtype=float)
+        })
+
+    def load_checkpoint(self):
+        """
+        Load the checkpoint saved by :meth:`save_checkpoint`. Runs are restored in :meth:`update_search_space`.
+
+        Returns
+        -------
+        bool
+            Whether a checkpoint is found.
+        """
+        state = self._load_state()
+        if state is None:
+            return False
+        self._checkpoint_state = state
+        return True
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint_state
+        self._checkpoint_state = None
+        # the runs are added to SMAC3's run history without starting background fits,
+        # the model is fitted once when the next challengers are requested
+        with self._smac_lock:
+            for i, (vector, cost) in enumerate(zip(state['configs'], state['costs'])):
+                config = Configuration(self.cs, vector=vector)
+                self.total_data['_'.join(['Checkpoint', str(i)])] = config
+                self._num_received += 1
+                self._feed_run(config, float(cost))
+        self.logger.info("Restored %d runs from checkpoint.", len(state['costs']))
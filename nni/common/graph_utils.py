@@ -5,7 +5,8 @@
 import logging
 import queue
 import re
-from collections import defaultdict
+import weakref
+from collections import defaultdict, OrderedDict
 import torch
 from torch.utils.tensorboard._pytorch_graph import NodePy, NodePyIO, NodePyOP, GraphPy
 CLASSTYPE_KIND = 'ClassType'
@@ -20,10 +21,129 @@ CONSTANT_KIND = 'prim::Constant'
 _logger = logging.getLogger(__name__)
 
 
+# number of traces and number of module graphs kept in the cache
+GRAPH_CACHE_SIZE = 8
+
+# (id of model, input signature, structure hash) -> (weak reference to model, traced model)
+_trace_cache = OrderedDict()
+# (id of traced model, unpacked) -> (weak reference to traced model, TorchModuleGraph)
+_graph_cache = OrderedDict()
+
+
 def build_module_graph(model, dummy_input):
     return TorchModuleGraph(model, dummy_input)
 
 
+def get_module_graph(model=None, dummy_input=None, traced_model=None, unpack=False):
+    """
+    Get the ``TorchModuleGraph`` of a model from the graph cache, so that the compression utilities
+    (e.g., ``ModelSpeedup``, ``fix_mask_conflict`` and the shape dependencies) trace the model and build its graph once.
+
+    Traces are keyed by the identity of the model, the signature (i.e., types, shapes, dtypes and devices)
+    of ``dummy_input`` and a hash of the module and parameter structure of the model, so that a model
+    whose modules are replaced or whose parameters are resized is traced again. Graphs are keyed by the
+    identity of the trace. The returned graph is shared and must not be modified, except by
+    ``unpack_manually``, of which the result is cached as a separate graph when ``unpack`` is true.
+    The trace and the graphs of a model are dropped from the cache when the model is garbage collected.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The model to trace.
+    dummy_input : torch.Tensor or tuple of torch.Tensor
+        The dummy input for ```jit.trace```.
+    traced_model : torch.jit.TopLevelTracedModule
+        An already traced model, which is used instead of ``model`` and ``dummy_input``.
+    unpack : bool
+        Whether the tuples and lists in the graph are unpacked with ``unpack_manually``.
+
+    Returns
+    -------
+    TorchModuleGraph
+    """
+    if traced_model is None:
+        if model is None or dummy_input is None:
+            raise Exception('Please provide model & dummy_input or the traced_model as inputs')
+        key = (id(model), _input_signature(dummy_input), _structure_hash(model))
+        traced_model = _cache_get(_trace_cache, key, model)
+        if traced_model is None:
+            # the cached graphs refer to the trace only, so that they are evicted when the model is collected
+            traced_model = TorchGraph(model, dummy_input).trace
+            _cache_put(_trace_cache, key, model, traced_model, _evict_graphs)
+
+    key = (id(traced_model), unpack)
+    graph = _cache_get(_graph_cache, key, traced_model)
+    if graph is None:
+        graph = TorchModuleGraph(traced_model=traced_model)
+        if unpack:
+            graph.unpack_manually()
+        _cache_put(_graph_cache, key, traced_model, graph)
+    return graph
+
+
+def clear_graph_cache():
+    """
+    Clear the traces and graphs cached by :func:`get_module_graph`.
+    """
+    _trace_cache.clear()
+    _graph_cache.clear()
+
+
+def _cache_get(cache, key, obj):
+    if key not in cache:
+        return None
+    ref, value = cache[key]
+    if ref() is not obj:
+        # the id is reused by another object
+        del cache[key]
+        return None
+    cache.move_to_end(key)
+    return value
+
+
+def _cache_put(cache, key, obj, value, on_evict=None):
+    """
+    Cache ``value`` while ``obj`` is alive. The entry is removed when ``obj`` is collected, and ``on_evict``
+    is called with ``value`` then. The graphs of a traced model given by the caller refer to it,
+    so they are only evicted by the size limit.
+    """
+    def evict(ref):
+        entry = cache.get(key)
+        if entry is not None and entry[0] is ref:
+            del cache[key]
+            if on_evict is not None:
+                on_evict(entry[1])
+
+    cache[key] = (weakref.ref(obj, evict), value)
+    cache.move_to_end(key)
+    while len(cache) > GRAPH_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _evict_graphs(traced_model):
+    for unpack in (False, True):
+        key = (id(traced_model), unpack)
+        if key in _graph_cache and _graph_cache[key][0]() is traced_model:
+            del _graph_cache[key]
+
+
+def _input_signature(dummy_input):
+    if isinstance(dummy_input, torch.Tensor):
+        return ('tensor', tuple(dummy_input.shape), str(dummy_input.dtype), str(dummy_input.device))
+    if isinstance(dummy_input, (list, tuple)):
+        return (type(dummy_input).__name__,) + tuple(_input_signature(x) for x in dummy_input)
+    if isinstance(dummy_input, dict):
+        return ('dict',) + tuple((k, _input_signature(v)) for k, v in sorted(dummy_input.items()))
+    return ('value', repr(dummy_input))
+
+
+def _structure_hash(model):
+    modules = tuple((name, type(module).__qualname__) for name, module in model.named_modules())
+    tensors = tuple((name, tuple(tensor.shape), str(tensor.dtype), str(tensor.device))
+                    for name, tensor in list(model.named_parameters()) + list(model.named_buffers()))
+    return hash((modules, tensors))
+
+
 def build_graph(model, dummy_input, verbose=False):
     g = TorchProtoGraph(model, dummy_input, verbose)
     return g.graph_def, g.stepstats
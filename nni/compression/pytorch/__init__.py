@@ -1,6 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-from .speedup import ModelSpeedup
+from .speedup import ModelSpeedup, SparseModelSpeedup, QuantizedModelSpeedup
 from .compressor import Compressor, Pruner, Quantizer
 from .pruning import apply_compression_results
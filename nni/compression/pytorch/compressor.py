@@ -3,6 +3,7 @@
 
 import types
 import logging
+from collections import defaultdict, OrderedDict
 import torch
 from . import default_layers
 
@@ -21,6 +22,11 @@ def _setattr(model, name, module):
         model = getattr(model, name)
     setattr(model, name_list[-1], module)
 
+def _getattr(model, name):
+    for name in name.split("."):
+        model = getattr(model, name)
+    return model
+
 
 class Compressor:
     """
@@ -299,12 +305,57 @@ class PrunerModuleWrapper(torch.nn.Module):
         else:
             self.register_buffer("bias_mask", None)
 
+        # increased by the pruner when the masks are updated
+        self.mask_version = 0
+        # with lazy mask, the masks are applied to weight and bias only when they are changed,
+        # instead of in every forward pass, and the gradients are masked by hooks
+        self.lazy_mask = False
+        self._applied_masks = None
+        self._grad_hook_handles = []
+
+    def set_lazy_mask(self, enabled):
+        """
+        Enable or disable lazy mask, see ```Pruner.enable_lazy_mask```.
+
+        Parameters
+        ----------
+        enabled : bool
+            whether to apply the masks only when they are changed
+        """
+        for handle in self._grad_hook_handles:
+            handle.remove()
+        self._grad_hook_handles = []
+        self._applied_masks = None
+        self.lazy_mask = enabled
+        if enabled:
+            self._grad_hook_handles.append(self._register_grad_mask_hook(self.module.weight, 'weight_mask'))
+            if hasattr(self.module, 'bias') and self.module.bias is not None:
+                self._grad_hook_handles.append(self._register_grad_mask_hook(self.module.bias, 'bias_mask'))
+
+    def _register_grad_mask_hook(self, param, mask_name):
+        if hasattr(param, 'register_post_accumulate_grad_hook'):
+            # mask the accumulated gradient in place, available since pytorch 2.1
+            def hook(param):
+                param.grad.mul_(getattr(self, mask_name))
+            return param.register_post_accumulate_grad_hook(hook)
+        return param.register_hook(lambda grad: grad * getattr(self, mask_name))
+
     def forward(self, *inputs):
+        if self.lazy_mask:
+            # the masks may be replaced without increasing the version, e.g., by setting the attributes directly
+            if self._applied_masks is None or self._applied_masks[0] != self.mask_version or \
+                    self._applied_masks[1] is not self.weight_mask or self._applied_masks[2] is not self.bias_mask:
+                self._apply_mask()
+                self._applied_masks = (self.mask_version, self.weight_mask, self.bias_mask)
+        else:
+            self._apply_mask()
+        return self.module(*inputs)
+
+    def _apply_mask(self):
         # apply mask to weight, bias
         self.module.weight.data = self.module.weight.data.mul_(self.weight_mask)
         if hasattr(self.module, 'bias') and self.module.bias is not None:
             self.module.bias.data = self.module.bias.data.mul_(self.bias_mask)
-        return self.module(*inputs)
 
 class Pruner(Compressor):
     """
@@ -331,9 +382,49 @@ class Pruner(Compressor):
         for wrapper_idx, wrapper in enumerate(self.get_modules_wrapper()):
             masks = self.calc_mask(wrapper, wrapper_idx=wrapper_idx)
             if masks is not None:
+                changed = False
                 for k in masks:
                     assert hasattr(wrapper, k), "there is no attribute '%s' in wrapper" % k
+                    changed = changed or masks[k] is not getattr(wrapper, k)
                     setattr(wrapper, k, masks[k])
+                if changed:
+                    wrapper.mask_version += 1
+                    if wrapper.lazy_mask:
+                        self._mask_optimizer_state(wrapper)
+
+    def enable_lazy_mask(self, enabled=True):
+        """
+        By default, the masks are multiplied to the weights in every forward pass of the wrapped modules.
+        With lazy mask, the masks are applied only in the first forward pass after they are changed,
+        which is tracked by the ```mask_version``` of the wrappers increased in ```update_mask```,
+        and the gradients of the weights are masked by hooks, so that the pruned weights stay zero
+        and the forward passes with unchanged masks run at the speed of the unpruned model.
+
+        The momentum of the pruned weights in the state of the optimizer passed to the pruner is also
+        cleared when the masks are changed. If the weights are modified by other means, e.g., by assigning
+        ```weight.data``` directly, the ```mask_version``` of the wrapper should be increased.
+
+        Parameters
+        ----------
+        enabled : bool
+            whether to enable lazy mask
+        """
+        for wrapper in self.get_modules_wrapper():
+            wrapper.set_lazy_mask(enabled)
+
+    def _mask_optimizer_state(self, wrapper):
+        """
+        Mask the per-parameter state of the optimizer, e.g., momentum, of the weight and bias of the wrapper.
+        """
+        if self.optimizer is None:
+            return
+        params = [(wrapper.module.weight, wrapper.weight_mask)]
+        if hasattr(wrapper.module, 'bias') and wrapper.module.bias is not None:
+            params.append((wrapper.module.bias, wrapper.bias_mask))
+        for param, mask in params:
+            for value in self.optimizer.state.get(param, {}).values():
+                if isinstance(value, torch.Tensor) and value.shape == param.shape:
+                    value.mul_(mask)
 
     def calc_mask(self, wrapper, **kwargs):
         """
@@ -433,9 +524,12 @@ class Pruner(Compressor):
             self._wrap_model()
         else:
             self.bound_model.load_state_dict(model_state)
+        # the masks need to be applied to the loaded weights
+        for wrapper in self.get_modules_wrapper():
+            wrapper.mask_version += 1
 
 class QuantizerModuleWrapper(torch.nn.Module):
-    def __init__(self, module, module_name, module_type, config, quantizer):
+    def __init__(self, module, module_name, module_type, config, quantizer, bn_module=None, bn_name=None):
         """
         Wrap an module to enable data parallel, forward method customization and buffer registeration.
 
@@ -451,6 +545,10 @@ class QuantizerModuleWrapper(torch.nn.Module):
             the type of the module to compress
         quantizer ：quantizer
             the quantizer used to calculate mask
+        bn_module : torch.nn.Module
+            the batch normalization following the module, which is folded into the weight before quantization
+        bn_name : str
+            the name of ```bn_module```
         """
         super().__init__()
         # origin layer information
@@ -460,6 +558,13 @@ class QuantizerModuleWrapper(torch.nn.Module):
         # config and pruner
         self.config = config
         self.quantizer = quantizer
+        # the batch normalization is moved into the wrapper, and replaced by identity in the model
+        self.bn_module = bn_module
+        self.bn_name = bn_name
+        # (state, quantized weight, folded bias) of the last forward without gradient, see Quantizer.get_weight_state
+        self.weight_cache = None
+        # should be increased when the weights are modified in place without increasing their versions, e.g., weight.data
+        self.weight_version = 0
 
         # register buffer and parameter
         # old_weight is used to store origin weight and weight is used to store quantized weight
@@ -472,6 +577,13 @@ class QuantizerModuleWrapper(torch.nn.Module):
                 self.module.register_parameter('old_weight', torch.nn.Parameter(self.module.weight))
                 delattr(self.module, 'weight')
                 self.module.register_buffer('weight', self.module.old_weight)
+                if self.bn_module is not None:
+                    # bias is replaced by the folded bias in forward
+                    bias = self.module.bias
+                    delattr(self.module, 'bias')
+                    if bias is not None:
+                        self.module.register_parameter('old_bias', bias)
+                    self.module.register_buffer('bias', bias)
 
     def forward(self, *inputs):
         if 'input' in self.config['quant_types']:
@@ -481,10 +593,31 @@ class QuantizerModuleWrapper(torch.nn.Module):
                 self)
 
         if 'weight' in self.config['quant_types'] and _check_weight(self.module):
-            self.quantizer.quant_grad.apply(
-                self.module.old_weight,
-                QuantType.QUANT_WEIGHT,
-                self)
+            weight_state = None
+            if not (torch.is_grad_enabled() and self.module.old_weight.requires_grad):
+                # the quantized weight is not needed for backward, and is reused until its state changes
+                weight_state = self.quantizer.get_weight_state(self)
+            if weight_state is not None and self.weight_cache is not None and self.weight_cache[0] == weight_state:
+                self.module.weight = self.weight_cache[1]
+                if self.bn_module is not None:
+                    self.module.bias = self.weight_cache[2]
+            else:
+                if self.bn_module is not None:
+                    # simulate batch normalization folding
+                    weight, self.module.bias = self.quantizer.fold_bn(*inputs, wrapper=self)
+                else:
+                    weight = self.module.old_weight
+                self.quantizer.quant_grad.apply(
+                    weight,
+                    QuantType.QUANT_WEIGHT,
+                    self)
+                if weight_state is None:
+                    self.weight_cache = None
+                else:
+                    # detached, since assigning a parameter (the unquantized weight in evaluation of QAT) to the buffer
+                    # would register it as a parameter
+                    bias = self.module.bias.detach() if self.bn_module is not None and self.module.bias is not None else None
+                    self.weight_cache = (weight_state, self.module.weight.detach(), bias)
             result = self.module(*inputs)
         else:
             result = self.module(*inputs)
@@ -501,7 +634,23 @@ class Quantizer(Compressor):
     Base quantizer for pytorch quantizer
     """
 
-    def __init__(self, model, config_list, optimizer=None):
+    def __init__(self, model, config_list, optimizer=None, dummy_input=None):
+        """
+        Parameters
+        ----------
+        model : pytorch model
+            the model user wants to compress
+        config_list : list
+            the configurations that users specify for compression
+        optimizer: pytorch optimizer
+            optimizer used to train the model
+        dummy_input : torch.Tensor or tuple of torch.Tensor
+            the dummy input to trace the model, with which the batch normalizations following the modules with
+            quantized weights are found and folded into the weights by :meth:`fold_bn`. ```None``` for no folding.
+        """
+        # module name -> name of the batch normalization following it
+        self.conv_bn_patterns = _find_conv_bn_patterns(model, dummy_input) if dummy_input is not None else {}
+        self._model_state_names = list(model.state_dict().keys())
         super().__init__(model, config_list, optimizer)
         self.quant_grad = QuantGrad
         if self.optimizer is not None:
@@ -551,6 +700,124 @@ class Quantizer(Compressor):
         """
         raise NotImplementedError('Quantizer must overload quantize_input()')
 
+    def fold_bn(self, *inputs, wrapper):
+        """
+        quantizer should overload this method to simulate folding ``wrapper.bn_module`` into the wrapped module.
+        This method is called in :meth:`forward` of the wrapper before the weight is quantized.
+        Parameters
+        ----------
+        inputs : Tensor
+            inputs of the wrapped module
+        wrapper : QuantizerModuleWrapper
+            the wrapper for origin module
+        Returns
+        -------
+        Tensor, Tensor
+            the folded weight to be quantized, and the folded bias
+        """
+        raise NotImplementedError('Quantizer must overload fold_bn() to fold batch normalization')
+
+    def get_weight_state(self, wrapper):
+        """
+        Get the state on which the quantized weight of a module depends. When the state is unchanged since the last
+        forward without gradient, the quantized weight (and the folded bias) is reused instead of quantized again.
+        By default, the state is the storages and versions of the parameters and buffers of the module,
+        the batch normalization folded into it, and the buffers of the model (e.g., the steps of training),
+        together with the ```weight_version``` of the wrapper, which should be increased if the weights are
+        modified in place by other means than the optimizer, e.g., ```old_weight.data.mul_(...)```.
+        Quantizer should overload this method if its quantized weight depends on other states.
+        Parameters
+        ----------
+        wrapper : QuantizerModuleWrapper
+            the wrapper for origin module
+        Returns
+        -------
+        tuple
+            the state, which is compared by equality
+        """
+        # the quantized weight and the folded bias are the results
+        outputs = ['weight', 'bias'] if wrapper.bn_module is not None else ['weight']
+        tensors = [t for name, t in wrapper.module.named_parameters(recurse=False) if name not in outputs]
+        tensors += [t for name, t in wrapper.module.named_buffers(recurse=False) if name not in outputs]
+        if wrapper.bn_module is not None:
+            tensors += list(wrapper.bn_module.parameters()) + list(wrapper.bn_module.buffers())
+        tensors += list(self.bound_model.buffers(recurse=False))
+        return (wrapper.training, wrapper.weight_version) + tuple((t.data_ptr(), t._version) for t in tensors if t is not None)
+
+    def get_calibration_config(self, wrapper):
+        """
+        quantizer should overload this method to export the quantization parameters of a module.
+        The weight ``w`` returned by :meth:`get_export_weight`, folded with the batch normalization named by ``bn_module``
+        if any, is quantized as ``weight_scale * (q - weight_zero_point)`` with integer ``q``, and the output likewise.
+        Parameters
+        ----------
+        wrapper : QuantizerModuleWrapper
+            the wrapper for origin module
+        Returns
+        -------
+        dict
+            the quantization parameters, with optional keys ``weight_bits``, ``weight_scale``, ``weight_zero_point``,
+            ``output_bits``, ``output_scale``, ``output_zero_point`` and ``bn_module``
+        """
+        raise NotImplementedError('Quantizer must overload get_calibration_config() to export the model')
+
+    def get_export_weight(self, wrapper):
+        """
+        Get the weight of a module with quantized weight to export, which is the unquantized weight by default.
+        Quantizer should overload this method if its quantized weight is not an affine quantization of this weight.
+        Parameters
+        ----------
+        wrapper : QuantizerModuleWrapper
+            the wrapper for origin module
+        Returns
+        -------
+        Tensor
+            the weight to export
+        """
+        return wrapper.module.old_weight.data
+
+    def export_model(self, model_path, calibration_path=None):
+        """
+        Export the model weights and the quantization parameters, which can be used by
+        ``QuantizedModelSpeedup`` to convert the model into quantized modules of pytorch.
+        The exported state_dict can be loaded by the original model, in which the batch normalizations are not folded.
+
+        Parameters
+        ----------
+        model_path : str
+            path to save model state_dict
+        calibration_path : str
+            (optional) path to save the quantization parameters
+        Returns
+        -------
+        dict
+            the quantization parameters returned by :meth:`get_calibration_config`, key: module name
+        """
+        assert model_path is not None, 'model_path must be specified'
+        calibration_config = {}
+        self._unwrap_model() # used for generating correct state_dict name without wrapper state
+
+        state_dict = self.bound_model.state_dict()
+        with torch.no_grad():
+            for wrapper in self.get_modules_wrapper():
+                if hasattr(wrapper.module, 'old_weight'):
+                    state_dict[wrapper.name + '.weight'] = self.get_export_weight(wrapper).clone()
+                if hasattr(wrapper.module, 'old_bias'):
+                    state_dict[wrapper.name + '.bias'] = wrapper.module.old_bias.data.clone()
+                calibration = self.get_calibration_config(wrapper)
+                if calibration:
+                    calibration_config[wrapper.name] = calibration
+        # remove the parameters and buffers registered by the quantizer
+        state_dict = OrderedDict((name, state_dict[name]) for name in self._model_state_names)
+
+        torch.save(state_dict, model_path)
+        _logger.info('Model state_dict saved to %s', model_path)
+        if calibration_path is not None:
+            torch.save(calibration_config, calibration_path)
+            _logger.info('Calibration config saved to %s', calibration_path)
+
+        self._wrap_model()
+        return calibration_config
 
     def _wrap_modules(self, layer, config):
         """
@@ -571,7 +838,26 @@ class Quantizer(Compressor):
             for quant_type in config['quant_types']:
                 assert quant_type in config['quant_bits'], 'bits length for %s must be specified in quant_bits dict' % quant_type
 
-        return QuantizerModuleWrapper(layer.module, layer.name, layer.type, config, self)
+        bn_name = self.conv_bn_patterns.get(layer.name)
+        bn_module = None
+        if bn_name is not None and 'weight' in config['quant_types']:
+            bn_module = _getattr(self.bound_model, bn_name)
+            # the batch normalization is not folded if it is quantized itself
+            if self.select_config(LayerInfo(bn_name, bn_module)) is not None:
+                bn_name, bn_module = None, None
+        return QuantizerModuleWrapper(layer.module, layer.name, layer.type, config, self, bn_module, bn_name)
+
+    def _wrap_model(self):
+        super()._wrap_model()
+        for wrapper in self.get_modules_wrapper():
+            if wrapper.bn_module is not None:
+                _setattr(self.bound_model, wrapper.bn_name, torch.nn.Identity())
+
+    def _unwrap_model(self):
+        super()._unwrap_model()
+        for wrapper in self.get_modules_wrapper():
+            if wrapper.bn_module is not None:
+                _setattr(self.bound_model, wrapper.bn_name, wrapper.bn_module)
 
     def step_with_optimizer(self):
         pass
@@ -662,7 +948,7 @@ class QuantGrad(torch.autograd.Function):
         if quant_type == QuantType.QUANT_INPUT:
             output = wrapper.quantizer.quantize_input(tensor, wrapper, **kwargs)
         elif quant_type == QuantType.QUANT_WEIGHT:
-            output = wrapper.quantizer.quantize_weight(wrapper, **kwargs)
+            output = wrapper.quantizer.quantize_weight(wrapper, weight=tensor, **kwargs)
         elif quant_type == QuantType.QUANT_OUTPUT:
             output = wrapper.quantizer.quantize_output(tensor, wrapper, **kwargs)
         else:
@@ -679,6 +965,44 @@ class QuantGrad(torch.autograd.Function):
         output = cls.quant_backward(tensor, grad_output, scale, zero_point, qmin, qmax)
         return output, None, None, None
 
+# types of the modules, into which the following batch normalizations of the types can be folded
+BN_FOLDING_TYPES = {
+    'Conv1d': 'BatchNorm1d',
+    'Conv2d': 'BatchNorm2d',
+    'Conv3d': 'BatchNorm3d'
+}
+
+def _find_conv_bn_patterns(model, dummy_input):
+    """
+    Find the batch normalizations which only take the output of a convolution, and can be folded into it.
+
+    Returns
+    -------
+    dict
+        key: name of the convolution, value: name of the batch normalization
+    """
+    # tracing requires tensorboard, which is only imported when batch normalization folding is enabled
+    from nni.common.graph_utils import get_module_graph
+    graph = get_module_graph(model, dummy_input)
+    modules = dict(model.named_modules())
+    call_counts = defaultdict(int)
+    for node in graph.nodes_py.nodes_op:
+        if node.type == 'module':
+            call_counts[node.name] += 1
+    patterns = {}
+    for node in graph.nodes_py.nodes_op:
+        if node.type != 'module' or node.op_type not in BN_FOLDING_TYPES or call_counts[node.name] != 1:
+            continue
+        successors = graph.find_successors(node.unique_name)
+        if len(successors) != 1:
+            continue
+        bn_node = graph.name_to_node[successors[0]]
+        if bn_node.type == 'module' and bn_node.op_type == BN_FOLDING_TYPES[node.op_type] \
+                and call_counts[bn_node.name] == 1 and modules[bn_node.name].track_running_stats:
+            patterns[node.name] = bn_node.name
+    _logger.debug('Batch normalizations to fold: %s', patterns)
+    return patterns
+
 def _check_weight(module):
     try:
         return isinstance(module.weight.data, torch.Tensor)
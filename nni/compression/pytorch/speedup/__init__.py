@@ -1 +1 @@
-from .compressor import ModelSpeedup
\ No newline at end of file
+from .compressor import ModelSpeedup, SparseModelSpeedup, QuantizedModelSpeedup
@@ -1,12 +1,16 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import heapq
 import logging
+from collections import deque
 import torch
 from nni.compression.pytorch.utils.mask_conflict import fix_mask_conflict
-from nni.compression.pytorch.utils.utils import get_module_by_name
+from nni.compression.pytorch.utils.utils import get_module_by_name, fold_batch_norm
 from .compress_modules import replace_module
 from .infer_shape import ModuleMasks, infer_from_mask, infer_from_inshape, infer_from_outshape, set_conv_prune_dim
+from .sparse_modules import replace_sparse_module, is_sparse_supported, weight_density
+from .quantized_modules import replace_quantized_module, is_quantization_supported, FakeQuantizedOutput
 
 _logger = logging.getLogger(__name__)
 
@@ -29,17 +33,22 @@ class ModelSpeedup:
         map_location : str
             the device on which masks are placed, same to map_location in ```torch.load```
         """
-        from nni.common.graph_utils import build_module_graph
+        from nni.common.graph_utils import get_module_graph
 
         self.bound_model = model
         self.masks = torch.load(masks_file, map_location)
         self.inferred_masks = dict() # key: module_name, value: ModuleMasks
         self.dummy_input = dummy_input
-        self.torch_graph = build_module_graph(model, dummy_input)
+        self.torch_graph = get_module_graph(model, dummy_input)
+        # the predecessors, the successors and the topological order of the nodes, see ```_get_adjacency```
+        self._adjacency = None
+        # key: module_name, value: the number of times the module is visited by the mask inference
+        self.visit_counts = dict()
 
     def infer_module_mask(self, module_name, last_module, mask=None, in_shape=None, out_shape=None):
         """
-        Infer input shape / output shape based on the module's weight mask / input shape / output shape.
+        Infer input shape / output shape of the modules, starting from a module's
+        weight mask / input shape / output shape.
 
         For a module:
             Infer its input and output shape from its weight mask
@@ -48,6 +57,7 @@ class ModelSpeedup:
 
         If its input shape is changed, continue infering its predecessors
         If its output shape is changed, continue infering its successors
+        (see ```_infer_masks```)
 
         Parameters
         ----------
@@ -62,6 +72,85 @@ class ModelSpeedup:
         out_shape : ModuleMasks
             Output shape of this node
         """
+        self._infer_masks([(module_name, last_module, mask, in_shape, out_shape)])
+
+    def _infer_masks(self, starts):
+        """
+        Propagate the masks from the start nodes through the graph until a fixed point is reached.
+
+        The masks to propagate are kept in two worklists, one to the predecessors and one to the successors.
+        A node only propagates a mask to its neighbours when the mask has changed since its last propagation
+        in that direction, and the masks pending on the same edge are merged, i.e., only the latest one is kept.
+        The successors are visited in the topological order and the predecessors in the reverse topological
+        order, so that a node is visited after its neighbours in the direction of propagation have settled,
+        which visits each edge at most once in each direction. The number of visits of each node is recorded
+        in ```visit_counts``` for debugging.
+
+        Parameters
+        ----------
+        starts : list of tuple
+            The arguments of ```infer_module_mask``` of the start nodes
+        """
+        predecessors, successors, topo_order = self._get_adjacency()
+        # direction -> heap of (order, node, last visited node)
+        worklists = {'input': [], 'output': []}
+        # direction -> (node, last visited node) -> mask
+        pending = {'input': dict(), 'output': dict()}
+
+        def visit(module_name, last_module, mask=None, in_shape=None, out_shape=None):
+            self.visit_counts[module_name] = self.visit_counts.get(module_name, 0) + 1
+            input_cmask, output_cmask = self._infer_node_mask(module_name, last_module, mask, in_shape, out_shape)
+            module_masks = self.inferred_masks[module_name]
+            for direction, cmask, neighbours, sign in [('input', input_cmask, predecessors[module_name], -1),
+                                                       ('output', output_cmask, successors[module_name], 1)]:
+                if not cmask or not module_masks.update_propagated_mask(direction, cmask):
+                    continue
+                for neighbour in neighbours:
+                    if (neighbour, module_name) not in pending[direction]:
+                        heapq.heappush(worklists[direction], (sign * topo_order[neighbour], neighbour, module_name))
+                    pending[direction][(neighbour, module_name)] = cmask
+
+        for start in starts:
+            visit(*start)
+        while worklists['input'] or worklists['output']:
+            direction = 'input' if worklists['input'] else 'output'
+            _, module_name, last_module = heapq.heappop(worklists[direction])
+            cmask = pending[direction].pop((module_name, last_module))
+            if direction == 'input':
+                visit(module_name, last_module, out_shape=cmask)
+            else:
+                visit(module_name, last_module, in_shape=cmask)
+
+    def _get_adjacency(self):
+        """
+        The predecessors, the successors and the topological order of all the nodes in the graph,
+        which are computed once
+        """
+        if self._adjacency is None:
+            predecessors = {name: self.torch_graph.find_predecessors(name) for name in self.torch_graph.name_to_node}
+            successors = {name: self.torch_graph.find_successors(name) for name in self.torch_graph.name_to_node}
+            in_degree = {name: len(predecessors[name]) for name in predecessors}
+            queue = deque(name for name, degree in in_degree.items() if degree == 0)
+            topo_order = dict()
+            while queue:
+                name = queue.popleft()
+                topo_order[name] = len(topo_order)
+                for successor in successors[name]:
+                    in_degree[successor] -= 1
+                    if in_degree[successor] == 0:
+                        queue.append(successor)
+            self._adjacency = (predecessors, successors, topo_order)
+        return self._adjacency
+
+    def _infer_node_mask(self, module_name, last_module, mask=None, in_shape=None, out_shape=None):
+        """
+        Infer input shape / output shape of a single module, see ```infer_module_mask```.
+
+        Returns
+        -------
+        CoarseMask, CoarseMask
+            The mask of its input tensor and the mask of its output tensor to propagate, ```None``` for no propagation
+        """
         input_cmask = output_cmask = None
         if module_name in self.inferred_masks:
             module_masks = self.inferred_masks[module_name]
@@ -114,19 +203,13 @@ class ModelSpeedup:
             else:
                 input_cmask = infer_from_outshape[m_type](module_masks, out_shape)
 
-        if input_cmask:
-            predecessors = self.torch_graph.find_predecessors(module_name)
-            for _module_name in predecessors:
-                self.infer_module_mask(_module_name, module_name, out_shape=input_cmask)
-        if output_cmask:
-            successors = self.torch_graph.find_successors(module_name)
-            for _module_name in successors:
-                self.infer_module_mask(_module_name, module_name, in_shape=output_cmask)
+        return input_cmask, output_cmask
 
     def infer_modules_masks(self):
         """
         Do shape inference of involved modules, including the shape of weights, inputs, output
         """
+        starts = []
         for module_name, mask in self.masks.items():
             _logger.debug('Start mask inference from %s', module_name)
             if module_name not in self.torch_graph.name_to_node:
@@ -137,7 +220,8 @@ class ModelSpeedup:
                 # so, if a node is not traced, we just skip it.
                 _logger.warning('%s has mask, but not found in the traced graph, just skip it.', module_name)
                 continue
-            self.infer_module_mask(module_name, None, mask=mask)
+            starts.append((module_name, None, mask, None, None))
+        self._infer_masks(starts)
 
     def replace_compressed_modules(self):
         """
@@ -185,3 +269,145 @@ class ModelSpeedup:
         self.replace_compressed_modules()
         self.bound_model.train(training)
         _logger.info("speedup done")
+
+
+class SparseModelSpeedup:
+    """
+    This class is to speedup the model with fine-grained pruned weights, by replacing
+    the sufficiently sparse ``Linear`` and ``Conv2d`` modules with sparse modules for inference
+    """
+
+    def __init__(self, model, masks_file=None, map_location=None, density_threshold=0.2,
+                 layer_density_thresholds=None, block_size=None):
+        """
+        Parameters
+        ----------
+        model : pytorch model
+            The model user wants to speed up
+        masks_file : str
+            The path of user provided mask file, ```None``` for the zeros in the weights being pruned
+        map_location : str
+            the device on which masks are placed, same to map_location in ```torch.load```
+        density_threshold : float
+            A module is replaced when the fraction of its non-zero weights (or blocks) is not larger than this
+        layer_density_thresholds : dict
+            The density thresholds of specific modules, which override ```density_threshold```, key: module_name
+        block_size : tuple of int
+            The size of blocks of the sparse weights, ```None``` for CSR format, which is usually faster on CPU
+        """
+        self.bound_model = model
+        self.masks = torch.load(masks_file, map_location) if masks_file is not None else dict()
+        self.density_threshold = density_threshold
+        self.layer_density_thresholds = layer_density_thresholds or dict()
+        self.block_size = block_size
+        self.densities = dict() # key: module_name, value: density of its weight
+        self.replaced_modules = [] # names of the replaced modules
+
+    def speedup_model(self):
+        """
+        Replace the modules whose density of weights is not larger than their threshold
+        """
+        training = self.bound_model.training
+        _logger.info("start to speed up the model with sparse modules")
+        for module_name, module in list(self.bound_model.named_modules()):
+            m_type = type(module).__name__
+            if m_type not in replace_sparse_module or not is_sparse_supported(module):
+                continue
+            weight = module.weight.data
+            bias = module.bias.data if module.bias is not None else None
+            mask = self.masks.get(module_name, dict())
+            if mask.get('weight') is not None:
+                weight = weight * mask['weight'].to(weight.device)
+            if bias is not None and mask.get('bias') is not None:
+                bias = bias * mask['bias'].to(bias.device)
+            density = weight_density(weight, self.block_size)
+            self.densities[module_name] = density
+            if density > self.layer_density_thresholds.get(module_name, self.density_threshold):
+                _logger.debug("keep dense module %s with density %.4f", module_name, density)
+                continue
+            _logger.info("replace module (name: %s, op_type: %s, density: %.4f) with sparse module",
+                         module_name, m_type, density)
+            super_module, _ = get_module_by_name(self.bound_model, module_name)
+            sparse_module = replace_sparse_module[m_type](module, weight, bias, self.block_size)
+            setattr(super_module, module_name.split('.')[-1], sparse_module)
+            self.replaced_modules.append(module_name)
+        self.bound_model.train(training)
+        _logger.info("speedup done, %d modules are replaced", len(self.replaced_modules))
+
+
+class QuantizedModelSpeedup:
+    """
+    This class is to speedup the model quantized by the quantizers, by replacing the modules with
+    the quantized modules of pytorch according to the calibration config exported by ``Quantizer.export_model``
+    """
+
+    def __init__(self, model, calibration_path, map_location=None, backend=None):
+        """
+        Parameters
+        ----------
+        model : pytorch model
+            The model user wants to speed up, with the state_dict exported by ``Quantizer.export_model``
+        calibration_path : str
+            The path of the calibration config exported by ``Quantizer.export_model``
+        map_location : str
+            the device on which the calibration config is placed, same to map_location in ```torch.load```
+        backend : str
+            The quantized engine of pytorch, e.g., ```fbgemm``` or ```qnnpack```, ```None``` for the current engine
+        """
+        self.bound_model = model
+        self.calibration_config = torch.load(calibration_path, map_location)
+        self.backend = backend
+        self.replaced_modules = dict() # key: module_name, value: type of the replacement
+        self.folded_bn_modules = [] # names of the batch normalizations folded into the modules
+
+    def speedup_model(self):
+        """
+        Fold the batch normalizations, and replace the modules with the quantized modules, for inference only.
+        The modules which can not be quantized by pytorch are kept in float, with the quantized weight and output simulated.
+        """
+        if self.backend is not None:
+            torch.backends.quantized.engine = self.backend
+        _logger.info("start to speed up the model with quantized modules on %s", torch.backends.quantized.engine)
+        self.bound_model.eval()
+        with torch.no_grad():
+            for module_name, calibration in self.calibration_config.items():
+                self._replace_module(module_name, calibration)
+        _logger.info("speedup done, %d modules are replaced", len(self.replaced_modules))
+
+    def _replace_module(self, module_name, calibration):
+        super_module, module = get_module_by_name(self.bound_model, module_name)
+        if module is None:
+            _logger.warning("module %s in the calibration config is not found", module_name)
+            return
+        weight, bias = None, None
+        if 'weight_scale' in calibration:
+            weight = module.weight.data
+            bias = module.bias.data if module.bias is not None else None
+            if 'bn_module' in calibration:
+                bn_name = calibration['bn_module']
+                bn_super_module, bn_module = get_module_by_name(self.bound_model, bn_name)
+                weight, bias = fold_batch_norm(weight, bias, bn_module)
+                setattr(bn_super_module, bn_name.split('.')[-1], torch.nn.Identity())
+                self.folded_bn_modules.append(bn_name)
+
+        m_type = is_quantization_supported(module, calibration)
+        new_module = None
+        if m_type is not None:
+            try:
+                new_module = replace_quantized_module[m_type](module, weight, bias, calibration)
+            except ValueError as err:
+                _logger.warning("module %s is not quantized: %s", module_name, err)
+        if new_module is None:
+            m_type = 'Float'
+            new_module = module
+            if weight is not None:
+                scale, zero_point = calibration['weight_scale'], calibration['weight_zero_point']
+                module.weight.data = (torch.round(weight / scale + zero_point) - zero_point) * scale
+                if bias is not None:
+                    module.bias = torch.nn.Parameter(bias)
+            if 'output_scale' in calibration:
+                new_module = FakeQuantizedOutput(module, calibration['output_scale'], calibration['output_zero_point'],
+                                                 calibration['output_bits'])
+        _logger.info("replace module (name: %s, op_type: %s) with %s module", module_name, type(module).__name__, m_type)
+        setattr(super_module, module_name.split('.')[-1], new_module)
+        self.replaced_modules[module_name] = m_type
@@ -114,6 +114,18 @@ class CoarseMask:
                                                             cmask.mask_index[i])
         return self.mask_index
 
+    def clone(self):
+        """
+        Returns
+        -------
+        CoarseMask
+            A copy of this mask, which is not changed by the in-place
+            merging of this mask
+        """
+        cmask = CoarseMask(num_dim=len(self.mask_index))
+        cmask.mask_index = [None if index is None else index.clone() for index in self.mask_index]
+        return cmask
+
     def __repr__(self):
         return 'mask_index: {}'.format(self.mask_index)
 
@@ -188,6 +200,8 @@ class ModuleMasks:
         self.param_masks = dict()
         self.input_mask = None
         self.output_mask = None
+        # the input/output masks last propagated to the predecessors/successors
+        self.propagated_masks = dict()
 
     def set_param_masks(self, name, mask):
         """
@@ -218,6 +232,30 @@ class ModuleMasks:
         """
         self.output_mask = mask
 
+    def update_propagated_mask(self, direction, mask):
+        """
+        Record the mask to propagate to the predecessors or the successors,
+        and check if it is changed since the last propagation in this direction.
+        The masks may be merged in place (e.g., by ``aten::cat``), so a copy is recorded.
+
+        Parameters
+        ----------
+        direction : str
+            ``input`` for the predecessors, ``output`` for the successors
+        mask : CoarseMask
+            The mask to propagate
+
+        Returns
+        -------
+        bool
+            If the mask needs to be propagated
+        """
+        last_mask = self.propagated_masks.get(direction)
+        if last_mask is not None and last_mask == mask:
+            return False
+        self.propagated_masks[direction] = mask.clone()
+        return True
+
     def __repr__(self):
         return 'module_name: {}, input_mask: {}, output_mask: {}, param_masks: {}'.format(
             self.module_name, self.input_mask, self.output_mask, self.param_masks
@@ -0,0 +1,140 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+"""
+Quantized implementations of the modules, with the quantization parameters exported by ``Quantizer.export_model``,
+for inference on CPU with the quantized engine of pytorch (e.g., fbgemm or qnnpack).
+
+The modules with quantized weights and outputs are replaced by the static quantized modules of pytorch,
+whose inputs are quantized with the range of each batch, and whose outputs are dequantized, so that
+they can be used in place of the float modules. The ``Linear`` modules with only quantized weights are
+replaced by the dynamic quantized modules of pytorch.
+"""
+
+import torch
+import torch.nn.quantized as nnq
+import torch.nn.quantized.dynamic as nnqd
+
+
+def quantize_weight(weight, scale, zero_point):
+    """
+    Parameters
+    ----------
+    weight : torch.Tensor
+        The float weight, which is quantized as ```scale * (q - zero_point)```
+    scale : float
+        The scale of the quantized weight
+    zero_point : int
+        The zero point of the quantized weight
+
+    Returns
+    -------
+    torch.Tensor
+        The weight quantized to ```torch.qint8```, with the zero point shifted to the range of int8
+    """
+    weight = torch.round(weight.detach().float() / scale + zero_point)
+    low = min(int(weight.min()), zero_point)
+    high = max(int(weight.max()), zero_point)
+    if high - low > 255:
+        raise ValueError('The quantized weight in [{}, {}] can not be represented by 8-bit integers'.format(low, high))
+    offset = min(max(0, high - 127), low + 128)
+    return torch._make_per_tensor_quantized_tensor((weight - offset).to(torch.int8), scale, zero_point - offset)
+
+
+def _reduce_range():
+    # the 8-bit inputs may overflow the intermediate results of fbgemm, where 7 bits are used like the observers of pytorch
+    return torch.backends.quantized.engine in ('fbgemm', 'x86')
+
+
+class QuantizedModule(torch.nn.Module):
+    """
+    Wrapper of a static quantized module of pytorch, whose float input is quantized with its range,
+    and whose output is dequantized.
+    """
+
+    def __init__(self, module):
+        """
+        Parameters
+        ----------
+        module : torch.nn.Module
+            The static quantized module, e.g., ```torch.nn.quantized.Conv2d```
+        """
+        super().__init__()
+        self.module = module
+        self.qmax = 127 if _reduce_range() else 255
+
+    def forward(self, x):
+        low = min(x.min().item(), 0.)
+        high = max(x.max().item(), 0.)
+        scale = (high - low) / self.qmax if high > low else 1.
+        zero_point = min(max(int(round(-low / scale)), 0), self.qmax)
+        x = torch.quantize_per_tensor(x, scale, zero_point, torch.quint8)
+        # the output of quantized convolution is channels last, which is converted to be like the float module
+        return self.module(x).dequantize().contiguous()
+
+
+class FakeQuantizedOutput(torch.nn.Module):
+    """
+    Wrapper of a float module, whose output is quantized and dequantized as in quantization aware training.
+    """
+
+    def __init__(self, module, scale, zero_point, bits):
+        super().__init__()
+        self.module = module
+        self.scale = scale
+        self.zero_point = zero_point
+        self.bits = bits
+
+    def forward(self, *inputs):
+        return torch.fake_quantize_per_tensor_affine(self.module(*inputs), self.scale, self.zero_point,
+                                                     0, (1 << self.bits) - 1)
+
+
+def _quantized_conv2d(module, weight, bias, calibration):
+    conv = nnq.Conv2d(module.in_channels, module.out_channels, module.kernel_size, module.stride,
+                      module.padding, module.dilation, module.groups, bias is not None)
+    conv.set_weight_bias(quantize_weight(weight, calibration['weight_scale'], calibration['weight_zero_point']), bias)
+    conv.scale = calibration['output_scale']
+    conv.zero_point = calibration['output_zero_point']
+    return QuantizedModule(conv)
+
+
+def _quantized_linear(module, weight, bias, calibration):
+    linear = nnq.Linear(module.in_features, module.out_features, bias is not None)
+    linear.set_weight_bias(quantize_weight(weight, calibration['weight_scale'], calibration['weight_zero_point']), bias)
+    linear.scale = calibration['output_scale']
+    linear.zero_point = calibration['output_zero_point']
+    return QuantizedModule(linear)
+
+
+def _dynamic_quantized_linear(module, weight, bias, calibration):
+    linear = nnqd.Linear(module.in_features, module.out_features, bias is not None)
+    linear.set_weight_bias(quantize_weight(weight, calibration['weight_scale'], calibration['weight_zero_point']), bias)
+    return linear
+
+
+def is_quantization_supported(module, calibration):
+    """
+    Whether the module can be replaced by a quantized module of pytorch with the quantization parameters
+
+    Returns
+    -------
+    str
+        The key of the module in ```replace_quantized_module```, ```None``` if not supported
+    """
+    if 'weight_scale' not in calibration or calibration['weight_bits'] > 8:
+        return None
+    m_type = type(module).__name__
+    if 'output_scale' in calibration and calibration['output_bits'] <= 8:
+        if m_type == 'Linear' or m_type == 'Conv2d' and module.padding_mode == 'zeros' \
+                and not isinstance(module.padding, str):
+            return m_type
+    if m_type == 'Linear':
+        return 'DynamicLinear'
+    return None
+
+
+replace_quantized_module = {
+    'Conv2d': _quantized_conv2d,
+    'Linear': _quantized_linear,
+    'DynamicLinear': _dynamic_quantized_linear
+}
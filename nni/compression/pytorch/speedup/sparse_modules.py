@@ -0,0 +1,190 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+"""
+Sparse implementations of the modules with fine-grained pruned weights, for inference.
+
+The weight of ``SparseLinear`` is stored either in CSR format (COO on old pytorch), and multiplied by ``torch.sparse.mm``,
+or in blocks, where only the blocks with non-zero elements are stored and multiplied by batched matrix multiplication.
+``SparseConv2d`` unfolds its input into columns and multiplies them with a ``SparseLinear``.
+"""
+
+import torch
+import torch.nn.functional as F
+
+
+def _to_sparse(weight):
+    if hasattr(weight, 'to_sparse_csr'):
+        return weight.to_sparse_csr()
+    return weight.to_sparse()
+
+
+def _ceil_div(a, b):
+    return (a + b - 1) // b
+
+
+def weight_density(weight, block_size=None):
+    """
+    Parameters
+    ----------
+    weight : torch.Tensor
+        The weight of which the first dimension is the output dimension
+    block_size : tuple of int
+        The size of blocks, ```None``` for element-wise density
+
+    Returns
+    -------
+    float
+        The fraction of non-zero elements (or blocks) of the weight
+    """
+    weight = weight.reshape(weight.size(0), -1)
+    if block_size is None:
+        return torch.count_nonzero(weight).item() / weight.numel()
+    return torch.count_nonzero(_block_nonzero(weight, block_size)).item() / \
+        (_ceil_div(weight.size(0), block_size[0]) * _ceil_div(weight.size(1), block_size[1]))
+
+
+def _pad_to_blocks(weight, block_size):
+    pad_rows = _ceil_div(weight.size(0), block_size[0]) * block_size[0] - weight.size(0)
+    pad_cols = _ceil_div(weight.size(1), block_size[1]) * block_size[1] - weight.size(1)
+    return F.pad(weight, (0, pad_cols, 0, pad_rows))
+
+
+def _block_nonzero(weight, block_size):
+    weight = _pad_to_blocks(weight, block_size)
+    block_rows, block_cols = weight.size(0) // block_size[0], weight.size(1) // block_size[1]
+    blocks = weight.view(block_rows, block_size[0], block_cols, block_size[1])
+    return blocks.abs().sum((1, 3)) != 0
+
+
+class SparseLinear(torch.nn.Module):
+    """
+    Linear module with a sparse weight, for inference only.
+    """
+
+    def __init__(self, weight, bias=None, block_size=None):
+        """
+        Parameters
+        ----------
+        weight : torch.Tensor
+            The dense weight with pruned elements being zero, in the shape of (out_features, in_features)
+        bias : torch.Tensor
+            The bias, ```None``` for no bias
+        block_size : tuple of int
+            The size of blocks of the weight, ```None``` for CSR format
+        """
+        super().__init__()
+        weight = weight.detach()
+        self.out_features, self.in_features = weight.shape
+        self.block_size = tuple(block_size) if block_size is not None else None
+        if self.block_size is None:
+            self.register_buffer('weight', _to_sparse(weight))
+        else:
+            nonzero = _block_nonzero(weight, self.block_size)
+            rows, cols = nonzero.nonzero(as_tuple=True)
+            padded = _pad_to_blocks(weight, self.block_size)
+            blocks = padded.view(nonzero.size(0), self.block_size[0], nonzero.size(1), self.block_size[1])
+            # (number of non-zero blocks, block height, block width)
+            self.register_buffer('blocks', blocks.permute(0, 2, 1, 3)[rows, cols].contiguous())
+            self.register_buffer('block_rows', rows)
+            self.register_buffer('block_cols', cols)
+            self.padded_shape = tuple(padded.shape)
+        self.register_buffer('bias', bias.detach().clone() if bias is not None else None)
+
+    def forward(self, x):
+        shape = x.shape
+        y = self.matmul(x.reshape(-1, self.in_features).t()).t()
+        if self.bias is not None:
+            y = y + self.bias
+        return y.reshape(*shape[:-1], self.out_features)
+
+    def matmul(self, x):
+        """
+        Parameters
+        ----------
+        x : torch.Tensor
+            The input in the shape of (in_features, n)
+
+        Returns
+        -------
+        torch.Tensor
+            The product of the weight and the input, in the shape of (out_features, n), without bias
+        """
+        if self.block_size is None:
+            return torch.sparse.mm(self.weight, x)
+        n = x.size(1)
+        block_height, block_width = self.block_size
+        if self.padded_shape[1] != self.in_features:
+            x = F.pad(x, (0, 0, 0, self.padded_shape[1] - self.in_features))
+        # (number of non-zero blocks, block width, n)
+        x_blocks = x.reshape(-1, block_width, n)[self.block_cols]
+        y_blocks = torch.bmm(self.blocks, x_blocks)
+        y = x.new_zeros(self.padded_shape[0] // block_height, block_height, n)
+        y.index_add_(0, self.block_rows, y_blocks)
+        return y.view(self.padded_shape[0], n)[:self.out_features]
+
+    def extra_repr(self):
+        return 'in_features={}, out_features={}, bias={}, block_size={}'.format(
+            self.in_features, self.out_features, self.bias is not None, self.block_size)
+
+
+class SparseConv2d(torch.nn.Module):
+    """
+    Conv2d module with a sparse weight, for inference only.
+    The input is unfolded into columns, which are multiplied with the weight by a ```SparseLinear```.
+    """
+
+    def __init__(self, conv, weight, bias=None, block_size=None):
+        """
+        Parameters
+        ----------
+        conv : torch.nn.Conv2d
+            The conv module to replace, which must have one group and zero padding
+        weight : torch.Tensor
+            The dense weight of the conv with pruned elements being zero
+        bias : torch.Tensor
+            The bias, ```None``` for no bias
+        block_size : tuple of int
+            The size of blocks of the weight, ```None``` for CSR format
+        """
+        super().__init__()
+        assert is_sparse_supported(conv)
+        self.in_channels = conv.in_channels
+        self.out_channels = conv.out_channels
+        self.kernel_size = conv.kernel_size
+        self.stride = conv.stride
+        self.padding = conv.padding
+        self.dilation = conv.dilation
+        self.linear = SparseLinear(weight.reshape(weight.size(0), -1), bias, block_size)
+
+    def forward(self, x):
+        n, _, height, width = x.shape
+        out_height = (height + 2 * self.padding[0] - self.dilation[0] * (self.kernel_size[0] - 1) - 1) // self.stride[0] + 1
+        out_width = (width + 2 * self.padding[1] - self.dilation[1] * (self.kernel_size[1] - 1) - 1) // self.stride[1] + 1
+        # (n, in_channels * kernel height * kernel width, out_height * out_width)
+        columns = F.unfold(x, self.kernel_size, self.dilation, self.padding, self.stride)
+        # multiplying the columns of each sample avoids transposing the columns, which is slower
+        y = torch.stack([self.linear.matmul(sample_columns) for sample_columns in columns])
+        if self.linear.bias is not None:
+            y = y + self.linear.bias.view(-1, 1)
+        return y.view(n, self.out_channels, out_height, out_width)
+
+    def extra_repr(self):
+        return '{}, {}, kernel_size={}, stride={}, padding={}, dilation={}'.format(
+            self.in_channels, self.out_channels, self.kernel_size, self.stride, self.padding, self.dilation)
+
+
+def is_sparse_supported(module):
+    """
+    Whether the module can be replaced by a sparse module
+    """
+    if isinstance(module, torch.nn.Linear):
+        return True
+    if isinstance(module, torch.nn.Conv2d):
+        return module.groups == 1 and module.padding_mode == 'zeros' and not isinstance(module.padding, str)
+    return False
+
+
+replace_sparse_module = {
+    'Linear': lambda module, weight, bias, block_size: SparseLinear(weight, bias, block_size),
+    'Conv2d': lambda module, weight, bias, block_size: SparseConv2d(module, weight, bias, block_size)
+}
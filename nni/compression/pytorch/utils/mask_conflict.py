@@ -31,17 +31,11 @@ def fix_mask_conflict(masks, model=None, dummy_input=None, traced=None):
         # if the input is the path of the mask_file
         assert os.path.exists(masks)
         masks = torch.load(masks)
-    # if the user uses the model and dummy_input to trace the model, we
-    # should get the traced model handly, so that, we only trace the
-    # model once, GroupMaskConflict and ChannelMaskConflict will reuse
-    # this traced model.
+    # if the user uses the model and dummy_input to trace the model,
+    # GroupMaskConflict, ChannelMaskConflict and CatMaskPadding get the
+    # graph from the graph cache, so that the model is traced once.
     if traced is None:
         assert model is not None and dummy_input is not None
-        training = model.training
-        model.eval()
-        # We need to trace the model in eval mode
-        traced = torch.jit.trace(model, dummy_input)
-        model.train(training)
 
     fix_group_mask = GroupMaskConflict(masks, model, dummy_input, traced)
     masks = fix_group_mask.fix_mask()
@@ -4,9 +4,12 @@
 import copy
 import csv
 import logging
+import multiprocessing
+import os
 from collections import OrderedDict
 
 import numpy as np
+import torch
 import torch.nn as nn
 
 # FIXME: I don't know where "utils" should be
@@ -16,6 +19,21 @@ SUPPORTED_OP_TYPE = [getattr(nn, name) for name in SUPPORTED_OP_NAME]
 logger = logging.getLogger('Sensitivity_Analysis')
 logger.setLevel(logging.INFO)
 
+# the analyzer and the validation arguments inherited by the forked worker processes
+_worker_context = None
+
+
+def _init_worker(analyzer, val_func, val_args, val_kwargs, num_threads):
+    global _worker_context
+    torch.set_num_threads(num_threads)
+    _worker_context = (analyzer, val_func, val_args, val_kwargs)
+
+
+def _analyze_in_worker(task):
+    analyzer, val_func, val_args, val_kwargs = _worker_context
+    name, sparsities = task
+    return name, analyzer._analyze_layer(name, sparsities, val_func, val_args, val_kwargs)
+
 
 class SensitivityAnalysis:
     def __init__(self, model, val_func, sparsities=None, prune_type='l1', early_stop_mode=None, early_stop_value=None):
@@ -133,7 +151,8 @@ class SensitivityAnalysis:
                 return True
         return False
 
-    def analysis(self, val_args=None, val_kwargs=None, specified_layers=None):
+    def analysis(self, val_args=None, val_kwargs=None, specified_layers=None, num_workers=1,
+                 checkpoint_path=None, fast_val_func=None):
         """
         This function analyze the sensitivity to pruning for
         each conv layer in the target model.
@@ -154,6 +173,22 @@ class SensitivityAnalysis:
             the conv layers that specified in the list.
             User can also use this option to parallelize
             the sensitivity analysis easily.
+        num_workers : int
+            The number of processes to analyze the layers. With more than one worker, the
+            (layer, sparsity) pairs (or the layers, when early stop is enabled) are analyzed
+            in a pool of forked processes, each of which prunes its own replica of the model,
+            and restores it from the original state_dict in shared memory. The val_func and
+            its arguments are inherited by the processes instead of being pickled, and should
+            refer to the model to analyze, e.g., ```val_args=[model]```. CUDA can not be used
+            in forked processes, so this option is for the models on CPU.
+        checkpoint_path : str
+            Path of a csv file in the format of :meth:`export`, where the sensitivities of each
+            layer are appended once the layer is analyzed. If the file exists, the layers in it
+            are loaded instead of analyzed again, so that an interrupted analysis resumes.
+        fast_val_func : function
+            A faster validation function with the same arguments as val_func, e.g., on a subset
+            of the validation dataset. If set, the original and pruned models are validated by it
+            instead of val_func, which gives coarser sensitivities in shorter time.
         Returns
         -------
         sensitivities : dict
@@ -164,46 +199,137 @@ class SensitivityAnalysis:
             val_args = []
         if val_kwargs is None:
             val_kwargs = {}
+        val_func = fast_val_func if fast_val_func is not None else self.val_func
         # Get the original validation metric(accuracy/loss) before pruning
         # Get the accuracy baseline before starting the analysis.
-        self.ori_metric = self.val_func(*val_args, **val_kwargs)
+        self.ori_metric = val_func(*val_args, **val_kwargs)
         namelist = list(self.target_layer.keys())
         if specified_layers is not None:
             # only analyze several specified conv layers
             namelist = list(filter(lambda x: x in specified_layers, namelist))
+        finished = self._load_checkpoint(checkpoint_path) if checkpoint_path is not None else {}
+        self.sensitivities.update({name: finished[name] for name in namelist if name in finished})
+        to_analyze = [name for name in namelist if name not in finished]
+
+        if num_workers <= 1:
+            for name in to_analyze:
+                self.sensitivities[name] = self._analyze_layer(name, self.sparsities, val_func, val_args, val_kwargs)
+                self._append_checkpoint(checkpoint_path, name)
+        elif to_analyze:
+            self._analyze_in_pool(to_analyze, num_workers, checkpoint_path, val_func, val_args, val_kwargs)
+        # keep the layers in the order of the model
         for name in namelist:
+            self.sensitivities[name] = self.sensitivities.pop(name)
+        return self.sensitivities
+
+    def _analyze_in_pool(self, namelist, num_workers, checkpoint_path, val_func, val_args, val_kwargs):
+        """
+        Analyze the layers in a pool of forked processes, see ```num_workers``` of :meth:`analysis`.
+        """
+        if self.early_stop_mode is None:
+            # the sparsities of a layer are independent without early stop
+            tasks = [(name, [sparsity]) for name in namelist for sparsity in self.sparsities]
+        else:
+            tasks = [(name, self.sparsities) for name in namelist]
+        remaining = {name: 0 for name in namelist}
+        for name, _ in tasks:
+            remaining[name] += 1
             self.sensitivities[name] = {}
-            for sparsity in self.sparsities:
-                # here the sparsity is the relative sparsity of the
-                # the remained weights
-                # Calculate the actual prune ratio based on the already pruned ratio
-                real_sparsity = (
-                    1.0 - self.already_pruned[name]) * sparsity + self.already_pruned[name]
-                # TODO In current L1/L2 Filter Pruner, the 'op_types' is still necessary
-                # I think the L1/L2 Pruner should specify the op_types automaticlly
-                # according to the op_names
-                cfg = [{'sparsity': real_sparsity, 'op_names': [
-                    name], 'op_types': ['Conv2d']}]
-                pruner = self.Pruner(self.model, cfg)
-                pruner.compress()
-                val_metric = self.val_func(*val_args, **val_kwargs)
-                logger.info('Layer: %s Sparsity: %.2f Validation Metric: %.4f',
-                            name, real_sparsity, val_metric)
-
-                self.sensitivities[name][sparsity] = val_metric
-                pruner._unwrap_model()
-                del pruner
-                # check if the current metric meet the stop condition
-                if self._need_to_stop(self.ori_metric, val_metric):
-                    break
-
-            # reset the weights pruned by the pruner, because the
-            # input sparsities is sorted, so we donnot need to reset
-            # weight of the layer when the sparsity changes, instead,
-            # we only need reset the weight when the pruning layer changes.
-            self.model.load_state_dict(self.ori_state_dict)
+        for value in self.ori_state_dict.values():
+            value.share_memory_()
+        num_threads = max(1, torch.get_num_threads() // num_workers)
+        with multiprocessing.get_context('fork').Pool(
+                num_workers, _init_worker, (self, val_func, val_args, val_kwargs, num_threads)) as pool:
+            for name, sensitivities in pool.imap_unordered(_analyze_in_worker, tasks):
+                self.sensitivities[name].update(sensitivities)
+                remaining[name] -= 1
+                if remaining[name] == 0:
+                    self.sensitivities[name] = dict(sorted(self.sensitivities[name].items()))
+                    self._append_checkpoint(checkpoint_path, name)
 
-        return self.sensitivities
+    def _analyze_layer(self, name, sparsities, val_func, val_args, val_kwargs):
+        """
+        Prune the layer with the sparsities in ascending order until the stop condition is met,
+        then restore the original weights.
+
+        Returns
+        -------
+        dict
+            the validation metric of each sparsity
+        """
+        sensitivities = {}
+        for sparsity in sparsities:
+            # here the sparsity is the relative sparsity of the
+            # the remained weights
+            # Calculate the actual prune ratio based on the already pruned ratio
+            real_sparsity = (
+                1.0 - self.already_pruned[name]) * sparsity + self.already_pruned[name]
+            # TODO In current L1/L2 Filter Pruner, the 'op_types' is still necessary
+            # I think the L1/L2 Pruner should specify the op_types automaticlly
+            # according to the op_names
+            cfg = [{'sparsity': real_sparsity, 'op_names': [
+                name], 'op_types': ['Conv2d']}]
+            pruner = self.Pruner(self.model, cfg)
+            pruner.compress()
+            val_metric = val_func(*val_args, **val_kwargs)
+            logger.info('Layer: %s Sparsity: %.2f Validation Metric: %.4f',
+                        name, real_sparsity, val_metric)
+
+            sensitivities[sparsity] = val_metric
+            pruner._unwrap_model()
+            del pruner
+            # check if the current metric meet the stop condition
+            if self._need_to_stop(self.ori_metric, val_metric):
+                break
+
+        # reset the weights pruned by the pruner, because the
+        # input sparsities is sorted, so we donnot need to reset
+        # weight of the layer when the sparsity changes, instead,
+        # we only need reset the weight when the pruning layer changes.
+        self.model.load_state_dict(self.ori_state_dict)
+        return sensitivities
+
+    def _header(self):
+        return ['layername'] + [str(x) for x in self.sparsities]
+
+    def _load_checkpoint(self, filepath):
+        """
+        Load the sensitivities of the layers analyzed in the checkpoint file, if it exists.
+        """
+        if not os.path.exists(filepath):
+            return {}
+        with open(filepath, 'r') as csvf:
+            rows = list(csv.reader(csvf))
+        if not rows:
+            return {}
+        if rows[0] != self._header():
+            raise ValueError('The sparsities {} of checkpoint {} do not match the sparsities {}'.format(
+                rows[0][1:], filepath, self._header()[1:]))
+        finished = {}
+        for row in rows[1:]:
+            if row:
+                # the sparsities are analyzed in ascending order until early stop
+                finished[row[0]] = {sparsity: float(value) for sparsity, value in zip(self.sparsities, row[1:])}
+        logger.info('Loaded the sensitivities of %d layers from %s', len(finished), filepath)
+        return finished
+
+    def _append_checkpoint(self, filepath, layername):
+        if filepath is None:
+            return
+        write_header = not os.path.exists(filepath) or os.path.getsize(filepath) == 0
+        with open(filepath, 'a') as csvf:
+            csv_w = csv.writer(csvf)
+            if write_header:
+                csv_w.writerow(self._header())
+            csv_w.writerow(self._row(layername))
+            csvf.flush()
+            os.fsync(csvf.fileno())
+
+    def _row(self, layername):
+        row = [layername]
+        for sparsity in sorted(self.sensitivities[layername].keys()):
+            row.append(self.sensitivities[layername][sparsity])
+        return row
 
     def export(self, filepath):
         """
@@ -223,17 +349,11 @@ class SensitivityAnalysis:
         filepath : str
             Path of the output file
         """
-        str_sparsities = [str(x) for x in self.sparsities]
-        header = ['layername'] + str_sparsities
         with open(filepath, 'w') as csvf:
             csv_w = csv.writer(csvf)
-            csv_w.writerow(header)
+            csv_w.writerow(self._header())
             for layername in self.sensitivities:
-                row = []
-                row.append(layername)
-                for sparsity in sorted(self.sensitivities[layername].keys()):
-                    row.append(self.sensitivities[layername][sparsity])
-                csv_w.writerow(row)
+                csv_w.writerow(self._row(layername))
 
     def update_already_pruned(self, layername, ratio):
         """
@@ -16,18 +16,22 @@ RESHAPE_OPS = [CAT_TYPE, 'aten::view',
 
 
 class Dependency:
+    # whether the dependency is analyzed on the graph with tuples and lists unpacked
+    unpack = False
+
     def __init__(self, model=None, dummy_input=None, traced_model=None):
         """
-        Build the graph for the model.
+        Build the graph for the model. The graph is shared with the other
+        compression utilities through the graph cache.
         """
-        from nni.common.graph_utils import TorchModuleGraph
+        from nni.common.graph_utils import get_module_graph
 
         # check if the input is legal
         if traced_model is None:
             # user should provide model & dummy_input to trace
             # the model or a already traced model
             assert model is not None and dummy_input is not None
-        self.graph = TorchModuleGraph(model, dummy_input, traced_model)
+        self.graph = get_module_graph(model, dummy_input, traced_model, unpack=self.unpack)
         self.dependency = dict()
         self.build_dependency()
 
@@ -39,6 +43,8 @@ class Dependency:
 
 
 class ChannelDependency(Dependency):
+    unpack = True
+
     def __init__(self, model=None, dummy_input=None, traced_model=None):
         """
         This model analyze the channel dependencies between the conv
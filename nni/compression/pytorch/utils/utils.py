@@ -1,6 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import torch
+
 def get_module_by_name(model, module_name):
     """
     Get a module specified by its module name
@@ -28,3 +30,33 @@ def get_module_by_name(model, module_name):
         return model, leaf_module
     else:
         return None, None
+
+
+def fold_batch_norm(weight, bias, bn_module):
+    """
+    Fold a batch normalization into the weight and bias of the module before it, with its running statistics
+
+    Parameters
+    ----------
+    weight : torch.Tensor
+        the weight of the module, of which the first dimension is the output channel
+    bias : torch.Tensor
+        the bias of the module, ```None``` for no bias
+    bn_module : torch.nn.Module
+        the batch normalization
+
+    Returns
+    -------
+    torch.Tensor, torch.Tensor
+        the folded weight and the folded bias
+    """
+    factor = torch.rsqrt(bn_module.running_var + bn_module.eps)
+    if bn_module.affine:
+        factor = factor * bn_module.weight
+    if bias is None:
+        bias = torch.zeros_like(bn_module.running_mean)
+    folded_bias = (bias - bn_module.running_mean) * factor
+    if bn_module.affine:
+        folded_bias = folded_bias + bn_module.bias
+    folded_weight = weight * factor.reshape([-1] + [1] * (weight.dim() - 1))
+    return folded_weight, folded_bias
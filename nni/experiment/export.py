@@ -0,0 +1,227 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Streaming export of trial results.
+
+Final results are fetched at once with ``/export-data``, which has one record per trial (per parameter in multi-phase).
+Intermediate results, which can be many more, are fetched page by page with ``/metric-data-range``,
+for a range of trial sequence ids at a time, and each record is written as soon as its page is fetched.
+"""
+
+import csv
+import json
+import os
+import tempfile
+
+__all__ = ['EXPORT_FORMATS', 'DEFAULT_PAGE_SIZE', 'iter_trial_metrics', 'iter_trial_records', 'export_trial_records']
+
+EXPORT_FORMATS = ['json', 'jsonl', 'csv', 'parquet']
+
+# number of trial sequence ids in a page of intermediate results.
+# NNI manager scans all the metrics of the experiment for every page, so the pages should not be small
+DEFAULT_PAGE_SIZE = 1000
+
+# number of rows in a parquet row group
+PARQUET_BATCH_SIZE = 10000
+
+
+def _get(rest_get, api):
+    content = rest_get(api)
+    if content is None:
+        raise RuntimeError('Failed to get %s from NNI manager' % api)
+    return content
+
+
+def iter_trial_metrics(rest_get, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yield metrics of trials, fetching those of ``page_size`` trials at a time.
+
+    Parameters
+    ----------
+    rest_get : function
+        Function from a REST API path, e.g., ``/export-data``, to its parsed JSON response, or ``None`` on failure.
+    page_size : int
+        Number of trial sequence ids in a page. NNI manager scans all the metrics of the experiment to answer a page,
+        so the time of an export grows with the number of pages times the number of metrics.
+        A larger page takes fewer scans, at the cost of the memory of a page.
+
+    Yields
+    ------
+    tuple
+        Trial job id and its metric records, in the order of timestamp.
+    """
+    next_sequence_id = _get(rest_get, '/experiment').get('nextSequenceId', 0)
+    for start in range(0, next_sequence_id, page_size):
+        metrics = _get(rest_get, '/metric-data-range/%d/%d' % (start, start + page_size - 1))
+        groupby = dict()
+        for metric in metrics:
+            groupby.setdefault(metric['trialJobId'], []).append(metric)
+        del metrics
+        for trial_job_id, trial_metrics in groupby.items():
+            trial_metrics.sort(key=lambda metric: (metric['timestamp'], metric['sequence']))
+            yield trial_job_id, trial_metrics
+
+
+def iter_trial_records(rest_get, intermediate=False, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yield exported records of trials, i.e., dicts of ``parameter``, ``value`` and ``trialJobId``.
+    With ``intermediate``, records have ``intermediate`` as well, which is the list of intermediate results.
+    Records of trials are yielded in pages, only one page of intermediate results is in memory at a time.
+    """
+    records = _get(rest_get, '/export-data')
+    if not intermediate:
+        yield from records
+        return
+    groupby = dict()
+    for record in records:
+        groupby.setdefault(record['trialJobId'], []).append(record)
+    del records
+    for trial_job_id, metrics in iter_trial_metrics(rest_get, page_size):
+        trial_records = groupby.pop(trial_job_id, None)
+        if trial_records is None:
+            continue
+        intermediates = [json.loads(metric['data']) for metric in metrics if metric['type'] == 'PERIODICAL']
+        for record in trial_records:
+            record['intermediate'] = intermediates
+            yield record
+    # trials without any metric
+    for trial_records in groupby.values():
+        for record in trial_records:
+            record['intermediate'] = []
+            yield record
+
+
+def format_record(record):
+    """
+    Flatten a record into a row, with the keys of parameters, metrics (``reward`` for a scalar),
+    ``trialJobId`` and ``intermediate`` if exported.
+    """
+    row = dict()
+    if 'intermediate' in record:
+        row['intermediate'] = '[' + ','.join(value if isinstance(value, str) else json.dumps(value)
+                                             for value in record['intermediate']) + ']'
+    value = json.loads(record['value'])
+    if not isinstance(value, (float, int)):
+        row.update({**record['parameter'], **value, **{'trialJobId': record['trialJobId']}})
+    else:
+        row.update({**record['parameter'], **{'reward': value, 'trialJobId': record['trialJobId']}})
+    return row
+
+
+def export_trial_records(records, path, file_type):
+    """
+    Write records yielded by :func:`iter_trial_records` to ``path`` incrementally.
+
+    ``json`` and ``jsonl`` are written record by record. The header of ``csv`` and the schema of ``parquet``
+    are the union of all the rows, so rows are spooled to a temporary file next to ``path`` first,
+    and only the field names and types are kept in memory.
+
+    Returns
+    -------
+    int
+        Number of records written.
+    """
+    if file_type == 'json':
+        return _write_json(records, path)
+    if file_type == 'jsonl':
+        return _write_jsonl(records, path)
+    if file_type == 'csv':
+        return _write_spooled(records, path, _write_csv)
+    if file_type == 'parquet':
+        _import_pyarrow()
+        return _write_spooled(records, path, _write_parquet)
+    raise ValueError('Unknown type: %s' % file_type)
+
+
+def _write_json(records, path):
+    count = 0
+    with open(path, 'w') as file:
+        file.write('[')
+        for record in records:
+            if count:
+                file.write(', ')
+            file.write(json.dumps(record))
+            count += 1
+        file.write(']')
+    return count
+
+
+def _write_jsonl(records, path):
+    count = 0
+    with open(path, 'w') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+            count += 1
+    return count
+
+
+def _write_spooled(records, path, write):
+    fields = dict()  # field name to set of value types, in the order of appearance
+    count = 0
+    with tempfile.TemporaryFile('w+', dir=os.path.dirname(os.path.abspath(path))) as spool:
+        for record in records:
+            row = format_record(record)
+            for key, value in row.items():
+                fields.setdefault(key, set()).add(type(value))
+            spool.write(json.dumps(row) + '\n')
+            count += 1
+        if count:
+            spool.seek(0)
+            write((json.loads(line) for line in spool), fields, path)
+    return count
+
+
+def _write_csv(rows, fields, path):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, list(fields))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        return pyarrow
+    except ImportError:
+        raise RuntimeError('Exporting to parquet requires pyarrow, please install it with "pip install pyarrow"')
+
+
+def _parquet_column(pa, types):
+    """
+    Arrow type of a column and the conversion of its values. Columns of mixed or nested types are JSON strings.
+    """
+    types = types - {type(None)}
+    if types == {bool}:
+        return pa.bool_(), None
+    if types == {int}:
+        return pa.int64(), None
+    if types and types <= {int, float}:
+        return pa.float64(), lambda value: None if value is None else float(value)
+    if types <= {str}:
+        return pa.string(), None
+    return pa.string(), lambda value: None if value is None else json.dumps(value)
+
+
+def _write_parquet(rows, fields, path):
+    pa = _import_pyarrow()
+    columns = {name: _parquet_column(pa, types) for name, types in fields.items()}
+    schema = pa.schema([(name, arrow_type) for name, (arrow_type, _) in columns.items()])
+
+    def write_batch(writer, batch):
+        arrays = {}
+        for name, (_, convert) in columns.items():
+            values = [row.get(name) for row in batch]
+            arrays[name] = values if convert is None else [convert(value) for value in values]
+        writer.write_table(pa.Table.from_pydict(arrays, schema=schema))
+
+    with pa.parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH_SIZE:
+                write_batch(writer, batch)
+                batch = []
+        if batch:
+            write_batch(writer, batch)
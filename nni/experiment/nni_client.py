@@ -27,6 +27,8 @@ import re
 import json
 import requests
 
+from .export import DEFAULT_PAGE_SIZE, iter_trial_metrics, iter_trial_records, export_trial_records
+
 __all__ = [
     'LegacyExperiment',
     'TrialResult',
@@ -472,9 +474,10 @@ class LegacyExperiment:
             Each key is a trialJobId, the corresponding value is a list of `nnicli.TrialMetricData`.
         """
         _check_endpoint(self._endpoint)
-        api_path = METRICS_PATH if trial_job_id is None else os.path.join(METRICS_PATH, trial_job_id)
+        if trial_job_id is None:
+            return dict(self.iter_job_metrics())
         output = {}
-        trail_metrics = _nni_rest_get(self._endpoint, api_path)
+        trail_metrics = _nni_rest_get(self._endpoint, os.path.join(METRICS_PATH, trial_job_id))
         for metric in trail_metrics:
             trial_id = metric["trialJobId"]
             if trial_id not in output:
@@ -483,6 +486,25 @@ class LegacyExperiment:
                 output[trial_id].append(TrialMetricData(metric))
         return output
 
+    def iter_job_metrics(self, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Yield metrics of all trial jobs, fetching those of ``page_size`` trial jobs at a time,
+        so that only one page of metrics is in memory.
+
+        Parameters
+        ----------
+        page_size: int
+            Number of trial jobs in a page. See :func:`nni.experiment.export.iter_trial_metrics`.
+
+        Returns
+        ----------
+        generator
+            Tuples of trialJobId and the list of `nnicli.TrialMetricData`, in the order of timestamp.
+        """
+        _check_endpoint(self._endpoint)
+        for trial_id, metrics in iter_trial_metrics(self._rest_get, page_size):
+            yield trial_id, [TrialMetricData(metric) for metric in metrics]
+
     def export_data(self):
         """
         Return exported information for all trial jobs.
@@ -496,6 +518,34 @@ class LegacyExperiment:
         trial_results = _nni_rest_get(self._endpoint, EXPORT_DATA_PATH)
         return [TrialResult(e) for e in trial_results]
 
+    def export_data_to_file(self, path, file_type='csv', intermediate=False, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Write exported information for all trial jobs to a file, page by page.
+
+        Parameters
+        ----------
+        path: str
+            Path of the output file.
+        file_type: str
+            One of ``json``, ``jsonl``, ``csv`` and ``parquet``. ``parquet`` requires ``pyarrow``.
+        intermediate: bool
+            Whether intermediate results are included.
+        page_size: int
+            Number of trial jobs whose intermediate results are fetched at a time.
+            See :func:`nni.experiment.export.iter_trial_metrics`.
+
+        Returns
+        ----------
+        int
+            Number of records written.
+        """
+        _check_endpoint(self._endpoint)
+        records = iter_trial_records(self._rest_get, intermediate, page_size)
+        return export_trial_records(records, path, file_type)
+
+    def _rest_get(self, api):
+        return _nni_rest_get(self._endpoint, api.lstrip('/'))
+
     def get_experiment_profile(self):
         """
         Return experiment profile as a dict.
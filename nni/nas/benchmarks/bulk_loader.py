@@ -0,0 +1,173 @@
+"""
+Bulk loading of NAS benchmark databases.
+
+Rows are buffered and written with batched ``insert_many`` inside transactions, with SQLite tuned for building
+(WAL journal, ``synchronous=OFF``) and indices created only after all rows are written.
+Ids are assigned by the loader, so that rows referring to each other can be buffered together,
+and records can be produced by multiple processes while a single process writes them.
+"""
+
+import multiprocessing
+
+from peewee import ForeignKeyField, chunked, fn
+
+from .utils import json_dumps
+
+# maximum number of host parameters in one SQLite statement before 3.32
+SQLITE_MAX_VARIABLES = 999
+
+
+def _key_value(value):
+    if isinstance(value, (dict, list)):
+        return json_dumps(value)
+    return value
+
+
+class BulkLoader:
+    """
+    Write rows of benchmark models in bulk. Use it as a context manager,
+    which creates the tables, and writes the remaining rows and creates indices on exit.
+
+    A record is ``(model, row, children)``, where ``row`` is a dict of field values and ``children``
+    is a list of records (or ``None``) whose foreign key to ``model`` is filled with the id of ``row``.
+
+    Parameters
+    ----------
+    db : peewee.Database
+        Database to write into.
+    models : list of peewee.Model
+        Models to create, in the order of dependency, i.e., referred models first.
+    unique_fields : dict
+        Model to a list of field names. Rows of these models with the same values on these fields are written once,
+        and later insertions return the id of the first one, like ``get_or_create``.
+    batch_size : int
+        Number of buffered rows that triggers writing.
+    """
+
+    def __init__(self, db, models, unique_fields=None, batch_size=50000):
+        self.db = db
+        self.models = models
+        self.unique_fields = unique_fields or {}
+        self.batch_size = batch_size
+        self._buffers = {model: [] for model in models}
+        self._num_buffered = 0
+        self._next_id = {}
+        self._unique_ids = {model: {} for model in self.unique_fields}
+
+    def __enter__(self):
+        self.db.connect(reuse_if_open=True)
+        self.db.pragma('journal_mode', 'wal')
+        self.db.pragma('synchronous', 0)
+        for model in self.models:
+            model._schema.create_table(safe=True)
+            self._next_id[model] = (model.select(fn.MAX(model.id)).scalar() or 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+            for model in self.models:
+                model._schema.create_indexes(safe=True)
+        self.db.pragma('synchronous', 2)
+        # leave a single database file
+        self.db.pragma('journal_mode', 'delete')
+        self.db.close()
+
+    def _foreign_key(self, model, parent):
+        for field in model._meta.sorted_fields:
+            if isinstance(field, ForeignKeyField) and field.rel_model is parent:
+                return field.name
+        raise ValueError('%s has no foreign key to %s' % (model.__name__, parent.__name__))
+
+    def _unique_key(self, model, row):
+        return tuple(_key_value(row.get(name)) for name in self.unique_fields[model])
+
+    def lookup(self, model, row):
+        """
+        Id of the row inserted before with the same values on the unique fields of ``model``, like ``get``.
+
+        Raises
+        ------
+        KeyError
+            If no such row has been inserted.
+        """
+        key = self._unique_key(model, row)
+        if key not in self._unique_ids[model]:
+            raise KeyError('%s with %s is not inserted' % (model.__name__, dict(zip(self.unique_fields[model], key))))
+        return self._unique_ids[model][key]
+
+    def insert(self, model, row, children=None):
+        """
+        Buffer a row, and rows of its children.
+
+        Returns
+        -------
+        int
+            Id of the row.
+        """
+        key = None
+        if model in self.unique_fields:
+            key = self._unique_key(model, row)
+        if key is not None and key in self._unique_ids[model]:
+            row_id = self._unique_ids[model][key]
+        else:
+            row_id = self._next_id[model]
+            self._next_id[model] += 1
+            self._buffers[model].append(dict(row, id=row_id))
+            self._num_buffered += 1
+            if key is not None:
+                self._unique_ids[model][key] = row_id
+        for child_model, child_row, grandchildren in children or []:
+            child_row = dict(child_row)
+            child_row[self._foreign_key(child_model, model)] = row_id
+            self.insert(child_model, child_row, grandchildren)
+        if self._num_buffered >= self.batch_size:
+            self.flush()
+        return row_id
+
+    def insert_records(self, records):
+        """
+        Buffer an iterable of records, e.g., the result of :func:`produce_records`.
+        """
+        for model, row, children in records:
+            self.insert(model, row, children)
+
+    def flush(self):
+        """
+        Write all buffered rows in one transaction.
+        """
+        with self.db.atomic():
+            for model in self.models:
+                rows = self._buffers[model]
+                if not rows:
+                    continue
+                num_fields = len(model._meta.sorted_fields)
+                for batch in chunked(rows, max(1, SQLITE_MAX_VARIABLES // num_fields)):
+                    model.insert_many(batch).execute()
+                self._buffers[model] = []
+        self._num_buffered = 0
+
+
+def produce_records(func, items, num_workers=1, chunksize=1):
+    """
+    Apply ``func`` to each of ``items`` and yield the records it returns, in the order of ``items``.
+    With more than one worker, ``func`` runs in a pool of processes, while the records are consumed
+    (i.e., written by a :class:`BulkLoader`) in the calling process. ``func`` must be picklable.
+
+    Parameters
+    ----------
+    func : function
+        Function from an item to a list of records.
+    items : iterable
+    num_workers : int
+        Number of processes.
+    chunksize : int
+        Number of items sent to a process at a time.
+    """
+    if num_workers <= 1:
+        for item in items:
+            yield from func(item)
+        return
+    with multiprocessing.Pool(num_workers) as pool:
+        for records in pool.imap(func, items, chunksize):
+            yield from records
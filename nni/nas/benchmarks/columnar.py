@@ -0,0 +1,363 @@
+"""
+Columnar backend of NAS benchmarks.
+
+Each benchmark database is exported once into a directory of NumPy arrays, one file per column,
+which are then opened memory-mapped. String and JSON columns are dictionary-encoded into integer codes,
+foreign keys are stored as row indices, and rows referring to the same parent are grouped with offsets,
+so that queries are answered with hash lookups and array slicing instead of SQL and ORM objects.
+
+Export a benchmark after its database has been generated with ``python -m nni.nas.benchmarks.columnar nasbench201``,
+then ``export NASBENCHMARK_BACKEND=columnar`` to make the query functions use it.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+
+import numpy as np
+
+from .constants import DATABASE_DIR
+from .utils import json_dumps
+
+_logger = logging.getLogger(__name__)
+
+COLUMNAR_FORMAT_VERSION = 1
+
+# role of each table -> role of the table its foreign key refers to
+_TABLE_PARENTS = {
+    'stats': 'config',
+    'intermediates': 'stats'
+}
+
+_BENCHMARK_MODELS = {
+    'nasbench101': ('nni.nas.benchmarks.nasbench101', 'Nb101TrialConfig', 'Nb101TrialStats', 'Nb101IntermediateStats'),
+    'nasbench201': ('nni.nas.benchmarks.nasbench201', 'Nb201TrialConfig', 'Nb201TrialStats', 'Nb201IntermediateStats'),
+    'nds': ('nni.nas.benchmarks.nds', 'NdsTrialConfig', 'NdsTrialStats', 'NdsIntermediateStats'),
+    'nlp': ('nni.nas.benchmarks.nlp', 'NlpTrialConfig', 'NlpTrialStats', 'NlpIntermediateStats')
+}
+
+
+def columnar_path(name):
+    return os.path.join(DATABASE_DIR, name + '.columnar')
+
+
+def _field_kind(field):
+    from peewee import CharField, FloatField, ForeignKeyField, IntegerField
+    from playhouse.sqlite_ext import JSONField
+    if isinstance(field, ForeignKeyField):
+        return 'foreign'
+    if isinstance(field, JSONField):
+        return 'json'
+    if isinstance(field, CharField):
+        return 'str'
+    if isinstance(field, FloatField):
+        return 'float'
+    if isinstance(field, IntegerField):  # also covers AutoField
+        if field.null:
+            raise ValueError('Nullable integer field %s is not supported' % field.name)
+        return 'int'
+    raise ValueError('Unsupported field type %s of %s' % (type(field).__name__, field.name))
+
+
+def _export_table(model, role, path, ids, chunk_size=100000):
+    """
+    Write the columns of one table, ordered by id. ``ids`` holds the sorted ids of exported tables by role,
+    so that foreign keys can be converted to row indices.
+    """
+    fields = model._meta.sorted_fields
+    kinds = [_field_kind(field) for field in fields]
+    num_rows = model.select().count()
+    columns = []
+    vocabs = []
+    for kind in kinds:
+        columns.append(np.zeros(num_rows, dtype=np.float64 if kind == 'float' else np.int64))
+        vocabs.append({} if kind in ('str', 'json') else None)
+
+    sql = 'SELECT %s FROM "%s" ORDER BY "id"' % (', '.join('"%s"' % f.column_name for f in fields),
+                                                 model._meta.table_name)
+    cursor = model._meta.database.execute_sql(sql)
+    row_index = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for column_index, (kind, vocab) in enumerate(zip(kinds, vocabs)):
+            values = [row[column_index] for row in rows]
+            if kind == 'json':
+                # normalize the text, so that values can be encoded with json_dumps when querying
+                values = [None if v is None else json_dumps(json.loads(v)) for v in values]
+            if vocab is not None:
+                # dictionary encoding, null is -1
+                values = [-1 if v is None else vocab.setdefault(v, len(vocab)) for v in values]
+            elif kind == 'float':
+                values = [np.nan if v is None else v for v in values]
+            columns[column_index][row_index:row_index + len(rows)] = values
+        row_index += len(rows)
+
+    meta = []
+    for field, kind, column, vocab in zip(fields, kinds, columns, vocabs):
+        if kind == 'foreign':
+            parent_ids = ids[_TABLE_PARENTS[role]]
+            column = np.searchsorted(parent_ids, column)
+            # group rows by their parent, keeping the original order within each group
+            order = np.argsort(column, kind='stable')
+            offsets = np.searchsorted(column[order], np.arange(len(parent_ids) + 1))
+            np.save(os.path.join(path, '%s.%s.order.npy' % (role, field.name)), order)
+            np.save(os.path.join(path, '%s.%s.offsets.npy' % (role, field.name)), offsets)
+        if vocab is not None:
+            with open(os.path.join(path, '%s.%s.vocab.json' % (role, field.name)), 'w') as f:
+                json.dump(list(vocab.keys()), f)
+            column = column.astype(np.int32)
+        np.save(os.path.join(path, '%s.%s.npy' % (role, field.name)), column)
+        meta.append({'name': field.name, 'kind': kind, 'null': field.null})
+    ids[role] = columns[[field.name for field in fields].index('id')]
+    return meta, num_rows
+
+
+def export_columnar(config_model, stats_model, intermediate_model, path):
+    """
+    Export a benchmark database into a columnar directory that can be opened by :class:`ColumnarBenchmark`.
+
+    Parameters
+    ----------
+    config_model : peewee.Model
+        Model of trial configs.
+    stats_model : peewee.Model
+        Model of trial stats, with a foreign key ``config`` to ``config_model``.
+    intermediate_model : peewee.Model
+        Model of intermediate stats, with a foreign key ``trial`` to ``stats_model``.
+    path : str
+        Directory to write the arrays into.
+    """
+    os.makedirs(path, exist_ok=True)
+    ids = {}
+    tables = {}
+    for role, model in [('config', config_model), ('stats', stats_model), ('intermediates', intermediate_model)]:
+        fields, num_rows = _export_table(model, role, path, ids)
+        tables[role] = {'fields': fields, 'num_rows': num_rows}
+        _logger.info('Exported %d rows of %s', num_rows, model.__name__)
+    # meta is written at last, so that an interrupted export is not loaded
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'version': COLUMNAR_FORMAT_VERSION, 'tables': tables}, f)
+
+
+class _Table:
+    def __init__(self, path, role, meta):
+        self.path = path
+        self.role = role
+        self.num_rows = meta['num_rows']
+        self.fields = meta['fields']
+        self.kinds = {field['name']: field['kind'] for field in self.fields}
+        self.nullable = {field['name'] for field in self.fields if field['null']}
+        self.columns = {field['name']: self._load('%s.npy' % field['name']) for field in self.fields}
+        self._vocabs = {}
+        self._vocab_index = {}
+
+    def _load(self, name):
+        # a plain ndarray view still maps the file, without the overhead of np.memmap on every indexing
+        return np.load(os.path.join(self.path, '%s.%s' % (self.role, name)), mmap_mode='r').view(np.ndarray)
+
+    def children(self, field_name):
+        return self._load('%s.order.npy' % field_name), self._load('%s.offsets.npy' % field_name)
+
+    def vocab(self, field_name):
+        if field_name not in self._vocabs:
+            with open(os.path.join(self.path, '%s.%s.vocab.json' % (self.role, field_name))) as f:
+                self._vocabs[field_name] = json.load(f)
+        return self._vocabs[field_name]
+
+    def encode(self, field_name, value):
+        """
+        Encode a value into the stored representation. Returns ``None`` if no row can have this value.
+        """
+        kind = self.kinds[field_name]
+        if kind not in ('str', 'json'):
+            return value
+        if field_name not in self._vocab_index:
+            self._vocab_index[field_name] = {v: i for i, v in enumerate(self.vocab(field_name))}
+        return self._vocab_index[field_name].get(json_dumps(value) if kind == 'json' else value)
+
+    def decode(self, field_name, values):
+        kind = self.kinds[field_name]
+        if kind in ('str', 'json'):
+            vocab = self.vocab(field_name)
+            values = [None if v < 0 else vocab[v] for v in values]
+            if kind == 'json':
+                values = [None if v is None else json.loads(v) for v in values]
+            return values
+        if field_name in self.nullable:
+            return [None if v != v else v for v in values]  # nan is null
+        return values
+
+    def rows(self, indices):
+        """
+        Convert rows into dicts in the format of ``playhouse.shortcuts.model_to_dict``, without foreign keys.
+        """
+        columns = {}
+        for field in self.fields:
+            name = field['name']
+            if field['kind'] != 'foreign':
+                columns[name] = self.decode(name, self.columns[name][indices].tolist())
+        return [dict(zip(columns.keys(), values)) for values in zip(*columns.values())] \
+            if columns else [{} for _ in indices]
+
+    def arrays(self, indices):
+        """
+        Convert rows into a dict from field name to numpy array, without foreign keys, ordered by ``current_epoch``.
+        """
+        if 'current_epoch' in self.columns:
+            indices = indices[np.argsort(self.columns['current_epoch'][indices], kind='stable')]
+        return {field['name']: np.array(self.columns[field['name']][indices])
+                for field in self.fields if field['kind'] != 'foreign'}
+
+
+class ColumnarBenchmark:
+    """
+    A benchmark exported by :func:`export_columnar`, opened memory-mapped.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the exported arrays.
+    """
+
+    chunk_size = 1024
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != COLUMNAR_FORMAT_VERSION:
+            raise ValueError('Columnar benchmark %s has unsupported format version %s, please export it again' %
+                             (path, meta['version']))
+        self.config = _Table(path, 'config', meta['tables']['config'])
+        self.stats = _Table(path, 'stats', meta['tables']['stats'])
+        self.intermediates = _Table(path, 'intermediates', meta['tables']['intermediates'])
+        self._stats_order, self._stats_offsets = self.stats.children('config')
+        self._intermediates_order, self._intermediates_offsets = self.intermediates.children('trial')
+        self._indices = {}
+
+    def _index(self, field_names):
+        """
+        Hash index from the values of ``field_names`` to matched config rows, built on first use.
+        """
+        if field_names not in self._indices:
+            keys = np.stack([np.asarray(self.config.columns[name]) for name in field_names], axis=1)
+            unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            order = np.argsort(inverse, kind='stable')
+            offsets = np.searchsorted(inverse[order], np.arange(len(unique_keys) + 1))
+            self._indices[field_names] = {
+                tuple(key): order[offsets[i]:offsets[i + 1]] for i, key in enumerate(unique_keys.tolist())
+            }
+        return self._indices[field_names]
+
+    def match_configs(self, conditions):
+        """
+        Rows of configs matching all the conditions, in the order of config id.
+
+        Parameters
+        ----------
+        conditions : dict
+            Field name to required value. ``None`` values are wildcards.
+        """
+        conditions = {name: value for name, value in conditions.items() if value is not None}
+        if not conditions:
+            return np.arange(self.config.num_rows)
+        field_names = tuple(sorted(conditions))
+        key = tuple(self.config.encode(name, conditions[name]) for name in field_names)
+        if any(k is None for k in key):
+            return np.arange(0)
+        return self._index(field_names).get(key, np.arange(0))
+
+    def _group(self, parents, order, offsets):
+        if len(parents) == 0:
+            return np.arange(0)
+        return np.concatenate([order[offsets[p]:offsets[p + 1]] for p in parents])
+
+    def query(self, conditions, reduction=None, include_intermediates=False, intermediates_as_arrays=False,
+              mean_excluded=('id', 'config')):
+        """
+        Query trial stats. Arguments and results follow the query functions of the SQLite backend.
+
+        Parameters
+        ----------
+        conditions : dict
+            Conditions on trial configs. See :meth:`match_configs`.
+        reduction : str or None
+            ``None`` or ``'mean'``.
+        include_intermediates : boolean
+            If true, intermediate results will be returned.
+        intermediates_as_arrays : boolean
+            If true, intermediate results are a dict from field name to numpy array instead of a list of dicts.
+        mean_excluded : list of str
+            Fields of trial stats not averaged when ``reduction`` is ``'mean'``. They are ``None`` in results.
+
+        Returns
+        -------
+        generator of dict
+        """
+        configs = self.match_configs(conditions)
+        if reduction is None:
+            rows = np.sort(self._group(configs, self._stats_order, self._stats_offsets))
+            # convert in chunks, so that wildcard queries do not materialize all the results at once
+            for start in range(0, len(rows), self.chunk_size):
+                chunk = rows[start:start + self.chunk_size]
+                config_dicts = self.config.rows(self.stats.columns['config'][chunk])
+                for row, data, config in zip(chunk, self.stats.rows(chunk), config_dicts):
+                    data['config'] = config
+                    if include_intermediates:
+                        begin, end = self._intermediates_offsets[row], self._intermediates_offsets[row + 1]
+                        intermediates = self._intermediates_order[begin:end]
+                        data['intermediates'] = self.intermediates.arrays(intermediates) \
+                            if intermediates_as_arrays else self.intermediates.rows(intermediates)
+                    yield data
+        elif reduction == 'mean':
+            for config_row in configs:
+                rows = self._stats_order[self._stats_offsets[config_row]:self._stats_offsets[config_row + 1]]
+                if len(rows) == 0:
+                    continue
+                data = {}
+                for field in self.stats.fields:
+                    name = field['name']
+                    if name in mean_excluded:
+                        data[name] = None
+                    else:
+                        values = np.asarray(self.stats.columns[name][rows], dtype=np.float64)
+                        # nulls are ignored like AVG in SQL
+                        values = values[~np.isnan(values)]
+                        data[name] = float(values.mean()) if len(values) else None
+                data['config'] = self.config.rows([config_row])[0]
+                if include_intermediates:
+                    # reduced trials have no intermediates
+                    data['intermediates'] = self.intermediates.arrays(np.arange(0)) if intermediates_as_arrays else []
+                yield data
+        else:
+            raise ValueError('Unsupported reduction: \'%s\'' % reduction)
+
+
+@functools.lru_cache(maxsize=None)
+def load_columnar(name):
+    """
+    Open the exported columnar benchmark of ``name``, e.g., ``nasbench201``. Opened benchmarks are shared.
+    """
+    path = columnar_path(name)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        raise FileNotFoundError('Columnar benchmark not found in %s. Export it with '
+                                '`python -m nni.nas.benchmarks.columnar %s`.' % (path, name))
+    return ColumnarBenchmark(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a NAS benchmark database into the columnar format.')
+    parser.add_argument('benchmark', choices=list(_BENCHMARK_MODELS.keys()))
+    args = parser.parse_args()
+    module_name, *model_names = _BENCHMARK_MODELS[args.benchmark]
+    module = __import__(module_name, fromlist=model_names)
+    export_columnar(*[getattr(module, name) for name in model_names], columnar_path(args.benchmark))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
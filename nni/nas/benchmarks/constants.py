@@ -2,3 +2,5 @@ import os
 
 
 DATABASE_DIR = os.environ.get("NASBENCHMARK_DIR", os.path.expanduser("~/.nni/nasbenchmark"))
+# "sqlite" queries the peewee databases, "columnar" queries the arrays exported by nni.nas.benchmarks.columnar
+DATABASE_BACKEND = os.environ.get("NASBENCHMARK_BACKEND", "sqlite")
@@ -1,12 +1,15 @@
 import functools
 
 from peewee import fn
-from playhouse.shortcuts import model_to_dict
-from .model import Nb101TrialStats, Nb101TrialConfig
+from ..columnar import load_columnar
+from ..constants import DATABASE_BACKEND
+from ..utils import query_trial_dicts
+from .model import Nb101TrialStats, Nb101TrialConfig, Nb101IntermediateStats
 from .graph_util import hash_module, infer_num_vertices
 
 
-def query_nb101_trial_stats(arch, num_epochs, isomorphism=True, reduction=None, include_intermediates=False):
+def query_nb101_trial_stats(arch, num_epochs, isomorphism=True, reduction=None, include_intermediates=False,
+                            intermediates_as_arrays=False):
     """
     Query trial stats of NAS-Bench-101 given conditions.
 
@@ -26,6 +29,9 @@ def query_nb101_trial_stats(arch, num_epochs, isomorphism=True, reduction=None,
         If 'mean', fields in trial stats will be averaged given the same trial config.
     include_intermediates : boolean
         If true, intermediate results will be returned.
+    intermediates_as_arrays : boolean
+        If true, intermediate results are returned as a dict from field name to numpy array, ordered by epoch,
+        instead of a list of dicts.
 
     Returns
     -------
@@ -36,6 +42,16 @@ def query_nb101_trial_stats(arch, num_epochs, isomorphism=True, reduction=None,
     fields = []
     if reduction == 'none':
         reduction = None
+    if DATABASE_BACKEND == 'columnar':
+        conditions = {'num_epochs': num_epochs}
+        if arch is not None:
+            if isomorphism:
+                conditions['hash'] = hash_module(arch, infer_num_vertices(arch))
+            else:
+                conditions['arch'] = arch
+        yield from load_columnar('nasbench101').query(conditions, reduction, include_intermediates,
+                                                      intermediates_as_arrays)
+        return
     if reduction == 'mean':
         for field_name in Nb101TrialStats._meta.sorted_field_names:
             if field_name not in ['id', 'config']:
@@ -58,13 +74,4 @@ def query_nb101_trial_stats(arch, num_epochs, isomorphism=True, reduction=None,
         query = query.where(functools.reduce(lambda a, b: a & b, conditions))
     if reduction is not None:
         query = query.group_by(Nb101TrialStats.config)
-    for trial in query:
-        if include_intermediates:
-            data = model_to_dict(trial)
-            # exclude 'trial' from intermediates as it is already available in data
-            data['intermediates'] = [
-                {k: v for k, v in model_to_dict(t).items() if k != 'trial'} for t in trial.intermediates
-            ]
-            yield data
-        else:
-            yield model_to_dict(trial)
+    yield from query_trial_dicts(query, Nb101IntermediateStats, include_intermediates, intermediates_as_arrays)
@@ -4,6 +4,7 @@ import re
 import tqdm
 import torch
 
+from ..bulk_loader import BulkLoader
 from .constants import NONE, SKIP_CONNECT, CONV_1X1, CONV_3X3, AVG_POOL_3X3
 from .model import db, Nb201TrialConfig, Nb201TrialStats, Nb201IntermediateStats
 
@@ -39,8 +40,9 @@ def main():
         'imagenet16-120': ['train', 'x-valid', 'x-test', 'ori-test'],
     }
 
-    with db:
-        db.create_tables([Nb201TrialConfig, Nb201TrialStats, Nb201IntermediateStats])
+    models = [Nb201TrialConfig, Nb201TrialStats, Nb201IntermediateStats]
+    unique_fields = {Nb201TrialConfig: ['arch', 'num_epochs', 'dataset']}
+    with BulkLoader(db, models, unique_fields=unique_fields) as loader:
         print('Loading NAS-Bench-201 pickle...')
         nb201_data = torch.load(args.input_file)
         print('Dumping architectures...')
@@ -48,8 +50,8 @@ def main():
             arch_json = parse_arch_str(arch_str)
             for epochs in [12, 200]:
                 for dataset in Nb201TrialConfig.dataset.choices:
-                    Nb201TrialConfig.create(arch=arch_json, num_epochs=epochs, dataset=dataset,
-                                            num_channels=16, num_cells=5)
+                    loader.insert(Nb201TrialConfig, {'arch': arch_json, 'num_epochs': epochs, 'dataset': dataset,
+                                                     'num_channels': 16, 'num_cells': 5})
         for arch_info in tqdm.tqdm(nb201_data['arch2infos'].values(),
                                    desc='Processing architecture statistics'):
             for epochs_verb, d in arch_info.items():
@@ -76,16 +78,11 @@ def main():
                         'valid_evaluation_time': r['eval_times']['{}@{}'.format(sp[1], epochs - 1)],
                         'test_evaluation_time': r['eval_times']['{}@{}'.format(sp[2], epochs - 1)],
                         'ori_test_evaluation_time': r['eval_times']['{}@{}'.format(sp[3], epochs - 1)],
+                        'seed': seed
                     }
-                    config = Nb201TrialConfig.get(
-                        (Nb201TrialConfig.num_epochs == epochs) &
-                        (Nb201TrialConfig.arch == arch_json) &
-                        (Nb201TrialConfig.dataset == dataset.lower())
-                    )
-                    trial_stats = Nb201TrialStats.create(config=config, seed=seed, **data_parsed)
                     intermediate_stats = []
                     for epoch in range(epochs):
-                        data_parsed = {
+                        intermediate_parsed = {
                             'train_acc': r['train_acc1es'].get(epoch),
                             'valid_acc': r['eval_acc1es'].get('{}@{}'.format(sp[1], epoch)),
                             'test_acc': r['eval_acc1es'].get('{}@{}'.format(sp[2], epoch)),
@@ -95,12 +92,14 @@ def main():
                             'test_loss': r['eval_losses'].get('{}@{}'.format(sp[2], epoch)),
                             'ori_test_loss': r['eval_losses'].get('{}@{}'.format(sp[3], epoch)),
                         }
-                        if all([v is None for v in data_parsed.values()]):
+                        if all([v is None for v in intermediate_parsed.values()]):
                             continue
-                        data_parsed.update(current_epoch=epoch + 1, trial=trial_stats)
-                        intermediate_stats.append(data_parsed)
-                    Nb201IntermediateStats.insert_many(intermediate_stats).execute(db)
-
+                        intermediate_parsed.update(current_epoch=epoch + 1)
+                        intermediate_stats.append((Nb201IntermediateStats, intermediate_parsed, None))
+                    # the config must have been inserted with the architectures
+                    config_id = loader.lookup(Nb201TrialConfig, {'arch': arch_json, 'num_epochs': epochs,
+                                                                 'dataset': dataset.lower()})
+                    loader.insert(Nb201TrialStats, dict(data_parsed, config=config_id), intermediate_stats)
 
 if __name__ == '__main__':
     main()
@@ -1,11 +1,14 @@
 import functools
 
 from peewee import fn
-from playhouse.shortcuts import model_to_dict
-from .model import Nb201TrialStats, Nb201TrialConfig
+from ..columnar import load_columnar
+from ..constants import DATABASE_BACKEND
+from ..utils import query_trial_dicts
+from .model import Nb201TrialStats, Nb201TrialConfig, Nb201IntermediateStats
 
 
-def query_nb201_trial_stats(arch, num_epochs, dataset, reduction=None, include_intermediates=False):
+def query_nb201_trial_stats(arch, num_epochs, dataset, reduction=None, include_intermediates=False,
+                            intermediates_as_arrays=False):
     """
     Query trial stats of NAS-Bench-201 given conditions.
 
@@ -25,6 +28,9 @@ def query_nb201_trial_stats(arch, num_epochs, dataset, reduction=None, include_i
         If 'mean', fields in trial stats will be averaged given the same trial config.
     include_intermediates : boolean
         If true, intermediate results will be returned.
+    intermediates_as_arrays : boolean
+        If true, intermediate results are returned as a dict from field name to numpy array, ordered by epoch,
+        instead of a list of dicts.
 
     Returns
     -------
@@ -35,6 +41,12 @@ def query_nb201_trial_stats(arch, num_epochs, dataset, reduction=None, include_i
     fields = []
     if reduction == 'none':
         reduction = None
+    if DATABASE_BACKEND == 'columnar':
+        conditions = {'arch': arch, 'num_epochs': num_epochs, 'dataset': dataset}
+        yield from load_columnar('nasbench201').query(conditions, reduction, include_intermediates,
+                                                      intermediates_as_arrays,
+                                                      mean_excluded=['id', 'config', 'seed'])
+        return
     if reduction == 'mean':
         for field_name in Nb201TrialStats._meta.sorted_field_names:
             if field_name not in ['id', 'config', 'seed']:
@@ -55,13 +67,4 @@ def query_nb201_trial_stats(arch, num_epochs, dataset, reduction=None, include_i
         query = query.where(functools.reduce(lambda a, b: a & b, conditions))
     if reduction is not None:
         query = query.group_by(Nb201TrialStats.config)
-    for trial in query:
-        if include_intermediates:
-            data = model_to_dict(trial)
-            # exclude 'trial' from intermediates as it is already available in data
-            data['intermediates'] = [
-                {k: v for k, v in model_to_dict(t).items() if k != 'trial'} for t in trial.intermediates
-            ]
-            yield data
-        else:
-            yield model_to_dict(trial)
+    yield from query_trial_dicts(query, Nb201IntermediateStats, include_intermediates, intermediates_as_arrays)
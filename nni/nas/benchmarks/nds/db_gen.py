@@ -5,10 +5,11 @@ import os
 import numpy as np
 import tqdm
 
+from ..bulk_loader import BulkLoader, produce_records
 from .model import db, NdsTrialConfig, NdsTrialStats, NdsIntermediateStats
 
 
-def inject_item(db, item, proposer, dataset, generator):
+def parse_item(item, proposer, dataset, generator):
     if 'genotype' in item['net']:
         model_family = 'nas_cell'
         num_nodes_normal = len(item['net']['genotype']['normal']) // 2
@@ -41,46 +42,67 @@ def inject_item(db, item, proposer, dataset, generator):
             raise ValueError('Unrecognized block type')
         model_spec = {k: v for k, v in item['net'].items() if v and k != 'block_type'}
         cell_spec = {}
-    trial_config, _ = NdsTrialConfig.get_or_create(
-        model_family=model_family,
-        model_spec=model_spec,
-        cell_spec=cell_spec,
-        proposer=proposer,
-        base_lr=item['optim']['base_lr'],
-        weight_decay=item['optim']['wd'],
-        num_epochs=item['optim']['max_ep'],
-        dataset=dataset,
-        generator=generator
-    )
-    assert len(item['train_ep_top1']) == len(item['test_ep_top1']) == trial_config.num_epochs
-    trial = NdsTrialStats.create(
-        config=trial_config,
-        seed=item['rng_seed'],
-        final_train_acc=100 - item['train_ep_top1'][-1],
-        final_train_loss=item['train_ep_loss'][-1],
-        final_test_acc=100 - item['test_ep_top1'][-1],
-        best_train_acc=100 - min(item['train_ep_top1']),
-        best_train_loss=np.nanmin(item['train_ep_loss']).item(),
-        best_test_acc=100 - min(item['test_ep_top1']),
-        parameters=item['params'] / 1e6,
-        flops=item['flops'] / 1e6,
-        iter_time=item['iter_time']
-    )
+    config = {
+        'model_family': model_family,
+        'model_spec': model_spec,
+        'cell_spec': cell_spec,
+        'proposer': proposer,
+        'base_lr': item['optim']['base_lr'],
+        'weight_decay': item['optim']['wd'],
+        'num_epochs': item['optim']['max_ep'],
+        'dataset': dataset,
+        'generator': generator
+    }
+    assert len(item['train_ep_top1']) == len(item['test_ep_top1']) == config['num_epochs']
+    trial = {
+        'seed': item['rng_seed'],
+        'final_train_acc': 100 - item['train_ep_top1'][-1],
+        'final_train_loss': item['train_ep_loss'][-1],
+        'final_test_acc': 100 - item['test_ep_top1'][-1],
+        'best_train_acc': 100 - min(item['train_ep_top1']),
+        'best_train_loss': np.nanmin(item['train_ep_loss']).item(),
+        'best_test_acc': 100 - min(item['test_ep_top1']),
+        'parameters': item['params'] / 1e6,
+        'flops': item['flops'] / 1e6,
+        'iter_time': item['iter_time']
+    }
     intermediate_stats = []
-    for i in range(trial_config.num_epochs):
-        intermediate_stats.append({
-            'trial': trial,
+    for i in range(config['num_epochs']):
+        intermediate_stats.append((NdsIntermediateStats, {
             'current_epoch': i + 1,
             'train_loss': item['train_ep_loss'][i],
             'train_acc': 100 - item['train_ep_top1'][i],
             'test_acc': 100 - item['test_ep_top1'][i]
-        })
-    NdsIntermediateStats.insert_many(intermediate_stats).execute(db)
+        }, None))
+    return NdsTrialConfig, config, [(NdsTrialStats, trial, intermediate_stats)]
+
+
+def parse_file(args):
+    input_dir, json_file = args
+    if 'fix-w-d' in json_file:
+        generator = 'fix_w_d'
+    elif 'lr-wd' in json_file:
+        generator = 'tune_lr_wd'
+    else:
+        generator = 'random'
+    if '_in' in json_file:
+        dataset = 'imagenet'
+    else:
+        dataset = 'cifar10'
+    proposer = json_file.split(".")[0].split("_")[0].lower()
+    with open(os.path.join(input_dir, json_file), 'r') as f:
+        data = json.load(f)
+    if 'top' in data and 'mid' in data:
+        items = data['top'] + data['mid']
+    else:
+        items = data
+    return [parse_item(item, proposer, dataset, generator) for item in items]
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('input_dir', help='Path to extracted NDS data dir.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes parsing the data files.')
     args = parser.parse_args()
 
     sweep_list = [
@@ -120,34 +142,13 @@ def main():
         'Vanilla_rng3.json'
     ]
 
-    with db:
-        db.create_tables([NdsTrialConfig, NdsTrialStats, NdsIntermediateStats])
-        for json_idx, json_file in enumerate(sweep_list, start=1):
-            if 'fix-w-d' in json_file:
-                generator = 'fix_w_d'
-            elif 'lr-wd' in json_file:
-                generator = 'tune_lr_wd'
-            else:
-                generator = 'random'
-            if '_in' in json_file:
-                dataset = 'imagenet'
-            else:
-                dataset = 'cifar10'
-            proposer = json_file.split(".")[0].split("_")[0].lower()
-            with open(os.path.join(args.input_dir, json_file), 'r') as f:
-                data = json.load(f)
-            if 'top' in data and 'mid' in data:
-                for t in tqdm.tqdm(data['top'],
-                                   desc='[{}/{}] Processing {} (top)'.format(json_idx, len(sweep_list), json_file)):
-                    inject_item(db, t, proposer, dataset, generator)
-                for t in tqdm.tqdm(data['mid'],
-                                   desc='[{}/{}] Processing {} (mid)'.format(json_idx, len(sweep_list), json_file)):
-                    inject_item(db, t, proposer, dataset, generator)
-            else:
-                for job in tqdm.tqdm(data,
-                                     desc='[{}/{}] Processing {}'.format(json_idx, len(sweep_list), json_file)):
-                    inject_item(db, job, proposer, dataset, generator)
-
+    models = [NdsTrialConfig, NdsTrialStats, NdsIntermediateStats]
+    unique_fields = {NdsTrialConfig: ['model_family', 'model_spec', 'cell_spec', 'proposer', 'base_lr',
+                                      'weight_decay', 'num_epochs', 'dataset', 'generator']}
+    with BulkLoader(db, models, unique_fields=unique_fields) as loader:
+        records = produce_records(parse_file, [(args.input_dir, json_file) for json_file in sweep_list],
+                                  num_workers=args.workers)
+        loader.insert_records(tqdm.tqdm(records, desc='Processing {} files'.format(len(sweep_list))))
 
 if __name__ == '__main__':
     main()
@@ -1,12 +1,15 @@
 import functools
 
 from peewee import fn
-from playhouse.shortcuts import model_to_dict
-from .model import NdsTrialStats, NdsTrialConfig
+from ..columnar import load_columnar
+from ..constants import DATABASE_BACKEND
+from ..utils import query_trial_dicts
+from .model import NdsTrialStats, NdsTrialConfig, NdsIntermediateStats
 
 
 def query_nds_trial_stats(model_family, proposer, generator, model_spec, cell_spec, dataset,
-                          num_epochs=None, reduction=None, include_intermediates=False):
+                          num_epochs=None, reduction=None, include_intermediates=False,
+                          intermediates_as_arrays=False):
     """
     Query trial stats of NDS given conditions.
 
@@ -34,6 +37,9 @@ def query_nds_trial_stats(model_family, proposer, generator, model_spec, cell_sp
         If 'mean', fields in trial stats will be averaged given the same trial config.
     include_intermediates : boolean
         If true, intermediate results will be returned.
+    intermediates_as_arrays : boolean
+        If true, intermediate results are returned as a dict from field name to numpy array, ordered by epoch,
+        instead of a list of dicts.
 
     Returns
     -------
@@ -44,6 +50,12 @@ def query_nds_trial_stats(model_family, proposer, generator, model_spec, cell_sp
     fields = []
     if reduction == 'none':
         reduction = None
+    if DATABASE_BACKEND == 'columnar':
+        conditions = {'model_family': model_family, 'proposer': proposer, 'generator': generator,
+                      'model_spec': model_spec, 'cell_spec': cell_spec, 'dataset': dataset, 'num_epochs': num_epochs}
+        yield from load_columnar('nds').query(conditions, reduction, include_intermediates, intermediates_as_arrays,
+                                              mean_excluded=['id', 'config', 'seed'])
+        return
     if reduction == 'mean':
         for field_name in NdsTrialStats._meta.sorted_field_names:
             if field_name not in ['id', 'config', 'seed']:
@@ -62,13 +74,4 @@ def query_nds_trial_stats(model_family, proposer, generator, model_spec, cell_sp
         query = query.where(functools.reduce(lambda a, b: a & b, conditions))
     if reduction is not None:
         query = query.group_by(NdsTrialStats.config)
-    for trial in query:
-        if include_intermediates:
-            data = model_to_dict(trial)
-            # exclude 'trial' from intermediates as it is already available in data
-            data['intermediates'] = [
-                {k: v for k, v in model_to_dict(t).items() if k != 'trial'} for t in trial.intermediates
-            ]
-            yield data
-        else:
-            yield model_to_dict(trial)
+    yield from query_trial_dicts(query, NdsIntermediateStats, include_intermediates, intermediates_as_arrays)
@@ -1,10 +1,13 @@
 import functools
 
 from peewee import fn
-from playhouse.shortcuts import model_to_dict
-from .model import NlpTrialStats, NlpTrialConfig
+from ..columnar import load_columnar
+from ..constants import DATABASE_BACKEND
+from ..utils import query_trial_dicts
+from .model import NlpTrialStats, NlpTrialConfig, NlpIntermediateStats
 
-def query_nlp_trial_stats(arch, dataset, reduction=None, include_intermediates=False):
+def query_nlp_trial_stats(arch, dataset, reduction=None, include_intermediates=False,
+                          intermediates_as_arrays=False):
     """
     Query trial stats of NLP benchmark given conditions, including config(arch + dataset) and training results after 50 epoch.
 
@@ -23,6 +26,9 @@ def query_nlp_trial_stats(arch, dataset, reduction=None, include_intermediates=F
         Please note that some trial configs have multiple runs which make "reduction" meaningful, while some may not.
     include_intermediates : boolean
         If true, intermediate results will be returned.
+    intermediates_as_arrays : boolean
+        If true, intermediate results are returned as a dict from field name to numpy array, ordered by epoch,
+        instead of a list of dicts.
 
     Returns
     -------
@@ -33,6 +39,10 @@ def query_nlp_trial_stats(arch, dataset, reduction=None, include_intermediates=F
     fields = []
     if reduction == 'none':
         reduction = None
+    if DATABASE_BACKEND == 'columnar':
+        conditions = {'arch': arch, 'dataset': dataset}
+        yield from load_columnar('nlp').query(conditions, reduction, include_intermediates, intermediates_as_arrays)
+        return
     if reduction == 'mean':
         for field_name in NlpTrialStats._meta.sorted_field_names:
             if field_name not in ['id', 'config']:
@@ -48,14 +58,6 @@ def query_nlp_trial_stats(arch, dataset, reduction=None, include_intermediates=F
         conditions.append(NlpTrialConfig.arch == arch)
     if dataset is not None:
         conditions.append(NlpTrialConfig.dataset == dataset)
-
-    for trial in query.where(functools.reduce(lambda a, b: a & b, conditions)):
-        if include_intermediates:
-            data = model_to_dict(trial)
-            # exclude 'trial' from intermediates as it is already available in data
-            data['intermediates'] = [
-                {k: v for k, v in model_to_dict(t).items() if k != 'trial'} for t in trial.intermediates
-            ]
-            yield data
-        else:
-            yield model_to_dict(trial)
\ No newline at end of file
+    if conditions:
+        query = query.where(functools.reduce(lambda a, b: a & b, conditions))
+    yield from query_trial_dicts(query, NlpIntermediateStats, include_intermediates, intermediates_as_arrays)
@@ -0,0 +1,389 @@
+"""
+A local training service answering trials with NAS benchmark data, for offline evaluation of tuners and assessors.
+
+:class:`BenchmarkTrainingService` plays the part of NNI manager: it talks to a message dispatcher
+(e.g., :class:`nni.runtime.msg_dispatcher.MsgDispatcher` wrapping a tuner and an assessor) with the commands of
+:mod:`nni.runtime.protocol`, and runs every requested trial instantly on a simulated clock,
+reporting the intermediate and final results recorded in a benchmark.
+
+Example::
+
+    dispatcher = MsgDispatcher(tuner, assessor)
+    service = BenchmarkTrainingService(Nb201Evaluator(dataset='cifar100'), concurrency=8, max_trials=10000)
+    result = service.run(dispatcher, search_space)
+"""
+
+import heapq
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+
+import json_tricks
+
+from nni.runtime import protocol
+from nni.runtime.common import multi_thread_enabled
+from nni.runtime.protocol import CommandType
+from nni.utils import MetricType
+
+_logger = logging.getLogger(__name__)
+
+
+class SimulatedTrial:
+    """
+    Results of a trial looked up in a benchmark.
+
+    Attributes
+    ----------
+    intermediates : list of tuple
+        Pairs of intermediate metric and elapsed seconds when it is reported.
+    final : float
+        Final metric.
+    duration : float
+        Seconds from the start to the end of the trial.
+    """
+
+    def __init__(self, intermediates, final, duration):
+        self.intermediates = intermediates
+        self.final = final
+        self.duration = duration
+
+
+class BenchmarkEvaluator:
+    """
+    Base class of benchmark evaluators, which look up the results of trial parameters in a benchmark.
+
+    Parameters
+    ----------
+    intermediate_metric : str
+        Field of intermediate stats reported as intermediate results.
+    final_metric : str
+        Field of trial stats reported as final result.
+    epoch_duration : float
+        Simulated seconds of one epoch, used when the benchmark does not record training time.
+    """
+
+    def __init__(self, intermediate_metric, final_metric, epoch_duration=60.):
+        self.intermediate_metric = intermediate_metric
+        self.final_metric = final_metric
+        self.epoch_duration = epoch_duration
+        self._cache = {}
+
+    def query(self, parameters):
+        """
+        Query the benchmark with trial parameters.
+
+        Returns
+        -------
+        list of dict
+            Trial stats of all runs with these parameters, including intermediates as arrays.
+        """
+        raise NotImplementedError()
+
+    def evaluate(self, parameters, rng):
+        """
+        Results of trial parameters. If the benchmark has several runs of them, one run is picked with ``rng``.
+
+        Returns
+        -------
+        SimulatedTrial or None
+            ``None`` if the parameters are not found in the benchmark.
+        """
+        key = json.dumps(parameters, sort_keys=True)
+        if key not in self._cache:
+            self._cache[key] = [self._simulate(trial) for trial in self.query(parameters)]
+        runs = self._cache[key]
+        if not runs:
+            return None
+        return runs[rng.randrange(len(runs))]
+
+    def _simulate(self, trial):
+        intermediates = trial['intermediates']
+        epochs = intermediates['current_epoch'].tolist()
+        metrics = intermediates[self.intermediate_metric].tolist()
+        if 'training_time' in intermediates:
+            times = intermediates['training_time'].tolist()
+        elif trial.get('training_time') is not None and epochs:
+            times = [trial['training_time'] * epoch / epochs[-1] for epoch in epochs]
+        else:
+            times = [self.epoch_duration * epoch for epoch in epochs]
+        # nulls are not reported
+        curve = [(metric, t) for metric, t in zip(metrics, times) if metric == metric]
+        # the final result is reported after the last intermediate one
+        duration = max([trial.get('training_time') or 0.] + times)
+        return SimulatedTrial(curve, trial[self.final_metric], duration)
+
+
+class Nb101Evaluator(BenchmarkEvaluator):
+    """
+    Evaluate NAS-Bench-101 architectures. Parameters are in the format of ``arch`` in
+    :class:`nni.nas.benchmarks.nasbench101.Nb101TrialConfig`.
+    """
+
+    def __init__(self, num_epochs=108, intermediate_metric='valid_acc', final_metric='valid_acc'):
+        super().__init__(intermediate_metric, final_metric)
+        self.num_epochs = num_epochs
+
+    def query(self, parameters):
+        from .nasbench101 import query_nb101_trial_stats
+        return list(query_nb101_trial_stats(parameters, self.num_epochs, include_intermediates=True,
+                                            intermediates_as_arrays=True))
+
+
+class Nb201Evaluator(BenchmarkEvaluator):
+    """
+    Evaluate NAS-Bench-201 architectures. Parameters are in the format of ``arch`` in
+    :class:`nni.nas.benchmarks.nasbench201.Nb201TrialConfig`.
+    """
+
+    def __init__(self, num_epochs=200, dataset='cifar100', intermediate_metric='valid_acc', final_metric='valid_acc'):
+        super().__init__(intermediate_metric, final_metric)
+        self.num_epochs = num_epochs
+        self.dataset = dataset
+
+    def query(self, parameters):
+        from .nasbench201 import query_nb201_trial_stats
+        return list(query_nb201_trial_stats(parameters, self.num_epochs, self.dataset, include_intermediates=True,
+                                            intermediates_as_arrays=True))
+
+
+class NdsEvaluator(BenchmarkEvaluator):
+    """
+    Evaluate NDS configurations. Parameters are a dict with keys ``model_spec`` and ``cell_spec``,
+    in the format of :class:`nni.nas.benchmarks.nds.NdsTrialConfig`.
+    NDS does not record training time, so each epoch takes ``epoch_duration`` simulated seconds.
+    """
+
+    def __init__(self, model_family, proposer, generator, dataset, num_epochs=None,
+                 intermediate_metric='test_acc', final_metric='final_test_acc', epoch_duration=60.):
+        super().__init__(intermediate_metric, final_metric, epoch_duration)
+        self.model_family = model_family
+        self.proposer = proposer
+        self.generator = generator
+        self.dataset = dataset
+        self.num_epochs = num_epochs
+
+    def query(self, parameters):
+        from .nds import query_nds_trial_stats
+        return list(query_nds_trial_stats(self.model_family, self.proposer, self.generator, parameters['model_spec'],
+                                          parameters['cell_spec'], self.dataset, self.num_epochs,
+                                          include_intermediates=True, intermediates_as_arrays=True))
+
+
+class _Channel:
+    """
+    Stand-in of the pipe from dispatcher to NNI manager, collecting the commands sent with :func:`protocol.send`.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._condition = threading.Condition()
+
+    def write(self, data):
+        with self._condition:
+            self._buffer.extend(data)
+            self._condition.notify_all()
+
+    def flush(self):
+        pass
+
+    def receive_all(self, timeout=0.):
+        """
+        Parse all commands in the buffer. If there is none, wait at most ``timeout`` seconds for one.
+        """
+        with self._condition:
+            if not self._buffer and timeout > 0:
+                self._condition.wait(timeout)
+            commands = []
+            while len(self._buffer) >= 16:
+                length = int(self._buffer[2:16])
+                if len(self._buffer) < 16 + length:
+                    break
+                command = CommandType(bytes(self._buffer[:2]))
+                commands.append((command, self._buffer[16:16 + length].decode('utf8')))
+                del self._buffer[:16 + length]
+            return commands
+
+
+class BenchmarkTrainingService:
+    """
+    Run an experiment against a benchmark, with a simulated clock.
+
+    Trials are started whenever a slot of ``concurrency`` is free, and their intermediate results, final results
+    and ends happen at simulated times given by the benchmark. Trials killed by the assessor end immediately,
+    and parameters not found in the benchmark fail immediately.
+
+    Parameters
+    ----------
+    evaluator : BenchmarkEvaluator
+        Evaluator looking up results of trial parameters.
+    concurrency : int
+        Maximum number of trials running at the same time.
+    max_trials : int
+        Number of trials of the experiment.
+    seed : int
+        Seed of picking one run when the benchmark has multiple runs of the same parameters.
+    idle_timeout : float
+        Seconds to wait for the dispatcher when no trial is running, e.g., for a tuner generating parameters
+        in background. The experiment stops if nothing is received in time.
+    """
+
+    def __init__(self, evaluator, concurrency=1, max_trials=100, seed=None, idle_timeout=1.):
+        self.evaluator = evaluator
+        self.concurrency = concurrency
+        self.max_trials = max_trials
+        self.idle_timeout = idle_timeout
+        self.rng = random.Random(seed)
+        self._channel = _Channel()
+        self._id_prefix = uuid.uuid4().hex[:5]
+
+    def _send(self, dispatcher, command, data):
+        # data is passed as what MsgDispatcherBase.run gets after decoding, skipping a round trip of serialization
+        dispatcher.process_command(command, data)
+
+    def run(self, dispatcher, search_space):
+        """
+        Run the experiment.
+
+        Parameters
+        ----------
+        dispatcher : MsgDispatcherBase
+            The dispatcher to evaluate.
+        search_space : dict
+            Search space sent to the dispatcher on initialization.
+
+        Returns
+        -------
+        dict
+            ``trials``, a list of dicts with ``trial_job_id``, ``parameter_id``, ``parameters``, ``status``,
+            ``start_time``, ``end_time``, ``intermediates`` (reported before the end) and ``final``;
+            ``duration``, the simulated seconds of the experiment; and ``wall_time``, the real seconds of the run.
+        """
+        start = time.time()
+        out_file = getattr(protocol, '_out_file', None)
+        protocol._out_file = self._channel
+        try:
+            trials = self._run(dispatcher, search_space)
+        finally:
+            if out_file is None:
+                del protocol._out_file
+            else:
+                protocol._out_file = out_file
+            # let the worker threads of dispatcher exit, as it does at the end of its own run
+            dispatcher.stopping = True
+            if multi_thread_enabled():
+                dispatcher.pool.close()
+                dispatcher.pool.join()
+            else:
+                dispatcher.default_worker.join()
+                dispatcher.assessor_worker.join()
+        duration = max([trial['end_time'] for trial in trials], default=0.)
+        return {'trials': trials, 'duration': duration, 'wall_time': time.time() - start}
+
+    def _run(self, dispatcher, search_space):
+        self._clock = 0.
+        self._events = []  # heap of (time, sequence, trial job id, kind, value)
+        self._sequence = 0
+        self._waiting = []  # parameters received but not started
+        self._running = {}
+        self._trials = []
+
+        self._send(dispatcher, CommandType.Initialize, search_space)
+        self._send(dispatcher, CommandType.RequestTrialJobs, self.concurrency)
+        while True:
+            self._handle_commands(dispatcher, self._channel.receive_all())
+            self._start_trials()
+            if self._events:
+                self._handle_event(dispatcher)
+                continue
+            # nothing is running
+            if len(self._trials) >= self.max_trials:
+                break
+            # wait for parameters generated in background, or sent after other trials (e.g., by advisors)
+            commands = self._channel.receive_all(self.idle_timeout)
+            if not commands:
+                break
+            self._handle_commands(dispatcher, commands)
+
+        for trial in self._trials:
+            trial.pop('hyper_params')
+        return self._trials
+
+    def _push_event(self, elapsed, trial_job_id, kind, value=None):
+        heapq.heappush(self._events, (self._clock + elapsed, self._sequence, trial_job_id, kind, value))
+        self._sequence += 1
+
+    def _handle_commands(self, dispatcher, commands):
+        for command, data in commands:
+            if command is CommandType.NewTrialJob:
+                self._waiting.append(data)
+            elif command is CommandType.KillTrialJob:
+                trial_job_id = json_tricks.loads(data)
+                if trial_job_id in self._running:
+                    self._end_trial(dispatcher, trial_job_id, 'USER_CANCELED')
+            elif command not in (CommandType.Initialized, CommandType.NoMoreTrialJobs):
+                _logger.warning('Unsupported command from dispatcher: %s', command)
+
+    def _start_trials(self):
+        while self._waiting and len(self._running) < self.concurrency and len(self._trials) < self.max_trials:
+            hyper_params = self._waiting.pop(0)
+            params = json_tricks.loads(hyper_params)
+            trial_job_id = '%s_%d' % (self._id_prefix, len(self._trials))
+            trial = {
+                'trial_job_id': trial_job_id,
+                'parameter_id': params['parameter_id'],
+                'parameters': params['parameters'],
+                'hyper_params': hyper_params,
+                'status': 'RUNNING',
+                'start_time': self._clock,
+                'end_time': None,
+                'intermediates': [],
+                'final': None
+            }
+            self._trials.append(trial)
+            self._running[trial_job_id] = trial
+            result = self.evaluator.evaluate(trial['parameters'], self.rng)
+            if result is None:
+                self._push_event(0., trial_job_id, 'FAILED')
+                continue
+            for metric, elapsed in result.intermediates:
+                self._push_event(elapsed, trial_job_id, MetricType.PERIODICAL, metric)
+            self._push_event(result.duration, trial_job_id, MetricType.FINAL, result.final)
+
+    def _handle_event(self, dispatcher):
+        event_time, _, trial_job_id, kind, value = heapq.heappop(self._events)
+        if trial_job_id not in self._running:
+            # events of killed trials
+            return
+        self._clock = event_time
+        trial = self._running[trial_job_id]
+        if kind == 'FAILED':
+            self._end_trial(dispatcher, trial_job_id, 'FAILED')
+            return
+        if kind == MetricType.PERIODICAL:
+            trial['intermediates'].append(value)
+        else:
+            trial['final'] = value
+        self._send(dispatcher, CommandType.ReportMetricData, {
+            'parameter_id': trial['parameter_id'],
+            'trial_job_id': trial_job_id,
+            'type': kind,
+            'sequence': len(trial['intermediates']) - 1 if kind == MetricType.PERIODICAL else 0,
+            'value': json.dumps(value)
+        })
+        if kind == MetricType.FINAL:
+            self._end_trial(dispatcher, trial_job_id, 'SUCCEEDED')
+
+    def _end_trial(self, dispatcher, trial_job_id, status):
+        trial = self._running.pop(trial_job_id)
+        trial['status'] = status
+        trial['end_time'] = self._clock
+        self._send(dispatcher, CommandType.TrialEnd, {
+            'trial_job_id': trial_job_id,
+            'event': status,
+            'hyper_params': trial['hyper_params']
+        })
+        if len(self._trials) < self.max_trials:
+            self._send(dispatcher, CommandType.RequestTrialJobs, 1)
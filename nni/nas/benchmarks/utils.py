@@ -1,5 +1,100 @@
 import functools
 import json
 
+import numpy as np
+from playhouse.shortcuts import model_to_dict
+
 
 json_dumps = functools.partial(json.dumps, sort_keys=True)
+
+_ARRAY_DTYPES = {'FLOAT': np.float64, 'INT': np.int64, 'AUTO': np.int64}
+
+
+def _intermediate_fields(intermediate_model):
+    return [field for field in intermediate_model._meta.sorted_fields if field.name != 'trial']
+
+
+def _group_intermediates(intermediate_model, trial_ids, as_arrays):
+    fields = _intermediate_fields(intermediate_model)
+    query = intermediate_model.select(intermediate_model.trial, *fields) \
+        .where(intermediate_model.trial.in_(trial_ids)).order_by(intermediate_model.id).tuples()
+    grouped = {trial_id: [] for trial_id in trial_ids}
+    for row in query:
+        grouped[row[0]].append(row[1:])
+    if not as_arrays:
+        names = [field.name for field in fields]
+        return {trial_id: [dict(zip(names, row)) for row in rows] for trial_id, rows in grouped.items()}
+    return {trial_id: intermediates_to_arrays(fields, rows) for trial_id, rows in grouped.items()}
+
+
+def intermediates_to_arrays(fields, rows):
+    """
+    Convert intermediate stats of one trial into a dict from field name to numpy array,
+    ordered by ``current_epoch``. Nulls are converted to nan.
+
+    Parameters
+    ----------
+    fields : list of peewee.Field
+        Fields of the values in rows.
+    rows : list of tuple
+        Values of intermediate stats.
+    """
+    names = [field.name for field in fields]
+    if 'current_epoch' in names:
+        epoch_index = names.index('current_epoch')
+        rows = sorted(rows, key=lambda row: row[epoch_index])
+    columns = list(zip(*rows)) if rows else [[] for _ in names]
+    return {name: np.array(column, dtype=_ARRAY_DTYPES.get(field.field_type))
+            for name, field, column in zip(names, fields, columns)}
+
+
+def query_trial_dicts(query, intermediate_model, include_intermediates=False, intermediates_as_arrays=False,
+                      batch_size=500):
+    """
+    Convert trial stats selected by ``query`` into dicts.
+
+    Intermediates are fetched with one query for every ``batch_size`` trials and grouped by trial,
+    instead of one query for each trial.
+
+    Parameters
+    ----------
+    query : peewee.Query
+        Query of trial stats.
+    intermediate_model : peewee.Model
+        Model of intermediate stats, with a foreign key ``trial`` to trial stats.
+    include_intermediates : boolean
+        If true, intermediate results will be included in ``intermediates`` of each dict.
+    intermediates_as_arrays : boolean
+        If true, intermediate results are a dict from field name to numpy array, ordered by epoch.
+        Otherwise, they are a list of dicts.
+
+    Returns
+    -------
+    generator of dict
+    """
+    if not include_intermediates:
+        for trial in query:
+            yield model_to_dict(trial)
+        return
+    batch = []
+    for trial in query:
+        batch.append(trial)
+        if len(batch) >= batch_size:
+            yield from _attach_intermediates(batch, intermediate_model, intermediates_as_arrays)
+            batch = []
+    yield from _attach_intermediates(batch, intermediate_model, intermediates_as_arrays)
+
+
+def _attach_intermediates(trials, intermediate_model, as_arrays):
+    trial_ids = [trial.id for trial in trials if trial.id is not None]
+    grouped = _group_intermediates(intermediate_model, trial_ids, as_arrays) if trial_ids else {}
+    for trial in trials:
+        data = model_to_dict(trial)
+        if trial.id in grouped:
+            data['intermediates'] = grouped[trial.id]
+        elif as_arrays:
+            # trials without id are reduced ones, which have no intermediates
+            data['intermediates'] = intermediates_to_arrays(_intermediate_fields(intermediate_model), [])
+        else:
+            data['intermediates'] = []
+        yield data
@@ -1,8 +1,100 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import logging
 import os
 
+import json_tricks
+import numpy as np
+
+_logger = logging.getLogger(__name__)
+
+# bump this when the layout of checkpoint files changes in an incompatible way
+CHECKPOINT_FORMAT_VERSION = 1
+
+_ARRAY_KEY = '__nni_array__'
+_META_KEY = '__meta__'
+
+
+def _extract_arrays(obj, arrays):
+    """
+    Replace numeric numpy arrays in a nested state with placeholders, collecting them in ``arrays``.
+    """
+    if isinstance(obj, np.ndarray) and obj.dtype != object:
+        arrays.append(obj)
+        return {_ARRAY_KEY: len(arrays) - 1}
+    if isinstance(obj, dict):
+        return {key: _extract_arrays(value, arrays) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_extract_arrays(value, arrays) for value in obj]
+    return obj
+
+
+def _restore_arrays(obj, archive):
+    if isinstance(obj, dict):
+        if len(obj) == 1 and _ARRAY_KEY in obj:
+            return archive['a%d' % obj[_ARRAY_KEY]]
+        return {key: _restore_arrays(value, archive) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_restore_arrays(value, archive) for value in obj]
+    return obj
+
+
+def dump_state(state, path):
+    """
+    Write a checkpoint state to ``path`` in a compact binary format.
+
+    ``state`` is a nested structure of dicts (with string keys), lists and JSON-serializable scalars.
+    Numeric numpy arrays anywhere in the structure are stored as raw binary arrays rather than text,
+    so snapshots of large observation histories stay small and fast to load.
+    The file is written to a temporary location first and atomically moved into place,
+    so a crash during saving never leaves a truncated checkpoint behind.
+
+    Parameters
+    ----------
+    state : dict
+        The state to save.
+    path : str
+        Path of the checkpoint file.
+    """
+    arrays = []
+    meta = {
+        'version': CHECKPOINT_FORMAT_VERSION,
+        'state': _extract_arrays(state, arrays)
+    }
+    meta = json_tricks.dumps(meta, allow_nan=True).encode('utf8')
+    entries = {'a%d' % i: array for i, array in enumerate(arrays)}
+    entries[_META_KEY] = np.frombuffer(meta, dtype=np.uint8)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **entries)
+    os.replace(tmp_path, path)
+
+
+def load_state(path):
+    """
+    Read a checkpoint state written by :func:`dump_state`.
+
+    Parameters
+    ----------
+    path : str
+        Path of the checkpoint file.
+
+    Returns
+    -------
+    dict
+        The saved state, or ``None`` if the file does not exist or has an unsupported format version.
+    """
+    if not os.path.isfile(path):
+        return None
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json_tricks.loads(archive[_META_KEY].tobytes().decode('utf8'), preserve_order=False)
+        if meta.get('version') != CHECKPOINT_FORMAT_VERSION:
+            _logger.warning('Checkpoint %s has unsupported format version %s, ignored', path, meta.get('version'))
+            return None
+        return _restore_arrays(meta['state'], archive)
+
+
 class Recoverable:
 
     def load_checkpoint(self):
@@ -16,3 +108,32 @@ class Recoverable:
         if ckp_path is not None and os.path.isdir(ckp_path):
             return ckp_path
         return None
+
+    def _checkpoint_file(self, name=None):
+        ckp_path = self.get_checkpoint_path()
+        if ckp_path is None:
+            return None
+        return os.path.join(ckp_path, '%s.ckpt' % (name or type(self).__name__))
+
+    def _save_state(self, state, name=None):
+        """
+        Save ``state`` into the checkpoint directory. Returns whether the state is saved.
+        """
+        path = self._checkpoint_file(name)
+        if path is None:
+            return False
+        dump_state(state, path)
+        _logger.info('Checkpoint saved to %s', path)
+        return True
+
+    def _load_state(self, name=None):
+        """
+        Load a state saved by :meth:`_save_state`. Returns ``None`` if there is no usable checkpoint.
+        """
+        path = self._checkpoint_file(name)
+        if path is None:
+            return None
+        state = load_state(path)
+        if state is not None:
+            _logger.info('Checkpoint loaded from %s', path)
+        return state
@@ -74,12 +74,21 @@ class MsgDispatcher(MsgDispatcherBase):
             _logger.debug('Assessor is not configured')
 
     def load_checkpoint(self):
-        self.tuner.load_checkpoint()
+        if self.tuner.load_checkpoint():
+            state = self._load_state()
+            if state is not None:
+                global _next_parameter_id
+                _next_parameter_id = state['next_parameter_id']
+                self._set_data_record_state(state)
         if self.assessor is not None:
             self.assessor.load_checkpoint()
 
     def save_checkpoint(self):
         self.tuner.save_checkpoint()
+        # saved after tuner, so that an interrupted checkpoint can only cause duplicated data import, not data loss
+        state = self._get_data_record_state()
+        state['next_parameter_id'] = _next_parameter_id
+        self._save_state(state)
         if self.assessor is not None:
             self.assessor.save_checkpoint()
 
@@ -116,6 +125,7 @@ class MsgDispatcher(MsgDispatcherBase):
         for entry in data:
             entry['value'] = entry['value'] if type(entry['value']) is str else json_tricks.dumps(entry['value'])
             entry['value'] = json_tricks.loads(entry['value'])
+        data = self._skip_checkpointed_data(data)
         self.tuner.import_data(data)
 
     def handle_add_customized_trial(self, data):
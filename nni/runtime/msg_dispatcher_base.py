@@ -17,6 +17,8 @@ _logger = logging.getLogger(__name__)
 
 QUEUE_LEN_WARNING_MARK = 20
 _worker_fast_exit_on_terminate = True
+CHECKPOINT_INTERVAL = 50
+'''number of final results received between two periodical checkpoints'''
 
 
 class MsgDispatcherBase(Recoverable):
@@ -26,6 +28,15 @@ class MsgDispatcherBase(Recoverable):
 
     def __init__(self):
         self.stopping = False
+        # reentrant, so that checkpoint can be saved while the received data is being recorded
+        self.checkpoint_lock = threading.RLock()
+        self.final_results_since_checkpoint = 0
+        # trial jobs whose final results have been received, and number of imported records without trial job id,
+        # used to skip historical data already covered by checkpoint when experiment is resumed
+        self.received_trial_job_ids = set()
+        self.imported_data_num = 0
+        self.checkpoint_covered_ids = set()
+        self.checkpoint_covered_num = 0
         if multi_thread_enabled():
             self.pool = ThreadPool()
             self.thread_results = []
@@ -75,8 +86,30 @@ class MsgDispatcherBase(Recoverable):
             self.default_worker.join()
             self.assessor_worker.join()
 
+        self._save_checkpoint_safe()
         _logger.info('Dispatcher terminiated')
 
+    def _save_checkpoint_safe(self):
+        """Save checkpoint, never let a failed checkpoint break the experiment.
+        """
+        with self.checkpoint_lock:
+            self.final_results_since_checkpoint = 0
+            try:
+                self.save_checkpoint()
+            except Exception as e:
+                _logger.error('Failed to save checkpoint')
+                _logger.exception(e)
+
+    def _on_final_result(self, data):
+        """Record the trial job of a final result, and save checkpoint every ``CHECKPOINT_INTERVAL`` final results.
+        """
+        with self.checkpoint_lock:
+            if data.get('trial_job_id') is not None:
+                self.received_trial_job_ids.add(data['trial_job_id'])
+            self.final_results_since_checkpoint += 1
+            if self.final_results_since_checkpoint >= CHECKPOINT_INTERVAL:
+                self._save_checkpoint_safe()
+
     def command_queue_worker(self, command_queue):
         """Process commands in command queues.
         """
@@ -145,6 +178,47 @@ class MsgDispatcherBase(Recoverable):
         if command not in command_handlers:
             raise AssertionError('Unsupported command: {}'.format(command))
         command_handlers[command](data)
+        if command == CommandType.ReportMetricData and data['type'] == 'FINAL':
+            self._on_final_result(data)
+
+    def _get_data_record_state(self):
+        """State of received data, to be saved along with checkpoint of the algorithm.
+        """
+        return {
+            'received_trial_job_ids': sorted(self.received_trial_job_ids),
+            'imported_data_num': self.imported_data_num
+        }
+
+    def _set_data_record_state(self, state):
+        """Restore state returned by :meth:`_get_data_record_state`.
+        Data records covered by it will be skipped by :meth:`_skip_checkpointed_data`.
+        """
+        self.received_trial_job_ids = set(state['received_trial_job_ids'])
+        self.imported_data_num = state['imported_data_num']
+        self.checkpoint_covered_ids = set(self.received_trial_job_ids)
+        self.checkpoint_covered_num = self.imported_data_num
+
+    def _skip_checkpointed_data(self, data):
+        """Drop imported records already covered by checkpoint, and record the remaining ones.
+        """
+        result = []
+        with self.checkpoint_lock:
+            for entry in data:
+                trial_job_id = entry.get('trialJobId')
+                if trial_job_id is not None:
+                    if trial_job_id in self.checkpoint_covered_ids:
+                        continue
+                    self.received_trial_job_ids.add(trial_job_id)
+                else:
+                    if self.checkpoint_covered_num > 0:
+                        self.checkpoint_covered_num -= 1
+                        continue
+                    self.imported_data_num += 1
+                result.append(entry)
+        if len(result) < len(data):
+            _logger.info('%d of %d imported records are already covered by checkpoint',
+                         len(data) - len(result), len(data))
+        return result
 
     def handle_ping(self, data):
         pass
@@ -5,6 +5,7 @@ import argparse
 import os
 import pkg_resources
 from colorama import init
+from nni.experiment.export import EXPORT_FORMATS, DEFAULT_PAGE_SIZE
 from .common_utils import print_error
 from .launcher import create_experiment, resume_experiment, view_experiment
 from .updater import update_searchspace, update_concurrency, update_duration, update_trialnum, import_data
@@ -140,10 +141,12 @@ def parse_args():
     #export trial data
     parser_trial_export = parser_experiment_subparsers.add_parser('export', help='export trial job results to csv or json')
     parser_trial_export.add_argument('id', nargs='?', help='the id of experiment')
-    parser_trial_export.add_argument('--type', '-t', choices=['json', 'csv'], required=True, dest='type', help='target file type')
+    parser_trial_export.add_argument('--type', '-t', choices=EXPORT_FORMATS, required=True, dest='type', help='target file type')
     parser_trial_export.add_argument('--filename', '-f', required=True, dest='path', help='target file path')
     parser_trial_export.add_argument('--intermediate', '-i', action='store_true',
                                      default=False, help='are intermediate results included')
+    parser_trial_export.add_argument('--page_size', type=int, default=DEFAULT_PAGE_SIZE, dest='page_size',
+                                     help='number of trials whose intermediate results are fetched at a time')
     parser_trial_export.set_defaults(func=export_trials_data)
     #save an NNI experiment
     parser_save_experiment = parser_experiment_subparsers.add_parser('save', help='save an experiment')
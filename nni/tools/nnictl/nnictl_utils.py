@@ -1,7 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import csv
 import os
 import sys
 import json
@@ -14,10 +13,11 @@ import traceback
 from datetime import datetime, timezone
 from subprocess import Popen
 from pyhdfs import HdfsClient
+from nni.experiment.export import EXPORT_FORMATS, iter_trial_records, export_trial_records
 from nni.tools.annotation import expand_annotations
 import nni_node
 from .rest_utils import rest_get, rest_delete, check_rest_server_quick, check_response
-from .url_utils import trial_jobs_url, experiment_url, trial_job_id_url, export_data_url, metric_data_url
+from .url_utils import trial_jobs_url, experiment_url, trial_job_id_url, api_url
 from .config_utils import Config, Experiments
 from .constants import NNICTL_HOME_DIR, NNI_HOME_DIR, EXPERIMENT_INFORMATION_FORMAT, EXPERIMENT_DETAIL_FORMAT, \
      EXPERIMENT_MONITOR_INFO, TRIAL_MONITOR_HEAD, TRIAL_MONITOR_CONTENT, TRIAL_MONITOR_TAIL, REST_TIME_OUT
@@ -743,15 +743,8 @@ def monitor_experiment(args):
     set_monitor(False, args.time)
 
 def export_trials_data(args):
-    '''export experiment metadata and intermediate results to json or csv
+    '''export experiment metadata and intermediate results to json, jsonl, csv or parquet
     '''
-    def groupby_trial_id(intermediate_results):
-        sorted(intermediate_results, key=lambda x: x['timestamp'])
-        groupby = dict()
-        for content in intermediate_results:
-            groupby.setdefault(content['trialJobId'], []).append(json.loads(content['data']))
-        return groupby
-
     nni_config = Config(get_config_filename(args))
     rest_port = nni_config.get_config('restServerPort')
     rest_pid = nni_config.get_config('restServerPid')
@@ -763,44 +756,26 @@ def export_trials_data(args):
     if not running:
         print_error('Restful server is not running')
         return
-    response = rest_get(export_data_url(rest_port), 20)
-    if response is not None and check_response(response):
-        content = json.loads(response.text)
-        if args.intermediate:
-            intermediate_results_response = rest_get(metric_data_url(rest_port), REST_TIME_OUT)
-            if not intermediate_results_response or not check_response(intermediate_results_response):
-                print_error('Error getting intermediate results.')
-                return
-            intermediate_results = groupby_trial_id(json.loads(intermediate_results_response.text))
-            for record in content:
-                record['intermediate'] = intermediate_results[record['trialJobId']]
-        if args.type == 'json':
-            with open(args.path, 'w') as file:
-                file.write(json.dumps(content))
-        elif args.type == 'csv':
-            trial_records = []
-            for record in content:
-                formated_record = dict()
-                if args.intermediate:
-                    formated_record['intermediate'] = '[' + ','.join(record['intermediate']) + ']'
-                record_value = json.loads(record['value'])
-                if not isinstance(record_value, (float, int)):
-                    formated_record.update({**record['parameter'], **record_value, **{'trialJobId': record['trialJobId']}})
-                else:
-                    formated_record.update({**record['parameter'], **{'reward': record_value, 'trialJobId': record['trialJobId']}})
-                trial_records.append(formated_record)
-            if not trial_records:
-                print_error('No trial results collected! Please check your trial log...')
-                exit(0)
-            with open(args.path, 'w', newline='') as file:
-                writer = csv.DictWriter(file, set.union(*[set(r.keys()) for r in trial_records]))
-                writer.writeheader()
-                writer.writerows(trial_records)
-        else:
-            print_error('Unknown type: %s' % args.type)
-            return
-    else:
+    if args.type not in EXPORT_FORMATS:
+        print_error('Unknown type: %s' % args.type)
+        return
+
+    def get_json(api):
+        response = rest_get(api_url(rest_port, api), REST_TIME_OUT)
+        if response is None or not check_response(response):
+            return None
+        return json.loads(response.text)
+
+    try:
+        records = iter_trial_records(get_json, args.intermediate, args.page_size)
+        count = export_trial_records(records, args.path, args.type)
+    except RuntimeError as error:
+        print_error(error)
         print_error('Export failed...')
+        return
+    if not count and args.type == 'csv':
+        print_error('No trial results collected! Please check your trial log...')
+        exit(0)
 
 def search_space_auto_gen(args):
     '''dry run trial code to generate search space file'''
@@ -24,6 +24,10 @@ TENSORBOARD_API = '/tensorboard'
 
 METRIC_DATA_API = '/metric-data'
 
+def api_url(port, api):
+    '''get url of a rest api, e.g., /metric-data-range/0/99'''
+    return '{0}:{1}{2}{3}'.format(BASE_URL, port, API_ROOT_URL, api)
+
 def metric_data_url(port):
     '''get metric_data url'''
     return '{0}:{1}{2}{3}'.format(BASE_URL, port, API_ROOT_URL, METRIC_DATA_API)
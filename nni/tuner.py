@@ -197,6 +197,10 @@ class Tuner(Recoverable):
     def load_checkpoint(self):
         """
         Internal API under revising, not recommended for end users.
+
+        Tuners supporting checkpoint restore their state here and return ``True``.
+        The dispatcher will then skip historical results already covered by the checkpoint
+        instead of replaying them through :meth:`import_data`.
         """
         checkpoin_path = self.get_checkpoint_path()
         _logger.info('Load checkpoint ignored by tuner, checkpoint path: %s', checkpoin_path)
@@ -204,6 +208,9 @@ class Tuner(Recoverable):
     def save_checkpoint(self):
         """
         Internal API under revising, not recommended for end users.
+
+        Called periodically and when the experiment exits.
+        Built-in tuners save their state with :meth:`~nni.recoverable.Recoverable._save_state`.
         """
         checkpoin_path = self.get_checkpoint_path()
         _logger.info('Save checkpoint ignored by tuner, checkpoint path: %s', checkpoin_path)
@@ -211,6 +218,11 @@ class Tuner(Recoverable):
     def import_data(self, data):
         """
         Internal API under revising, not recommended for end users.
+
+        Historical data may contain a large number of trials (e.g., when warm-starting or resuming an experiment),
+        so tuners should ingest the whole batch at once, and refit their models at most once,
+        rather than calling :meth:`receive_trial_result` for each record.
+        :func:`nni.utils.split_import_data` converts the records into columns of parameters and scalar rewards.
         """
         # Import additional data for tuning
         # data: a list of dictionarys, each of which has at least two keys, 'parameter' and 'value'
@@ -3,6 +3,7 @@
 
 import copy
 import functools
+import logging
 from enum import Enum, unique
 import json_tricks
 from schema import And
@@ -12,6 +13,8 @@ from . import parameter_expressions
 
 to_json = functools.partial(json_tricks.dumps, allow_nan=True)
 
+_logger = logging.getLogger(__name__)
+
 @unique
 class OptimizeMode(Enum):
     """Optimize Mode class
@@ -49,14 +52,12 @@ def split_index(params):
     Delete index infromation from params
     """
     if isinstance(params, dict):
-        if NodeType.INDEX in params.keys():
+        if NodeType.INDEX in params:
             return split_index(params[NodeType.VALUE])
-        result = {}
-        for key in params:
-            result[key] = split_index(params[key])
-        return result
-    else:
-        return params
+        return {key: split_index(value) for key, value in params.items()}
+    if isinstance(params, list):
+        return [split_index(value) for value in params]
+    return params
 
 
 def extract_scalar_reward(value, scalar_key='default'):
@@ -106,6 +107,38 @@ def extract_scalar_history(trial_history, scalar_key='default'):
     return [extract_scalar_reward(ele, scalar_key) for ele in trial_history]
 
 
+def split_import_data(data, scalar_key='default'):
+    """
+    Split imported trial data into a column of parameters and a column of scalar rewards,
+    so that tuners can ingest the whole batch in one pass.
+    Records with empty value are skipped.
+
+    Parameters
+    ----------
+    data : list of dict
+        each of which has at least two keys, 'parameter' and 'value'
+    scalar_key : str
+        the key name that indicates the numeric number
+
+    Returns
+    -------
+    tuple
+        (list of parameters, list of scalar rewards)
+    """
+    parameters = []
+    rewards = []
+    for trial_info in data:
+        assert 'parameter' in trial_info
+        assert 'value' in trial_info
+        if not trial_info['value']:
+            continue
+        parameters.append(trial_info['parameter'])
+        rewards.append(extract_scalar_reward(trial_info['value'], scalar_key))
+    if len(parameters) < len(data):
+        _logger.info('Skipped %d useless trial data with empty value', len(data) - len(parameters))
+    return parameters, rewards
+
+
 def convert_dict2tuple(value):
     """
     convert dict type to tuple to solve unhashable problem.
@@ -206,6 +239,138 @@ def json2parameter(x, is_rand, random_state, oldy=None, Rand=False, name=NodeTyp
         y = copy.deepcopy(x)
     return y
 
+class CompiledSearchSpace:
+    """
+    A search space compiled once, e.g., in ``update_search_space``, so that sampling parameters is a linear walk
+    over precomputed names and sampling functions, instead of recursing over the json search space.
+
+    ``names`` is the same as ``json2space(search_space)``. :meth:`sample` and :meth:`space` are equivalent to
+    :func:`json2parameter` and :func:`json2space` with the previous parameters ``oldy``, and they draw the same
+    random numbers. Subtrees of ``oldy`` which are not resampled are shared by the returned parameters instead of
+    deep copied (copy-on-write), so the parameters should not be modified in place.
+    :func:`split_index` returns new containers, which can be.
+
+    Parameters
+    ----------
+    search_space : dict
+        The json search space.
+    require_name : bool
+        Whether the nested search spaces in choices and lists must have ``_name``, as in :func:`json2parameter`.
+        Without it, the names of nested nodes may be ambiguous, so it should be ``False`` only if :meth:`space`
+        and resampling with ``oldy`` are not used.
+    """
+
+    def __init__(self, search_space, require_name=True):
+        self.search_space = search_space
+        self._sample, self._space, self.names = _compile_search_space(search_space, NodeType.ROOT, require_name)
+
+    def sample(self, random_state, oldy=None, is_rand=None):
+        """
+        Sample parameters with ``_index`` of choices, like :func:`json2parameter`.
+
+        Parameters
+        ----------
+        random_state : numpy.random.RandomState
+        oldy : dict
+            The previous parameters, whose nodes not in ``is_rand`` are kept.
+        is_rand : dict
+            Names to whether they are resampled. Missing names are kept. ``None`` to resample all.
+        """
+        if is_rand is None:
+            return self._sample(random_state, None, True, None)
+        rand_names = {name for name, rand in is_rand.items() if rand}
+        return self._sample(random_state, oldy, False, rand_names)
+
+    def space(self, oldy=None):
+        """
+        The names of the nodes in the search space, or in the chosen branches of ``oldy``, like :func:`json2space`.
+        """
+        if oldy is None:
+            return list(self.names)
+        return self._space(oldy)
+
+
+def _compile_search_space(x, name, require_name):
+    """
+    Returns the sampling function, the space function and the names of a node.
+    The sampling function takes the random state, the previous parameters of the node, whether the node is
+    resampled as a whole, and the names to resample.
+    """
+    if isinstance(x, dict):
+        if NodeType.TYPE in x:
+            return _compile_parameter(x, name + '-' + x[NodeType.TYPE], require_name)
+        children = [(key, _compile_search_space(x[key], name + '[%s]' % str(key), require_name)) for key in x]
+        names = [child_name for _, (_, _, child_names) in children for child_name in child_names]
+        name_set = frozenset(names)
+
+        def sample_dict(random_state, oldy, rand, rand_names):
+            if oldy and not rand and name_set.isdisjoint(rand_names):
+                return oldy
+            return {key: sample(random_state, oldy[key] if oldy else None, rand, rand_names)
+                    for key, (sample, _, _) in children}
+
+        def space_dict(oldy):
+            return [child_name for key, (_, space, _) in children for child_name in space(oldy[key] if oldy else None)]
+
+        return sample_dict, space_dict, names
+
+    if isinstance(x, list):
+        for x_i in x:
+            if require_name and isinstance(x_i, dict) and NodeType.NAME not in x_i:
+                raise RuntimeError('\'_name\' key is not found in this nested search space.')
+        children = [_compile_search_space(x_i, name + '[%d]' % i, require_name) for i, x_i in enumerate(x)]
+        names = [child_name for _, _, child_names in children for child_name in child_names]
+        name_set = frozenset(names)
+
+        def sample_list(random_state, oldy, rand, rand_names):
+            if oldy and not rand and name_set.isdisjoint(rand_names):
+                return oldy
+            return [sample(random_state, oldy[i] if oldy else None, rand, rand_names)
+                    for i, (sample, _, _) in enumerate(children)]
+
+        def space_list(oldy):
+            return [child_name for i, (_, space, _) in enumerate(children) for child_name in space(oldy[i] if oldy else None)]
+
+        return sample_list, space_list, names
+
+    # constants are scalars, which are not copied
+    return lambda random_state, oldy, rand, rand_names: x, lambda oldy: [], []
+
+
+def _compile_parameter(x, name, require_name):
+    _value = x[NodeType.VALUE]
+    if x[NodeType.TYPE] == 'choice':
+        options = [_compile_search_space(option, name + '[%d]' % i, require_name) for i, option in enumerate(_value)]
+        for option in _value:
+            if require_name and isinstance(option, dict) and NodeType.NAME not in option:
+                raise RuntimeError('\'_name\' key is not found in this nested search space.')
+        names = [option_name for _, _, option_names in options for option_name in option_names] + [name]
+
+        def sample_choice(random_state, oldy, rand, rand_names):
+            if rand or name in rand_names:
+                _index = random_state.randint(len(options))
+                return {NodeType.INDEX: _index, NodeType.VALUE: options[_index][0](random_state, None, True, rand_names)}
+            return oldy
+
+        def space_choice(oldy):
+            if oldy is None:
+                return list(names)
+            _index = oldy[NodeType.INDEX]
+            return options[_index][1](oldy[NodeType.VALUE]) + [name]
+
+        return sample_choice, space_choice, names
+
+    function = getattr(parameter_expressions, x[NodeType.TYPE])
+    args = list(_value)
+
+    def sample_parameter(random_state, oldy, rand, rand_names):
+        if rand or name in rand_names:
+            return function(*args, random_state)
+        return oldy
+
+    return sample_parameter, lambda oldy: [name], [name]
+
+
 def merge_parameter(base_params, override_params):
     """
     Update the parameters in ``base_params`` with ``override_params``.
@@ -0,0 +1,492 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Benchmark of built-in tuners and assessors.
+
+Each tuner is driven through the ``Tuner`` API on a synthetic objective, over search spaces of increasing dimensions,
+in the same way as the message dispatcher does with one trial running at a time. The benchmark measures:
+
+- latency percentiles of proposing parameters and of receiving results, against the number of received results,
+- growth of memory traced by ``tracemalloc`` against the number of received results,
+- time of ``import_data``, and of the first proposal after it,
+- latency percentiles of assessors against the length of intermediate results.
+
+The result is written as JSON, so that it can be compared against the result of an earlier release::
+
+    python hpo_benchmark.py --output hpo-v2.0.json
+    python hpo_benchmark.py --tuners TPE GPTuner --dims 2 8 --trials 100
+    python hpo_benchmark.py --baseline hpo-v2.0.json --output hpo.json
+
+With ``--baseline``, latencies and memory that grow by more than ``--tolerance`` are reported,
+and the script exits with code 1.
+"""
+
+import argparse
+import datetime
+import gc
+import importlib
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+import nni
+from nni.tools.package_utils import parse_full_class_name
+from nni.tuner import Tuner
+
+logger = logging.getLogger('hpo_benchmark')
+
+# builtin name, class name, class args, kind of search space
+TUNERS = [
+    ('TPE', 'nni.algorithms.hpo.hyperopt_tuner.HyperoptTuner',
+     {'algorithm_name': 'tpe', 'optimize_mode': 'maximize'}, 'numeric'),
+    ('Random', 'nni.algorithms.hpo.hyperopt_tuner.HyperoptTuner', {'algorithm_name': 'random_search'}, 'numeric'),
+    ('Anneal', 'nni.algorithms.hpo.hyperopt_tuner.HyperoptTuner',
+     {'algorithm_name': 'anneal', 'optimize_mode': 'maximize'}, 'numeric'),
+    ('Evolution', 'nni.algorithms.hpo.evolution_tuner.EvolutionTuner',
+     {'optimize_mode': 'maximize', 'population_size': 32}, 'numeric'),
+    ('SMAC', 'nni.algorithms.hpo.smac_tuner.SMACTuner', {'optimize_mode': 'maximize'}, 'numeric'),
+    ('MetisTuner', 'nni.algorithms.hpo.metis_tuner.MetisTuner', {'optimize_mode': 'maximize'}, 'numeric'),
+    ('GPTuner', 'nni.algorithms.hpo.gp_tuner.GPTuner', {'optimize_mode': 'maximize'}, 'numeric'),
+    ('PBTTuner', 'nni.algorithms.hpo.pbt_tuner.PBTTuner', {'optimize_mode': 'maximize', 'population_size': 10}, 'numeric'),
+    ('GridSearch', 'nni.algorithms.hpo.gridsearch_tuner.GridSearchTuner', None, 'grid'),
+    ('BatchTuner', 'nni.algorithms.hpo.batch_tuner.BatchTuner', None, 'batch'),
+    ('RegularizedEvolutionTuner', 'nni.algorithms.hpo.regularized_evolution_tuner.RegularizedEvolutionTuner',
+     {'optimize_mode': 'maximize', 'population_size': 32, 'sample_size': 8}, 'nas'),
+    ('PPOTuner', 'nni.algorithms.hpo.ppo_tuner.PPOTuner', {'optimize_mode': 'maximize', 'trials_per_update': 20}, 'nas'),
+    ('NetworkMorphism', 'nni.algorithms.hpo.networkmorphism_tuner.NetworkMorphismTuner',
+     {'optimize_mode': 'maximize'}, 'none'),
+]
+
+# builtin name, class name, class args
+ASSESSORS = [
+    ('Medianstop', 'nni.algorithms.hpo.medianstop_assessor.MedianstopAssessor', {'optimize_mode': 'maximize'}),
+    ('Curvefitting', 'nni.algorithms.hpo.curvefitting_assessor.CurvefittingAssessor', {'start_step': 6}),
+]
+
+NUMERIC_TYPES = [
+    ('uniform', [0., 1.]),
+    ('quniform', [0., 10., 1.]),
+    ('randint', [0, 10]),
+    ('choice', [1, 2, 4, 8, 16]),
+]
+
+LAYER_CHOICES = ['conv_3x3', 'conv_5x5', 'max_pool', 'avg_pool', 'identity']
+
+# size of grids is limited, because grid search enumerates all the combinations on start
+GRID_MAX_DIM = 8
+
+
+def make_search_space(kind, dim):
+    """
+    Synthetic search space of ``dim`` parameters. ``kind`` is one of:
+
+    - ``numeric``: ``uniform``, ``quniform``, ``randint`` and numerical ``choice`` in turn,
+    - ``grid``: ``choice`` of 3 values,
+    - ``batch``: a single ``choice`` of 100 combinations of ``dim`` parameters, as expected by batch tuner,
+    - ``nas``: ``layer_choice``,
+    - ``none``: empty, for tuners that search their own space.
+    """
+    if kind == 'numeric':
+        return {'x%d' % i: {'_type': NUMERIC_TYPES[i % len(NUMERIC_TYPES)][0],
+                            '_value': NUMERIC_TYPES[i % len(NUMERIC_TYPES)][1]} for i in range(dim)}
+    if kind == 'grid':
+        return {'x%d' % i: {'_type': 'choice', '_value': [0., .5, 1.]} for i in range(min(dim, GRID_MAX_DIM))}
+    if kind == 'batch':
+        rng = np.random.RandomState(dim)
+        combinations = [{'x%d' % i: float(v) for i, v in enumerate(rng.rand(dim))} for _ in range(100)]
+        return {'combine_params': {'_type': 'choice', '_value': combinations}}
+    if kind == 'nas':
+        return {'layer%d' % i: {'_type': 'layer_choice', '_value': LAYER_CHOICES} for i in range(dim)}
+    if kind == 'none':
+        return {}
+    raise ValueError('Unknown kind of search space: %s' % kind)
+
+
+def _normalize(spec, value):
+    """ Position of ``value`` in the range of ``spec``, in [0, 1]. """
+    _type, _value = spec['_type'], spec['_value']
+    if _type == 'choice':
+        if isinstance(value, dict):
+            return float(np.mean(list(value.values())))
+        return _value.index(value) / max(len(_value) - 1, 1)
+    if _type == 'layer_choice':
+        return _value.index(value['_value']) / max(len(_value) - 1, 1)
+    return (value - _value[0]) / (_value[1] - _value[0])
+
+
+def objective(search_space, parameters, rng):
+    """
+    Negative squared distance to an optimum inside the search space, plus a little noise. To be maximized.
+    Without a search space, the value is random.
+    """
+    if not search_space:
+        return float(rng.rand())
+    if 'combine_params' in search_space and 'combine_params' not in parameters:
+        # batch tuner proposes the combinations themselves
+        parameters = {'combine_params': parameters}
+    distance = 0.
+    for i, (key, spec) in enumerate(sorted(search_space.items())):
+        distance += (_normalize(spec, parameters[key]) - (0.2 + 0.6 * (i % 5) / 4)) ** 2
+    return -distance / len(search_space) + 0.01 * float(rng.randn())
+
+
+def sample_parameters(search_space, rng):
+    """ Random parameters in a search space made by :func:`make_search_space`. """
+    parameters = {}
+    for key, spec in search_space.items():
+        _type, _value = spec['_type'], spec['_value']
+        if _type == 'uniform':
+            parameters[key] = float(rng.uniform(_value[0], _value[1]))
+        elif _type == 'quniform':
+            parameters[key] = float(np.round(rng.uniform(_value[0], _value[1]) / _value[2]) * _value[2])
+        elif _type == 'randint':
+            parameters[key] = int(rng.randint(_value[0], _value[1]))
+        elif _type == 'choice':
+            parameters[key] = _value[rng.randint(len(_value))]
+        elif _type == 'layer_choice':
+            index = int(rng.randint(len(_value)))
+            parameters[key] = {'_value': _value[index], '_idx': index}
+    return parameters
+
+
+def percentiles(values):
+    """ Summary of a list of latencies in seconds. """
+    values = np.asarray(values, dtype=float)
+    return {
+        'count': len(values),
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p90': float(np.percentile(values, 90)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+def create_instance(class_name, class_args):
+    """
+    Instance of a built-in algorithm. Algorithms are imported on use,
+    so that missing optional dependencies only fail the benchmark of their own.
+    """
+    module_name, class_name = parse_full_class_name(class_name)
+    return getattr(importlib.import_module(module_name), class_name)(**(class_args or {}))
+
+
+def create_tuner(class_name, class_args, checkpoint_dir):
+    class_args = dict(class_args or {})
+    if class_name.endswith('.PBTTuner'):
+        class_args['all_checkpoint_dir'] = checkpoint_dir
+    elif class_name.endswith('.NetworkMorphismTuner'):
+        # the generated models are saved to path, ``model_path`` in the working directory by default
+        class_args['path'] = os.path.join(checkpoint_dir, 'model_path')
+    return create_instance(class_name, class_args)
+
+
+def drive_tuner(tuner, search_space, num_trials, seed, on_received=None, time_limit=None):
+    """
+    Run ``num_trials`` trials one after another, i.e., propose parameters, then receive the result and end the trial.
+    Parameters that the tuner sends later by ``st_callback`` are taken as proposals of the following trials.
+
+    Returns
+    -------
+    tuple
+        Latencies of proposals and of receiving results, as lists of ``(history size, seconds)``,
+        and whether the tuner has no more parameters to propose.
+    """
+    rng = np.random.RandomState(seed)
+    deferred = deque()
+
+    def st_callback(parameter_id, parameters):
+        deferred.append((parameter_id, parameters))
+
+    proposal_latency, receive_latency = [], []
+    start_time = time.perf_counter()
+    next_id = 0
+    exhausted = False
+    for history_size in range(num_trials):
+        if time_limit is not None and time.perf_counter() - start_time > time_limit:
+            break
+        if deferred:
+            parameter_id, parameters = deferred.popleft()
+        else:
+            parameter_id = next_id
+            next_id += 1
+            start = time.perf_counter()
+            generated = tuner.generate_multiple_parameters([parameter_id], st_callback=st_callback)
+            elapsed = time.perf_counter() - start
+            if generated:
+                parameters = generated[0]
+            elif deferred:
+                parameter_id, parameters = deferred.popleft()
+            else:
+                exhausted = True
+                break
+            proposal_latency.append((history_size, elapsed))
+        next_id = max(next_id, parameter_id + 1)
+
+        value = objective(search_space, parameters, rng)
+        start = time.perf_counter()
+        tuner.receive_trial_result(parameter_id, parameters, value)
+        tuner.trial_end(parameter_id, True)
+        receive_latency.append((history_size, time.perf_counter() - start))
+        if on_received is not None:
+            on_received(history_size + 1)
+    return proposal_latency, receive_latency, exhausted
+
+
+def _by_window(latencies, window):
+    windows = {}
+    for history_size, seconds in latencies:
+        windows.setdefault(history_size // window * window, []).append(seconds)
+    return [dict(history_size=start, **percentiles(values)) for start, values in sorted(windows.items())]
+
+
+def benchmark_tuner(name, class_name, class_args, kind, dim, args):
+    """ Result of one tuner on one search space, as a dict. """
+    search_space = make_search_space(kind, dim)
+    result = {'name': name, 'class_args': class_args, 'search_space': kind, 'dim': dim,
+              'num_parameters': len(search_space)}
+    checkpoint_dir = tempfile.mkdtemp()
+    try:
+        tuner = create_tuner(class_name, class_args, checkpoint_dir)
+        tuner.update_search_space(search_space)
+        proposal, receive, exhausted = drive_tuner(tuner, search_space, args.trials, args.seed,
+                                                   time_limit=args.time_limit)
+        result['trials'] = len(receive)
+        result['exhausted'] = exhausted
+        result['proposal_latency'] = _by_window(proposal, args.window)
+        result['receive_latency'] = _by_window(receive, args.window)
+        del tuner
+
+        if args.memory:
+            result['memory'] = _trace_memory(class_name, class_args, search_space, len(receive), args, checkpoint_dir)
+        if args.import_sizes:
+            result['import_data'] = _import_data(class_name, class_args, search_space, args, checkpoint_dir)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning('%s failed on %s search space of %d dimensions: %r', name, kind, dim, e)
+        result['error'] = repr(e)
+    finally:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    return result
+
+
+def _trace_memory(class_name, class_args, search_space, num_trials, args, checkpoint_dir):
+    """ Run the same trials again with ``tracemalloc``, which is too slow to measure latency at the same time. """
+    records = []
+
+    def on_received(history_size):
+        if history_size % args.window == 0 or history_size == num_trials:
+            gc.collect()
+            current, peak = tracemalloc.get_traced_memory()
+            records.append({'history_size': history_size, 'current': current - baseline, 'peak': peak - baseline})
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tuner = create_tuner(class_name, class_args, checkpoint_dir)
+        tuner.update_search_space(search_space)
+        on_received(0)
+        drive_tuner(tuner, search_space, num_trials, args.seed, on_received=on_received, time_limit=args.time_limit)
+    finally:
+        tracemalloc.stop()
+    return records
+
+
+def _import_data(class_name, class_args, search_space, args, checkpoint_dir):
+    records = []
+    for size in args.import_sizes:
+        tuner = create_tuner(class_name, class_args, checkpoint_dir)
+        if type(tuner).import_data is Tuner.import_data:
+            return None
+        tuner.update_search_space(search_space)
+        rng = np.random.RandomState(args.seed)
+        data = []
+        for _ in range(size):
+            parameters = sample_parameters(search_space, rng)
+            data.append({'parameter': parameters, 'value': objective(search_space, parameters, rng)})
+        start = time.perf_counter()
+        tuner.import_data(data)
+        import_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        tuner.generate_multiple_parameters([0], st_callback=lambda *_: None)
+        records.append({'records': size, 'seconds': import_seconds,
+                        'first_proposal_seconds': time.perf_counter() - start})
+    return records
+
+
+def synthetic_curve(length, rng):
+    """ Intermediate accuracy that saturates at a random level, with noise. """
+    level, rate = rng.uniform(.5, .95), rng.uniform(.05, .3)
+    steps = np.arange(1, length + 1)
+    return (level * (1 - np.exp(-rate * steps)) + .01 * rng.randn(length)).tolist()
+
+
+def benchmark_assessor(name, class_name, class_args, args):
+    """
+    Latency of assessing trials against the length of their intermediate results.
+    Each trial is assessed at each of the curve lengths, then ends successfully.
+    """
+    result = {'name': name, 'class_args': class_args}
+    max_length = max(args.curve_lengths)
+    try:
+        kwargs = dict(class_args or {})
+        if name == 'Curvefitting':
+            kwargs['epoch_num'] = max_length
+        assessor = create_instance(class_name, kwargs)
+        rng = np.random.RandomState(args.seed)
+        latencies = {length: [] for length in args.curve_lengths}
+        start_time = time.perf_counter()
+        num_trials = 0
+        while num_trials < args.assessor_trials:
+            if args.time_limit is not None and time.perf_counter() - start_time > args.time_limit:
+                break
+            trial_job_id = 'trial_%d' % num_trials
+            curve = synthetic_curve(max_length, rng)
+            for length in sorted(args.curve_lengths):
+                start = time.perf_counter()
+                assessor.assess_trial(trial_job_id, curve[:length])
+                latencies[length].append(time.perf_counter() - start)
+            assessor.trial_end(trial_job_id, True)
+            num_trials += 1
+        result['trials'] = num_trials
+        result['assess_latency'] = [dict(curve_length=length, **percentiles(values))
+                                    for length, values in sorted(latencies.items()) if values]
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning('%s failed: %r', name, e)
+        result['error'] = repr(e)
+    return result
+
+
+def compare(baseline, result, tolerance):
+    """
+    Metrics of ``result`` that are worse than those of ``baseline`` by more than ``tolerance``, i.e., a ratio.
+
+    Returns
+    -------
+    list of str
+        Description of regressions.
+    """
+    regressions = []
+
+    def check(what, old, new):
+        if old is not None and new is not None and new > old * (1 + tolerance):
+            regressions.append('%s: %.6g -> %.6g (%+.0f%%)' % (what, old, new, (new / old - 1) * 100 if old else math.inf))
+
+    old_tuners = {(t['name'], t['search_space'], t['dim']): t for t in baseline.get('tuners', [])}
+    for new in result.get('tuners', []):
+        old = old_tuners.get((new['name'], new['search_space'], new['dim']))
+        if old is None or 'error' in old or 'error' in new:
+            continue
+        prefix = '%s (%s, dim=%d)' % (new['name'], new['search_space'], new['dim'])
+        for metric in ['proposal_latency', 'receive_latency']:
+            old_windows = {w['history_size']: w for w in old[metric]}
+            for window in new[metric]:
+                if window['history_size'] in old_windows:
+                    check('%s %s p50 at history %d' % (prefix, metric, window['history_size']),
+                          old_windows[window['history_size']]['p50'], window['p50'])
+        if old.get('memory') and new.get('memory') and old['memory'][-1]['history_size'] == new['memory'][-1]['history_size']:
+            check('%s memory at history %d' % (prefix, new['memory'][-1]['history_size']),
+                  old['memory'][-1]['current'], new['memory'][-1]['current'])
+        old_imports = {r['records']: r for r in old.get('import_data') or []}
+        for record in new.get('import_data') or []:
+            if record['records'] in old_imports:
+                check('%s import_data of %d records' % (prefix, record['records']),
+                      old_imports[record['records']]['seconds'], record['seconds'])
+
+    old_assessors = {a['name']: a for a in baseline.get('assessors', [])}
+    for new in result.get('assessors', []):
+        old = old_assessors.get(new['name'])
+        if old is None or 'error' in old or 'error' in new:
+            continue
+        old_lengths = {r['curve_length']: r for r in old['assess_latency']}
+        for record in new['assess_latency']:
+            if record['curve_length'] in old_lengths:
+                check('%s assess_trial p50 at curve length %d' % (new['name'], record['curve_length']),
+                      old_lengths[record['curve_length']]['p50'], record['p50'])
+    return regressions
+
+
+def run(args):
+    result = {
+        'meta': {
+            'nni_version': nni.__version__,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'time': datetime.datetime.now().isoformat(),
+            'args': {k: v for k, v in vars(args).items() if k not in ['output', 'baseline']},
+        },
+        'tuners': [],
+        'assessors': [],
+    }
+    for name, class_name, class_args, kind in TUNERS:
+        if args.tuners is not None and name not in args.tuners:
+            continue
+        dims = [0] if kind == 'none' else args.dims
+        if kind == 'grid':
+            dims = sorted(set(min(dim, GRID_MAX_DIM) for dim in dims))
+        for dim in dims:
+            logger.info('Benchmarking %s on %s search space of %d dimensions', name, kind, dim)
+            result['tuners'].append(benchmark_tuner(name, class_name, class_args, kind, dim, args))
+    for name, class_name, class_args in ASSESSORS:
+        if args.assessors is not None and name not in args.assessors:
+            continue
+        logger.info('Benchmarking %s', name)
+        result['assessors'].append(benchmark_assessor(name, class_name, class_args, args))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of built-in tuners and assessors.')
+    parser.add_argument('--tuners', nargs='*', help='Builtin names of tuners to run, all by default.')
+    parser.add_argument('--assessors', nargs='*', help='Builtin names of assessors to run, all by default.')
+    parser.add_argument('--dims', nargs='+', type=int, default=[2, 8, 32], help='Dimensions of search spaces.')
+    parser.add_argument('--trials', type=int, default=200, help='Number of trials for each tuner and search space.')
+    parser.add_argument('--window', type=int, default=50, help='Number of trials summarized together.')
+    parser.add_argument('--time-limit', type=float, default=300., help='Seconds before a run is cut short.')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip tracing memory.')
+    parser.add_argument('--import-sizes', nargs='*', type=int, default=[100, 1000],
+                        help='Numbers of records to import.')
+    parser.add_argument('--curve-lengths', nargs='+', type=int, default=[5, 10, 20, 50, 100],
+                        help='Lengths of intermediate results to assess.')
+    parser.add_argument('--assessor-trials', type=int, default=50, help='Number of trials for each assessor.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Path of the JSON result, stdout by default.')
+    parser.add_argument('--baseline', help='Path of an earlier result to compare with.')
+    parser.add_argument('--tolerance', type=float, default=.2, help='Relative growth reported as a regression.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='[%(asctime)s] %(levelname)s (%(name)s) %(message)s')
+    logger.setLevel(logging.INFO)
+    logging.getLogger('nni').setLevel(logging.WARNING)
+
+    result = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        for regression in regressions:
+            logger.warning('Regression: %s', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Benchmark of the training steps of a model wrapped by a pruner with frozen masks.
+
+ResNet-50 is pruned by ``LevelPruner`` and fine-tuned on random data, and the median time of training steps
+and of forward passes in evaluation is measured for:
+
+- ``unpruned``: the model without pruner,
+- ``default``: the masks are multiplied to the weights in every forward pass,
+- ``lazy``: the masks are applied only when they are changed, see ``Pruner.enable_lazy_mask``.
+
+::
+
+    python pruner_mask_benchmark.py
+    python pruner_mask_benchmark.py --steps 20 --batch-size 8 --image-size 224 --threads 4
+"""
+
+import argparse
+import json
+import time
+
+import torch
+import torch.nn.functional as F
+from torchvision.models import resnet50
+
+from nni.algorithms.compression.pytorch.pruning import LevelPruner
+
+MODES = ['unpruned', 'default', 'lazy']
+
+
+def benchmark(mode, args):
+    torch.manual_seed(0)
+    model = resnet50()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.001, momentum=0.9)
+    if mode != 'unpruned':
+        pruner = LevelPruner(model, [{'sparsity': 0.5, 'op_types': ['default']}], optimizer)
+        pruner.enable_lazy_mask(mode == 'lazy')
+        model = pruner.compress()
+    model.train()
+    data = torch.randn(args.batch_size, 3, args.image_size, args.image_size)
+    target = torch.randint(0, 1000, (args.batch_size,))
+
+    def train_step():
+        optimizer.zero_grad()
+        F.cross_entropy(model(data), target).backward()
+        optimizer.step()
+
+    def eval_step():
+        with torch.no_grad():
+            model(data)
+
+    result = {'train': _median_latency(train_step, args)}
+    model.eval()
+    result['eval'] = _median_latency(eval_step, args)
+    return result
+
+
+def _median_latency(step, args):
+    latencies = []
+    for i in range(args.warmup + args.steps):
+        start = time.perf_counter()
+        step()
+        if i >= args.warmup:
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of training steps with pruner masks')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--image-size', type=int, default=128)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = benchmark(mode, args)
+        print('%-10s train %.4fs  eval %.4fs' % (mode, results[mode]['train'], results[mode]['eval']))
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
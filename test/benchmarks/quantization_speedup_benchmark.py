@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Benchmark of ``QuantizedModelSpeedup`` on models calibrated by ``QAT_Quantizer``.
+
+The weights and outputs of ``Conv2d`` and ``Linear`` are quantized to 8 bits, with the batch normalizations folded.
+After the ranges are collected on random data, the exported model and the model converted to quantized modules
+of pytorch are compared on:
+
+- the max absolute difference of their outputs, relative to the max absolute output of the float model,
+  and of the model simulated by the quantizer, which the quantized modules are expected to reproduce,
+- the median latency on CPU for each batch size,
+- the size of the serialized state_dict.
+
+::
+
+    python quantization_speedup_benchmark.py
+    python quantization_speedup_benchmark.py --models resnet18 --batch-sizes 1 8 --backend qnnpack --threads 4
+"""
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+
+import torch
+from torchvision.models import resnet18, mobilenet_v2
+
+from nni.algorithms.compression.pytorch.quantization import QAT_Quantizer
+from nni.compression.pytorch import QuantizedModelSpeedup
+
+MODELS = {
+    'resnet18': lambda: resnet18(num_classes=10),
+    'mobilenet_v2': lambda: mobilenet_v2(num_classes=10)
+}
+
+
+def state_bytes(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def median_latency(model, data, args):
+    latencies = []
+    with torch.no_grad():
+        for i in range(args.warmup + args.steps):
+            start = time.perf_counter()
+            model(data)
+            if i >= args.warmup:
+                latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2]
+
+
+def benchmark(name, args, tmp_dir):
+    torch.manual_seed(0)
+    input_shape = (3, args.image_size, args.image_size)
+    model = MODELS[name]()
+    config_list = [{'quant_types': ['weight', 'output'], 'quant_bits': 8, 'op_types': ['Conv2d', 'Linear']}]
+    quantizer = QAT_Quantizer(model, config_list, dummy_input=torch.randn(1, *input_shape))
+    quantizer.compress()
+    # collect the ranges of outputs and the statistics of batch normalizations
+    model.train()
+    with torch.no_grad():
+        for _ in range(args.calibration_steps):
+            model(torch.randn(args.calibration_batch_size, *input_shape))
+            # no optimizer is patched by the quantizer, whose steps are counted for the moving averages
+            quantizer.step_with_optimizer()
+    data = torch.randn(max(args.batch_sizes), *input_shape)
+    model.eval()
+    with torch.no_grad():
+        simulated_out = model(data)
+    model_path, calibration_path = os.path.join(tmp_dir, 'model.pth'), os.path.join(tmp_dir, 'calibration.pth')
+    quantizer.export_model(model_path, calibration_path)
+
+    float_model = MODELS[name]()
+    float_model.load_state_dict(torch.load(model_path))
+    float_model.eval()
+    quantized_model = MODELS[name]()
+    quantized_model.load_state_dict(torch.load(model_path))
+    ms = QuantizedModelSpeedup(quantized_model, calibration_path, backend=args.backend)
+    ms.speedup_model()
+
+    with torch.no_grad():
+        float_out, quantized_out = float_model(data), quantized_model(data)
+    result = {
+        'quantized': sum(m_type != 'Float' for m_type in ms.replaced_modules.values()),
+        'folded_bn': len(ms.folded_bn_modules),
+        'float_error': (float_out - quantized_out).abs().max().item() / float_out.abs().max().item(),
+        'simulated_error': (simulated_out - quantized_out).abs().max().item() / simulated_out.abs().max().item(),
+        'float_bytes': state_bytes(float_model),
+        'quantized_bytes': state_bytes(quantized_model),
+        'latency': {}
+    }
+    for batch_size in args.batch_sizes:
+        result['latency'][batch_size] = {
+            'float': median_latency(float_model, data[:batch_size], args),
+            'quantized': median_latency(quantized_model, data[:batch_size], args)
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of quantized modules for models calibrated by QAT')
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--image-size', type=int, default=224)
+    parser.add_argument('--calibration-steps', type=int, default=10)
+    parser.add_argument('--calibration-batch-size', type=int, default=8)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--backend', type=str, default=None, help='quantized engine, e.g., fbgemm or qnnpack')
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.models:
+            result = {'model': name, **benchmark(name, args, tmp_dir)}
+            print('%-12s %d modules quantized, %d bn folded, relative error %.4f (float) %.4f (simulated), '
+                  'state %.1f -> %.1f MB' % (
+                      name, result['quantized'], result['folded_bn'], result['float_error'], result['simulated_error'],
+                      result['float_bytes'] / 2 ** 20, result['quantized_bytes'] / 2 ** 20))
+            for batch_size, latency in result['latency'].items():
+                print('    batch %3d: latency %.4fs -> %.4fs' % (batch_size, latency['float'], latency['quantized']))
+            results.append(result)
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Benchmark of ``SparseModelSpeedup`` on models pruned by ``LevelPruner``.
+
+For each model and sparsity, the dense model with masks applied and the model with sparse modules
+are compared on:
+
+- the max absolute difference of their outputs,
+- the inference throughput,
+- the memory of parameters and buffers.
+
+::
+
+    python sparse_speedup_benchmark.py
+    python sparse_speedup_benchmark.py --models mlp --sparsities 0.9 0.95 --block-size 16 16 --threads 4
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import tempfile
+import time
+
+import torch
+import torch.nn.functional as F
+from torchvision.models import vgg11
+
+from nni.algorithms.compression.pytorch.pruning import LevelPruner
+from nni.compression.pytorch import SparseModelSpeedup
+
+
+class MLP(torch.nn.Module):
+    def __init__(self, width=2048, depth=4):
+        super().__init__()
+        self.layers = torch.nn.ModuleList([torch.nn.Linear(width, width) for _ in range(depth)])
+
+    def forward(self, x):
+        for layer in self.layers:
+            x = F.relu(layer(x))
+        return x
+
+
+MODELS = {
+    'mlp': (MLP, (2048,)),
+    'vgg11': (lambda: vgg11(num_classes=10), (3, 64, 64))
+}
+
+
+def model_bytes(model):
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        if tensor.layout == torch.strided:
+            total += tensor.numel() * tensor.element_size()
+        elif tensor.layout == torch.sparse_coo:
+            total += tensor._values().numel() * tensor.element_size() + tensor._indices().numel() * 8
+        else:
+            total += tensor.values().numel() * tensor.element_size() + \
+                (tensor.crow_indices().numel() + tensor.col_indices().numel()) * tensor.crow_indices().element_size()
+    return total
+
+
+def throughput(model, data, steps):
+    with torch.no_grad():
+        model(data)
+        start = time.perf_counter()
+        for _ in range(steps):
+            model(data)
+    return steps * data.size(0) / (time.perf_counter() - start)
+
+
+def benchmark(name, sparsity, args, tmp_dir):
+    torch.manual_seed(0)
+    model_class, input_shape = MODELS[name]
+    model = model_class()
+    pruner = LevelPruner(model, [{'sparsity': sparsity, 'op_types': ['Conv2d', 'Linear']}])
+    pruner.compress()
+    model_path, mask_path = os.path.join(tmp_dir, 'model.pth'), os.path.join(tmp_dir, 'mask.pth')
+    pruner.export_model(model_path=model_path, mask_path=mask_path)
+    pruner._unwrap_model()
+    model.eval()
+
+    sparse_model = copy.deepcopy(model)
+    ms = SparseModelSpeedup(sparse_model, mask_path, density_threshold=args.density_threshold, block_size=args.block_size)
+    ms.speedup_model()
+
+    data = torch.randn(args.batch_size, *input_shape)
+    with torch.no_grad():
+        error = (model(data) - sparse_model(data)).abs().max().item()
+    return {
+        'replaced': len(ms.replaced_modules),
+        'max_abs_error': error,
+        'dense_throughput': throughput(model, data, args.steps),
+        'sparse_throughput': throughput(sparse_model, data, args.steps),
+        'dense_bytes': model_bytes(model),
+        'sparse_bytes': model_bytes(sparse_model)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of sparse modules for fine-grained pruned models')
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--sparsities', nargs='+', type=float, default=[0.5, 0.8, 0.9, 0.95])
+    parser.add_argument('--density-threshold', type=float, default=1.0)
+    parser.add_argument('--block-size', nargs=2, type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.models:
+            for sparsity in args.sparsities:
+                result = {'model': name, 'sparsity': sparsity, **benchmark(name, sparsity, args, tmp_dir)}
+                print('%-6s sparsity %.2f: error %.2e, throughput %.1f -> %.1f samples/s, memory %.1f -> %.1f MB' % (
+                    name, sparsity, result['max_abs_error'], result['dense_throughput'], result['sparse_throughput'],
+                    result['dense_bytes'] / 2 ** 20, result['sparse_bytes'] / 2 ** 20))
+                results.append(result)
+                # the pruner holds reference cycles to the copies of the weights
+                gc.collect()
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
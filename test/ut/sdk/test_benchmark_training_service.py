@@ -0,0 +1,90 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+from unittest import TestCase, main
+
+import numpy as np
+
+from nni.algorithms.hpo.hyperopt_tuner import HyperoptTuner
+from nni.algorithms.hpo.medianstop_assessor import MedianstopAssessor
+from nni.nas.benchmarks.training_service import BenchmarkEvaluator, BenchmarkTrainingService
+from nni.runtime.msg_dispatcher import MsgDispatcher
+
+SEARCH_SPACE = {
+    'x': {'_type': 'choice', '_value': list(range(10))},
+    'y': {'_type': 'choice', '_value': list(range(10))}
+}
+
+
+class SyntheticEvaluator(BenchmarkEvaluator):
+    """ Accuracy grows with x, and each epoch takes x + 1 seconds. Architectures with y = 9 are not in the benchmark. """
+
+    def __init__(self):
+        super().__init__('valid_acc', 'valid_acc')
+        self.num_queries = 0
+
+    def query(self, parameters):
+        self.num_queries += 1
+        if parameters['y'] == 9:
+            return []
+        epochs = np.arange(1, 5)
+        return [{
+            'valid_acc': parameters['x'] * 10. + seed,
+            'training_time': (parameters['x'] + 1.) * 4,
+            'intermediates': {'current_epoch': epochs, 'valid_acc': parameters['x'] * 2.5 * epochs + seed}
+        } for seed in range(2)]
+
+
+class BenchmarkTrainingServiceTestCase(TestCase):
+    def _run(self, assessor=None, max_trials=100, concurrency=4):
+        tuner = HyperoptTuner('random_search')
+        dispatcher = MsgDispatcher(tuner, assessor)
+        evaluator = SyntheticEvaluator()
+        service = BenchmarkTrainingService(evaluator, concurrency=concurrency, max_trials=max_trials, seed=0)
+        result = service.run(dispatcher, SEARCH_SPACE)
+        # the worker threads of the dispatcher have exited
+        self.assertFalse(dispatcher.default_worker.is_alive() or dispatcher.assessor_worker.is_alive())
+        return result, tuner, evaluator
+
+    def test_run_trials(self):
+        result, tuner, evaluator = self._run()
+        trials = result['trials']
+        self.assertEqual(len(trials), 100)
+        self.assertLessEqual(evaluator.num_queries, 100)
+        succeeded = [trial for trial in trials if trial['status'] == 'SUCCEEDED']
+        failed = [trial for trial in trials if trial['status'] == 'FAILED']
+        self.assertEqual(len(succeeded) + len(failed), 100)
+        self.assertTrue(failed)
+        for trial in failed:
+            self.assertEqual(trial['parameters']['y'], 9)
+            self.assertEqual(trial['start_time'], trial['end_time'])
+        for trial in succeeded:
+            x = trial['parameters']['x']
+            self.assertEqual(len(trial['intermediates']), 4)
+            self.assertIn(trial['final'], [x * 10., x * 10. + 1])
+            self.assertAlmostEqual(trial['end_time'] - trial['start_time'], (x + 1) * 4)
+        # at most 4 trials run at the same time
+        for trial in trials:
+            running = [t for t in trials if t['start_time'] <= trial['start_time'] < t['end_time']]
+            self.assertLessEqual(len(running), 4)
+        self.assertAlmostEqual(result['duration'], max(trial['end_time'] for trial in trials))
+        # the tuner has received all the final results
+        received = [t for t in tuner.rval.trials._dynamic_trials if t['result'].get('status') == 'ok']
+        self.assertEqual(len(received), len(succeeded))
+
+    def test_assessor(self):
+        result, _, _ = self._run(MedianstopAssessor('maximize'))
+        canceled = [trial for trial in result['trials'] if trial['status'] == 'USER_CANCELED']
+        self.assertTrue(canceled)
+        for trial in canceled:
+            self.assertIsNone(trial['final'])
+            self.assertLess(len(trial['intermediates']), 4)
+
+    def test_throughput(self):
+        result, _, _ = self._run(max_trials=1000, concurrency=16)
+        self.assertEqual(len(result['trials']), 1000)
+        self.assertLess(result['wall_time'], 60)
+
+
+if __name__ == '__main__':
+    main()
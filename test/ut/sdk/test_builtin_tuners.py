@@ -8,6 +8,7 @@ import os
 import random
 import shutil
 import sys
+import tempfile
 from collections import deque
 from unittest import TestCase, main
 
@@ -33,8 +34,8 @@ logger = logging.getLogger('test_tuner')
 class BuiltinTunersTestCase(TestCase):
     """
     Targeted at testing functions of built-in tuners, including
-        - [ ] load_checkpoint
-        - [ ] save_checkpoint
+        - [X] load_checkpoint
+        - [X] save_checkpoint
         - [X] update_search_space
         - [X] generate_multiple_parameters
         - [X] import_data
@@ -248,6 +249,47 @@ class BuiltinTunersTestCase(TestCase):
         logger.info("Imported data successfully at the beginning with incomplete epoch")
         shutil.rmtree(all_checkpoint_dir)
 
+    def copy_checkpoint_test_for_pbt(self):
+        """
+        bottom trials load copies of the checkpoints of top trials, and are sent after the copies complete
+        """
+        search_space = {
+            "x": {
+                "_type": "uniform",
+                "_value": [0, 1]
+            }
+        }
+        all_checkpoint_dir = tempfile.mkdtemp()
+        population_size = 5
+        tuner = PBTTuner(
+            all_checkpoint_dir=all_checkpoint_dir,
+            population_size=population_size,
+            copy_checkpoint=True
+        )
+        tuner.update_search_space(search_space)
+        sent = deque()
+        parameters = tuner.generate_multiple_parameters(list(range(population_size)),
+                                                        st_callback=self.send_trial_callback(sent))
+        for i, param in enumerate(parameters):
+            os.makedirs(param["save_checkpoint_dir"], exist_ok=True)
+            with open(os.path.join(param["save_checkpoint_dir"], "model.pth"), "w") as f:
+                f.write(str(i))
+        # request parameters of next epoch in advance
+        self.assertEqual(tuner.generate_multiple_parameters(list(range(population_size, 2 * population_size)),
+                                                           st_callback=self.send_trial_callback(sent)), [])
+        for i, param in enumerate(parameters):
+            tuner.receive_trial_result(i, param, float(i))
+        tuner.copy_pool.close()
+        tuner.copy_pool.join()
+        self.assertEqual(len(sent), population_size)
+        self.assertFalse(tuner.copying)
+        bottoms = [param for _, param in sent if param["load_checkpoint_dir"].startswith(all_checkpoint_dir) and
+                   os.path.basename(os.path.dirname(param["load_checkpoint_dir"])) == "exploit"]
+        self.assertEqual(len(bottoms), 1)
+        with open(os.path.join(bottoms[0]["load_checkpoint_dir"], "model.pth")) as f:
+            self.assertEqual(f.read(), str(population_size - 1))
+        shutil.rmtree(all_checkpoint_dir)
+
     def import_data_test(self, tuner_factory, stype="choice_str"):
         """
         import data at the beginning with number value and dict value
@@ -308,6 +350,36 @@ class BuiltinTunersTestCase(TestCase):
         parameters = tuner.generate_multiple_parameters([3])
         tuner.receive_trial_result(3, parameters[0], random.uniform(-100, 100))
 
+    def checkpoint_test(self, tuner_factory):
+        """
+        save checkpoint after some trials, then check a new tuner resumed from it can keep generating parameters
+        """
+        search_space = {
+            "x": {"_type": "uniform", "_value": [-10, 10]},
+            "y": {"_type": "choice", "_value": [1, 2, 3]}
+        }
+        checkpoint_dir = tempfile.mkdtemp()
+        os.environ["NNI_CHECKPOINT_DIRECTORY"] = checkpoint_dir
+        try:
+            tuner = tuner_factory()
+            tuner.update_search_space(search_space)
+            parameters = tuner.generate_multiple_parameters(list(range(5)))
+            for i, param in enumerate(parameters):
+                tuner.receive_trial_result(i, param, random.uniform(-100, 100))
+            tuner.save_checkpoint()
+
+            resumed_tuner = tuner_factory()
+            self.assertTrue(resumed_tuner.load_checkpoint())
+            resumed_tuner.update_search_space(search_space)
+            parameters = resumed_tuner.generate_multiple_parameters(list(range(5, 8)))
+            self.assertTrue(parameters)
+            for param in parameters:
+                self.assertTrue(-10 <= param["x"] <= 10)
+                self.assertIn(param["y"], [1, 2, 3])
+        finally:
+            del os.environ["NNI_CHECKPOINT_DIRECTORY"]
+            shutil.rmtree(checkpoint_dir)
+
     def test_grid_search(self):
         self.exhaustive = True
         tuner_fn = lambda: GridSearchTuner()
@@ -321,6 +393,7 @@ class BuiltinTunersTestCase(TestCase):
                                    ignore_types=["uniform_equal", "qloguniform_equal", "loguniform_equal", "quniform_clip_2"])
         # NOTE: types are ignored because `tpe.py line 465, in adaptive_parzen_normal assert prior_sigma > 0`
         self.import_data_test(tuner_fn)
+        self.checkpoint_test(tuner_fn)
 
     def test_random_search(self):
         tuner_fn = lambda: HyperoptTuner("random_search")
@@ -340,6 +413,14 @@ class BuiltinTunersTestCase(TestCase):
                                    supported_types=["choice", "randint", "uniform", "quniform", "loguniform"])
         self.import_data_test(tuner_fn)
 
+    def test_smac_background_fit(self):
+        if sys.platform == "win32":
+            return  # smac doesn't work on windows
+        tuner_fn = lambda: SMACTuner(config_dedup=True, proposals_per_fit=8, background_fit=True)
+        self.search_space_test_all(tuner_fn,
+                                   supported_types=["choice", "randint", "uniform", "quniform", "loguniform"])
+        self.import_data_test(tuner_fn)
+
     def test_batch(self):
         self.exhaustive = True
         tuner_fn = lambda: BatchTuner()
@@ -352,6 +433,7 @@ class BuiltinTunersTestCase(TestCase):
         tuner_fn = lambda: EvolutionTuner(population_size=100)
         self.search_space_test_all(tuner_fn)
         self.import_data_test(tuner_fn)
+        self.checkpoint_test(lambda: EvolutionTuner(population_size=10))
 
     def test_gp(self):
         self.test_round = 1  # NOTE: GP tuner got hanged for multiple testing round
@@ -362,6 +444,7 @@ class BuiltinTunersTestCase(TestCase):
                                    ignore_types=["normal", "lognormal", "qnormal", "qlognormal"],
                                    fail_types=["choice_str", "choice_mixed"])
         self.import_data_test(tuner_fn, "choice_num")
+        self.checkpoint_test(tuner_fn)
 
     def test_metis(self):
         self.test_round = 1  # NOTE: Metis tuner got hanged for multiple testing round
@@ -370,6 +453,7 @@ class BuiltinTunersTestCase(TestCase):
                                    supported_types=["choice", "randint", "uniform", "quniform"],
                                    fail_types=["choice_str", "choice_mixed"])
         self.import_data_test(tuner_fn, "choice_num")
+        self.checkpoint_test(tuner_fn)
 
     def test_networkmorphism(self):
         pass
@@ -387,6 +471,7 @@ class BuiltinTunersTestCase(TestCase):
             population_size=100
         ))
         self.import_data_test_for_pbt()
+        self.copy_checkpoint_test_for_pbt()
 
     def tearDown(self):
         file_list = glob.glob("smac3*") + ["param_config_space.pcs", "scenario.txt", "model_path"]
@@ -13,6 +13,7 @@ from nni.algorithms.compression.pytorch.pruning import L1FilterPruner
 from nni.compression.pytorch.utils.shape_dependency import ChannelDependency
 from nni.compression.pytorch.utils.mask_conflict import fix_mask_conflict
 from nni.compression.pytorch.utils.counter import count_flops_params
+from nni.compression.pytorch.utils.sensitivity_analysis import SensitivityAnalysis
 
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 prefix = 'analysis_test'
@@ -181,6 +182,60 @@ class AnalysisUtilsTest(TestCase):
         flops, params, results = count_flops_params(resnet50(), (1, 3, 224, 224), verbose=False)
         assert (flops, params) == (4089184256, 25503912)
 
+    def test_sensitivity_analysis(self):
+        torch.manual_seed(0)
+        net = nn.Sequential(nn.Conv2d(3, 8, 3), nn.ReLU(), nn.Conv2d(8, 8, 3), nn.ReLU(), nn.Conv2d(8, 4, 3))
+        data = torch.randn(4, 3, 16, 16)
+        calls = []
+
+        def val(model):
+            calls.append(1)
+            with torch.no_grad():
+                return model(data).abs().mean().item()
+
+        sparsities = [0.25, 0.5, 0.75]
+        s_analyzer = SensitivityAnalysis(model=net, val_func=val, sparsities=sparsities)
+        expected = s_analyzer.analysis(val_args=[net])
+        assert list(expected.keys()) == ['0', '2', '4']
+        expected = {name: dict(metrics) for name, metrics in expected.items()}
+
+        # the (layer, sparsity) pairs in worker processes give the same sensitivities
+        s_analyzer = SensitivityAnalysis(model=net, val_func=val, sparsities=sparsities)
+        assert s_analyzer.analysis(val_args=[net], num_workers=2) == expected
+        s_analyzer = SensitivityAnalysis(model=net, val_func=val, sparsities=sparsities,
+                                         early_stop_mode='dropped', early_stop_value=0.)
+        early_stopped = s_analyzer.analysis(val_args=[net])
+        s_analyzer = SensitivityAnalysis(model=net, val_func=val, sparsities=sparsities,
+                                         early_stop_mode='dropped', early_stop_value=0.)
+        assert s_analyzer.analysis(val_args=[net], num_workers=2) == early_stopped
+
+        # the layers in the checkpoint are not analyzed again
+        checkpoint_path = os.path.join(prefix, 'sensitivity_checkpoint.csv')
+        os.makedirs(prefix, exist_ok=True)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        s_analyzer = SensitivityAnalysis(model=net, val_func=val, sparsities=sparsities)
+        s_analyzer.analysis(val_args=[net], specified_layers=['2'], checkpoint_path=checkpoint_path)
+        calls.clear()
+        s_analyzer = SensitivityAnalysis(model=net, val_func=val, sparsities=sparsities)
+        sensitivities = s_analyzer.analysis(val_args=[net], checkpoint_path=checkpoint_path)
+        assert len(calls) == 1 + 2 * len(sparsities)
+        assert list(sensitivities.keys()) == ['0', '2', '4']
+        for name in expected:
+            assert np.allclose(list(sensitivities[name].values()), list(expected[name].values()))
+        with open(checkpoint_path) as f:
+            assert [line.split(',')[0] for line in f.read().splitlines()] == ['layername', '2', '0', '4']
+        with self.assertRaises(ValueError):
+            SensitivityAnalysis(model=net, val_func=val, sparsities=[0.5]).analysis(
+                val_args=[net], checkpoint_path=checkpoint_path)
+        os.remove(checkpoint_path)
+
+        # the fast validation function is used instead
+        calls.clear()
+        s_analyzer = SensitivityAnalysis(model=net, val_func=val, sparsities=sparsities)
+        fast = s_analyzer.analysis(val_args=[net], fast_val_func=lambda model: 0.)
+        assert not calls and fast['0'] == {0.25: 0., 0.5: 0., 0.75: 0.}
+
 
 if __name__ == '__main__':
     main()
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import os
 from unittest import TestCase, main
 import numpy as np
 import torch
@@ -65,6 +66,52 @@ class CompressorTestCase(TestCase):
         configure_list = [{'sparsity': 0.8, 'op_types': ['default']}]
         torch_pruner.LevelPruner(model, configure_list, optimizer).compress()
 
+    def test_torch_pruner_lazy_mask(self):
+        model = TorchModel()
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.01, momentum=0.9)
+        config_list = [{'sparsity': 0.5, 'op_types': ['default']}]
+        pruner = torch_pruner.LevelPruner(model, config_list, optimizer)
+        pruner.enable_lazy_mask()
+        model = pruner.compress()
+        x = torch.randn(8, 1, 28, 28)
+        y = torch.randint(0, 10, (8,))
+
+        def train_step():
+            optimizer.zero_grad()
+            F.nll_loss(model(x), y).backward()
+            optimizer.step()
+
+        def assert_pruned_weights_zero():
+            for wrapper in pruner.get_modules_wrapper():
+                assert torch.all(wrapper.module.weight[wrapper.weight_mask == 0] == 0)
+
+        for _ in range(3):
+            train_step()
+        assert_pruned_weights_zero()
+
+        # the momentum of the newly pruned weights is cleared with the new masks
+        model.conv1.if_calculated = False
+        model.conv1.config = {'sparsity': 0.8, 'op_types': ['default']}
+        pruner.update_mask()
+        momentum = optimizer.state[model.conv1.module.weight]['momentum_buffer']
+        assert torch.all(momentum[model.conv1.weight_mask == 0] == 0)
+        train_step()
+        assert_pruned_weights_zero()
+        assert model.conv1.weight_mask.sum().item() == 25
+
+        # the masks are not applied again until they are changed
+        model.conv1.module.weight.data.fill_(1.)
+        model(x)
+        assert torch.all(model.conv1.module.weight == 1.)
+        model.conv1.mask_version += 1
+        model(x)
+        assert torch.equal(model.conv1.module.weight, model.conv1.weight_mask)
+
+        pruner.enable_lazy_mask(False)
+        model.conv1.module.weight.data.fill_(1.)
+        model(x)
+        assert torch.equal(model.conv1.module.weight, model.conv1.weight_mask)
+
     def test_torch_naive_quantizer(self):
         model = TorchModel()
         configure_list = [{
@@ -105,6 +152,16 @@ class CompressorTestCase(TestCase):
         masks = pruner.calc_mask(model.conv2)
         assert all(torch.sum(masks['weight_mask'], (1, 2, 3)).numpy() == np.array([125., 125., 0., 0., 0., 0., 0., 0., 125., 125.]))
 
+        # the distances are computed in chunks of filters for wide layers
+        model.conv2.module.weight.data = torch.tensor(w).float()
+        model.conv2.if_calculated = False
+        pruner.masker.distance_chunk_size = 3
+        masks = pruner.calc_mask(model.conv2)
+        assert all(torch.sum(masks['weight_mask'], (1, 2, 3)).numpy() == np.array([125., 125., 0., 0., 0., 0., 0., 0., 125., 125.]))
+
+        # the channels with equal distances are pruned in the order of their indices
+        assert pruner.masker._get_min_gm_kernel_idx(4, model.conv2, None, torch.tensor([1., 0., 1., 0., 0., 1., 0., 1., 1., 1.])) == [1, 3, 4, 6]
+
        
     def test_torch_l1filter_pruner(self):
         """
@@ -274,6 +331,87 @@ class CompressorTestCase(TestCase):
         assert math.isclose(model.relu.module.tracked_min_biased, 0.002, abs_tol=eps)
         assert math.isclose(model.relu.module.tracked_max_biased, 0.00998, abs_tol=eps)
 
+    def test_torch_QAT_quantizer_fold_bn(self):
+        model = TorchModel()
+        config_list = [{
+            'quant_types': ['weight', 'output'],
+            'quant_bits': 8,
+            'op_types': ['Conv2d', 'Linear']
+        }]
+        state_names = list(model.state_dict().keys())
+        quantizer = torch_quantizer.QAT_Quantizer(model, config_list, dummy_input=torch.randn(1, 1, 28, 28))
+        quantizer.compress()
+        assert quantizer.conv_bn_patterns == {'conv1': 'bn1', 'conv2': 'bn2'}
+        assert isinstance(model.bn1, torch.nn.Identity)
+        assert model.conv1.bn_name == 'bn1'
+        assert model.fc1.bn_module is None
+
+        # the running statistics are updated with the output of the unfolded convolution
+        x = torch.randn(8, 1, 28, 28)
+        model(x)
+        bn = model.conv1.bn_module
+        conv_out = F.conv2d(x, model.conv1.module.old_weight, model.conv1.module.old_bias)
+        assert torch.allclose(bn.running_mean, 0.1 * conv_out.mean((0, 2, 3)), atol=1e-6)
+
+        # the folded weight is quantized, and the folded bias is used
+        factor = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+        folded_weight = model.conv1.module.old_weight * factor.view(-1, 1, 1, 1)
+        folded_bias = bn.bias + (model.conv1.module.old_bias - bn.running_mean) * factor
+        scale = (folded_weight.max().clamp(min=0) - folded_weight.min().clamp(max=0)) / 255
+        assert (model.conv1.module.weight - folded_weight).abs().max() <= scale / 2 + 1e-6
+        assert torch.allclose(model.conv1.module.bias, folded_bias, atol=1e-6)
+
+        calibration_config = quantizer.export_model('qat_model_tmp.pth', 'qat_calibration_tmp.pth')
+        assert list(torch.load('qat_model_tmp.pth').keys()) == state_names
+        assert calibration_config['conv1']['bn_module'] == 'bn1'
+        assert 'bn_module' not in calibration_config['fc1']
+        assert isinstance(model.bn1, torch.nn.Identity)
+        assert torch.load('qat_calibration_tmp.pth') == calibration_config
+        os.remove('qat_model_tmp.pth')
+        os.remove('qat_calibration_tmp.pth')
+
+    def test_torch_quantizer_weight_cache(self):
+        model = TorchModel()
+        config_list = [{
+            'quant_types': ['weight'],
+            'quant_bits': 8,
+            'op_types': ['Conv2d', 'Linear']
+        }]
+        quantizer = torch_quantizer.QAT_Quantizer(model, config_list)
+        quantizer.compress()
+        calls = []
+        quantize_weight = quantizer.quantize_weight
+        def count_quantize_weight(wrapper, **kwargs):
+            calls.append(wrapper.name)
+            return quantize_weight(wrapper, **kwargs)
+        quantizer.quantize_weight = count_quantize_weight
+
+        model.eval()
+        x = torch.randn(2, 1, 28, 28)
+        with torch.no_grad():
+            out = model(x)
+            assert len(calls) == 4
+            # the quantized weights are reused until the weights are changed
+            assert torch.equal(model(x), out)
+            assert len(calls) == 4
+            model.conv1.module.old_weight.mul_(2)
+            model(x)
+            assert calls[4:] == ['conv1']
+            model.fc1.module.old_weight.data.mul_(2)
+            model.fc1.weight_version += 1
+            out = model(x)
+            assert calls[5:] == ['fc1']
+            model.fc1.weight_cache = None
+            assert torch.equal(model(x), out)
+            assert calls[6:] == ['fc1']
+
+        # the weights are quantized in every forward with gradient
+        model.train()
+        model(x).sum().backward()
+        model(x)
+        assert len(calls) == 15
+        assert model.conv1.module.old_weight.grad is not None
+
     def test_torch_pruner_validation(self):
         # test bad configuraiton
         pruner_classes = [torch_pruner.__dict__[x] for x in \
@@ -9,7 +9,7 @@ import numpy as np
 
 from unittest import TestCase, main
 
-from nni.utils import json2space, json2parameter
+from nni.utils import CompiledSearchSpace, json2space, json2parameter, split_index
 
 
 class EvolutionTunerTestCase(TestCase):
@@ -53,6 +53,51 @@ class EvolutionTunerTestCase(TestCase):
         self.assertIn(search_space_instance["learning_rate"]["_index"], range(5))
         self.assertIn(search_space_instance["learning_rate"]["_value"], [0.0001, 0.001, 0.002, 0.005, 0.01])
 
+    def test_compiled_search_space(self):
+        """test that the compiled search space samples the same parameters as json2parameter
+        """
+        json_search_space = {
+            "lr": {"_type": "loguniform", "_value": [0.0001, 0.1]},
+            "batch_size": {"_type": "choice", "_value": [16, 32, [64, 128]]},
+            "layers": [
+                {"_name": "conv", "kernel": {"_type": "randint", "_value": [1, 7]}},
+                {"_name": "pool", "size": 2}
+            ],
+            "optimizer": {
+                "_type": "choice",
+                "_value": [
+                    {"_name": "sgd", "momentum": {"_type": "uniform", "_value": [0, 1]}},
+                    {"_name": "adam", "beta": {"_type": "choice", "_value": [
+                        {"_name": "fixed"},
+                        {"_name": "tuned", "value": {"_type": "quniform", "_value": [0.8, 0.99, 0.01]}}
+                    ]}}
+                ]
+            }
+        }
+        compiled = CompiledSearchSpace(json_search_space)
+        self.assertEqual(compiled.names, json2space(json_search_space))
+
+        random_state, compiled_random_state = np.random.RandomState(0), np.random.RandomState(0)
+        expected = json2parameter(json_search_space, {name: True for name in compiled.names}, random_state)
+        config = compiled.sample(compiled_random_state)
+        self.assertEqual(config, expected)
+        for step in range(50):
+            space = json2space(json_search_space, expected)
+            self.assertEqual(compiled.space(config), space)
+            mutation_pos = space[step % len(space)]
+            is_rand = {name: name == mutation_pos for name in compiled.names}
+            expected_mutated = json2parameter(json_search_space, is_rand, random_state, expected)
+            mutated = compiled.sample(compiled_random_state, config, {mutation_pos: True})
+            self.assertEqual(mutated, expected_mutated)
+            # subtrees which are not resampled are shared instead of copied
+            if not mutation_pos.startswith("root[layers]"):
+                self.assertIs(mutated["layers"], config["layers"])
+            self.assertEqual(split_index(config), split_index(expected))
+            expected, config = expected_mutated, mutated
+
+        with self.assertRaises(RuntimeError):
+            CompiledSearchSpace({"layers": [{"kernel": 3}]})
+
 
 if __name__ == '__main__':
     main()
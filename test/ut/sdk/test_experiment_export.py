@@ -0,0 +1,105 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main, skipIf
+
+from nni.experiment.export import iter_trial_metrics, iter_trial_records, export_trial_records
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class FakeRestServer:
+    """ Trial ``i`` has parameter ``x = i`` and ``i % 3`` intermediate results, trial 7 is not finished. """
+
+    def __init__(self, num_trials):
+        self.num_trials = num_trials
+        self.requests = []
+        self.metrics = []
+        for i in range(num_trials):
+            for step in reversed(range(i % 3)):
+                self.metrics.append(self._metric(i, 'PERIODICAL', step, step * 0.1))
+            if i != 7:
+                self.metrics.append(self._metric(i, 'FINAL', i % 3, i * 0.1))
+
+    @staticmethod
+    def _metric(index, metric_type, sequence, value):
+        return {'trialJobId': 'trial%d' % index, 'sequenceId': index, 'type': metric_type, 'sequence': sequence,
+                'timestamp': 1000 * index + sequence, 'data': json.dumps(json.dumps(value))}
+
+    def __call__(self, api):
+        self.requests.append(api)
+        if api == '/experiment':
+            return {'nextSequenceId': self.num_trials}
+        if api == '/export-data':
+            return [{'parameter': {'x': i}, 'value': json.dumps(i * 0.1), 'trialJobId': 'trial%d' % i}
+                    for i in range(self.num_trials) if i != 7]
+        if api.startswith('/metric-data-range/'):
+            start, end = map(int, api.split('/')[2:])
+            return [metric for metric in self.metrics if start <= metric['sequenceId'] <= end]
+        return None
+
+
+class ExperimentExportTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = FakeRestServer(25)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _export(self, file_type, intermediate=True):
+        path = os.path.join(self.tmp_dir, 'trials.' + file_type)
+        records = iter_trial_records(self.server, intermediate, page_size=10)
+        self.assertEqual(export_trial_records(records, path, file_type), 24)
+        self.assertEqual(os.listdir(self.tmp_dir), ['trials.' + file_type])
+        return path
+
+    def test_iter_trial_metrics(self):
+        metrics = dict(iter_trial_metrics(self.server, page_size=10))
+        self.assertEqual(len(metrics), 25)
+        self.assertEqual([metric['sequence'] for metric in metrics['trial5']], [0, 1, 2])
+        self.assertEqual(self.server.requests, ['/experiment', '/metric-data-range/0/9',
+                                                '/metric-data-range/10/19', '/metric-data-range/20/29'])
+
+    def test_intermediate(self):
+        records = {record['trialJobId']: record for record in iter_trial_records(self.server, True, page_size=10)}
+        self.assertEqual(len(records), 24)
+        self.assertEqual(records['trial5']['intermediate'], ['0.0', '0.1'])
+        self.assertEqual(records['trial3']['intermediate'], [])
+
+    def test_json(self):
+        with open(self._export('json', intermediate=False)) as file:
+            records = json.load(file)
+        self.assertEqual(records, self.server('/export-data'))
+
+    def test_jsonl(self):
+        with open(self._export('jsonl')) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), 24)
+        self.assertTrue(all('intermediate' in record for record in records))
+
+    def test_csv(self):
+        with open(self._export('csv')) as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 24)
+        row = [row for row in rows if row['trialJobId'] == 'trial5'][0]
+        self.assertEqual(row, {'intermediate': '[0.0,0.1]', 'x': '5', 'reward': '0.5', 'trialJobId': 'trial5'})
+
+    @skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        table = pyarrow.parquet.read_table(self._export('parquet'))
+        self.assertEqual(table.num_rows, 24)
+        self.assertEqual(str(table.schema.field('x').type), 'int64')
+        self.assertEqual(str(table.schema.field('reward').type), 'double')
+
+
+if __name__ == '__main__':
+    main()
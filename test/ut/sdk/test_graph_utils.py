@@ -1,10 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import gc
 import sys
 import os
 import math
 import uuid
+import weakref
 import shutil
 import numpy as np
 import torch
@@ -15,7 +17,8 @@ from google.protobuf import text_format
 import unittest
 from unittest import TestCase, main
 
-from nni.common.graph_utils import build_module_graph, build_graph, TorchModuleGraph, TUPLE_UNPACK_KIND
+from nni.common.graph_utils import build_module_graph, build_graph, TorchModuleGraph, TUPLE_UNPACK_KIND, \
+    get_module_graph, clear_graph_cache, _trace_cache, _graph_cache
 
 class BackboneModel1(nn.Module):
     def __init__(self):
@@ -291,5 +294,47 @@ class GraphUtilsTestCase(TestCase):
                     assert preprocessor.op_type != TUPLE_UNPACK_KIND
 
 
+class GraphCacheTestCase(TestCase):
+    def setUp(self):
+        clear_graph_cache()
+
+    def tearDown(self):
+        clear_graph_cache()
+
+    def test_get_module_graph(self):
+        model = BackboneModel2()
+        graph = get_module_graph(model, torch.randn(2, 1, 28, 28))
+        # same model and input shape, the graph is shared
+        self.assertIs(get_module_graph(model, torch.randn(2, 1, 28, 28)), graph)
+        # the unpacked graph is built separately from the same trace
+        unpacked = get_module_graph(model, torch.randn(2, 1, 28, 28), unpack=True)
+        self.assertIsNot(unpacked, graph)
+        self.assertIs(unpacked.trace, graph.trace)
+        self.assertIs(get_module_graph(model, torch.randn(2, 1, 28, 28), unpack=True), unpacked)
+        # a different input shape is traced again
+        self.assertIsNot(get_module_graph(model, torch.randn(4, 1, 28, 28)).trace, graph.trace)
+        # so is a model whose modules are replaced by smaller ones, e.g., by speedup
+        model.fc1 = nn.Linear(4 * 4 * 50, 400)
+        model.fc2 = nn.Linear(400, 10)
+        self.assertIsNot(get_module_graph(model, torch.randn(2, 1, 28, 28)), graph)
+
+    def test_graph_cache_eviction(self):
+        model = BackboneModel2()
+        get_module_graph(model, torch.randn(2, 1, 28, 28))
+        graph = weakref.ref(get_module_graph(model, torch.randn(2, 1, 28, 28), unpack=True))
+        self.assertEqual((len(_trace_cache), len(_graph_cache)), (1, 2))
+        # the cached trace and graphs do not keep the model alive, and are dropped along with it
+        del model
+        gc.collect()
+        self.assertEqual((len(_trace_cache), len(_graph_cache)), (0, 0))
+        self.assertIsNone(graph())
+
+    def test_clear_graph_cache(self):
+        model = BackboneModel2()
+        graph = get_module_graph(model, torch.randn(2, 1, 28, 28))
+        clear_graph_cache()
+        self.assertIsNot(get_module_graph(model, torch.randn(2, 1, 28, 28)), graph)
+
+
 if __name__ == '__main__':
     main()
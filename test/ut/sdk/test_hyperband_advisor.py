@@ -0,0 +1,41 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+from unittest import TestCase, main
+
+from nni.algorithms.hpo.hyperband_advisor import Hyperband
+
+
+class HyperbandTestCase(TestCase):
+    def test_unnamed_nested_choice(self):
+        search_space = {
+            'opt': {'_type': 'choice', '_value': [{'lr': {'_type': 'uniform', '_value': [0.1, 1]}}, {'m': 1}]},
+            'layers': [{'_type': 'choice', '_value': [1, 2]}, 3]
+        }
+        advisor = Hyperband(R=9, eta=3)
+        try:
+            # nested search spaces without '_name' are accepted by hyperband
+            advisor.handle_update_search_space(search_space)
+            chosen = set()
+            for _ in range(20):
+                params = advisor._get_one_trial_job()['parameters']
+                self.assertEqual(set(params), {'opt', 'layers', 'TRIAL_BUDGET'})
+                if 'lr' in params['opt']:
+                    self.assertEqual(list(params['opt']), ['lr'])
+                    self.assertTrue(0.1 <= params['opt']['lr'] <= 1)
+                    chosen.add('lr')
+                else:
+                    self.assertEqual(params['opt'], {'m': 1})
+                    chosen.add('m')
+                self.assertIn(params['layers'][0], [1, 2])
+                self.assertEqual(params['layers'][1], 3)
+            self.assertEqual(chosen, {'lr', 'm'})
+        finally:
+            # the command queue workers are started with the advisor, which is never run in this test
+            advisor.stopping = True
+            advisor.default_worker.join()
+            advisor.assessor_worker.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -106,6 +106,32 @@ class HyperoptTunerTestCase(TestCase):
                 self.assertLessEqual(param["a"], 2)
                 self.assertIn(param["b"], choice_list)
 
+    def test_tuner_import_data(self):
+        search_space = {
+            "a": {
+                "_type": "randint",
+                "_value": [1, 3]
+            },
+            "b": {
+                "_type": "choice",
+                "_value": ["x", "y"]
+            }
+        }
+        data = [{"parameter": {"a": 1, "b": "y"}, "value": 0.5},
+                {"parameter": {"a": 2, "b": "x"}, "value": {"default": 0.7, "other": 1}},
+                {"parameter": {"a": 2, "b": "y"}, "value": None}]
+        tuner = HyperoptTuner("tpe", optimize_mode="maximize")
+        tuner.update_search_space(search_space)
+        tuner.import_data(data)
+        trials = tuner.rval.trials.trials
+        self.assertEqual(len(trials), 2)
+        self.assertEqual([trial["tid"] for trial in trials], [0, 1])
+        self.assertEqual([trial["result"]["loss"] for trial in trials], [-0.5, -0.7])
+        self.assertEqual(trials[0]["misc"]["vals"], {"root[a]-randint": [0], "root[b]-choice": [1]})
+        self.assertEqual(tuner.supplement_data_num, 2)
+        param = tuner.generate_parameters(0)
+        self.assertIn(param["b"], ["x", "y"])
+
 
 if __name__ == '__main__':
     main()
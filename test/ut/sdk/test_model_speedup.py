@@ -13,8 +13,11 @@ from torchvision.models.resnet import resnet18
 import unittest
 from unittest import TestCase, main
 
-from nni.compression.pytorch import ModelSpeedup, apply_compression_results
-from nni.algorithms.compression.pytorch.pruning import L1FilterPruner
+from nni.compression.pytorch import ModelSpeedup, SparseModelSpeedup, QuantizedModelSpeedup, apply_compression_results
+from nni.compression.pytorch.speedup.sparse_modules import SparseLinear, SparseConv2d
+from nni.compression.pytorch.speedup.quantized_modules import QuantizedModule
+from nni.algorithms.compression.pytorch.pruning import L1FilterPruner, LevelPruner
+from nni.algorithms.compression.pytorch.quantization import QAT_Quantizer, DoReFaQuantizer
 from nni.algorithms.compression.pytorch.pruning.weight_masker import WeightMasker
 from nni.algorithms.compression.pytorch.pruning.one_shot import _StructuredFilterPruner
 
@@ -104,9 +107,29 @@ class TransposeModel(torch.nn.Module):
         return x
 
 
+class DenseChainModel(torch.nn.Module):
+    """
+    A deep chain of densely connected layers, where each layer concatenates
+    its output to the features of all the previous layers.
+    """
+    def __init__(self, num_layers=24, growth_rate=4):
+        super().__init__()
+        self.conv0 = nn.Conv2d(3, growth_rate, 3, padding=1)
+        self.layers = nn.ModuleList([nn.Conv2d(growth_rate * (i + 1), growth_rate, 3, padding=1)
+                                     for i in range(num_layers)])
+        self.fc = nn.Linear(growth_rate * (num_layers + 1), 10)
+
+    def forward(self, x):
+        x = F.relu(self.conv0(x))
+        for layer in self.layers:
+            x = torch.cat([x, F.relu(layer(x))], 1)
+        return self.fc(x.mean((2, 3)))
+
+
 dummy_input = torch.randn(2, 1, 28, 28)
 SPARSITY = 0.5
 MODEL_FILE, MASK_FILE = './11_model.pth', './l1_mask.pth'
+CALIBRATION_FILE = './calibration.pth'
 
 
 def prune_model_l1(model):
@@ -288,6 +311,26 @@ class SpeedupTestCase(TestCase):
         assert (abs(ori_sum - speeded_sum) / abs(ori_sum) < RELATIVE_THRESHOLD) or \
                 (abs(ori_sum - speeded_sum) < ABSOLUTE_THRESHOLD)
 
+    def test_speedup_dense_chain(self):
+        model = DenseChainModel()
+        data = torch.rand(2, 3, 8, 8)
+        prune_model_l1(model)
+        model.eval()
+        mask_out = model(data)
+
+        model = DenseChainModel()
+        model.load_state_dict(torch.load(MODEL_FILE))
+        model.eval()
+        ms = ModelSpeedup(model, data, MASK_FILE)
+        ms.speedup_model()
+        assert torch.allclose(mask_out, model(data), atol=1e-06)
+        assert model.layers[-1].out_channels == 2
+        assert model.fc.in_features == 50
+
+        # each edge of the graph is visited at most once in each direction
+        num_edges = sum(len(ms.torch_graph.find_successors(name)) for name in ms.torch_graph.name_to_node)
+        assert sum(ms.visit_counts.values()) <= len(ms.masks) + 2 * num_edges
+
     # FIXME: This test case might fail randomly, no idea why
     # Example: https://msrasrg.visualstudio.com/NNIOpenSource/_build/results?buildId=16282
 
@@ -373,5 +416,95 @@ class SpeedupTestCase(TestCase):
         os.remove(MASK_FILE)
 
 
+class SparseSpeedupTestCase(TestCase):
+    def _prune(self, sparsity):
+        model = BackboneModel2()
+        pruner = LevelPruner(model, [{'sparsity': sparsity, 'op_types': ['Conv2d', 'Linear']}])
+        pruner.compress()
+        pruner.export_model(model_path=MODEL_FILE, mask_path=MASK_FILE)
+        pruner._unwrap_model()
+        model.eval()
+        return model, model(dummy_input)
+
+    def test_sparse_speedup(self):
+        # at sparsity 0.9, about 80% of the 4x4 blocks have non-zero weights
+        for block_size, density_threshold in [(None, 0.3), ((4, 4), 0.9)]:
+            model, mask_out = self._prune(0.9)
+            ms = SparseModelSpeedup(model, MASK_FILE, density_threshold=density_threshold,
+                                    layer_density_thresholds={'conv1': 0.}, block_size=block_size)
+            ms.speedup_model()
+            assert ms.replaced_modules == ['conv2', 'fc1', 'fc2']
+            assert isinstance(model.conv1, nn.Conv2d)
+            assert isinstance(model.conv2, SparseConv2d)
+            assert isinstance(model.fc1, SparseLinear)
+            assert torch.allclose(mask_out, model(dummy_input), atol=1e-5)
+
+    def test_sparse_speedup_density_threshold(self):
+        model, mask_out = self._prune(0.5)
+        ms = SparseModelSpeedup(model, MASK_FILE, density_threshold=0.3)
+        ms.speedup_model()
+        assert not ms.replaced_modules
+        assert all(abs(density - 0.5) < 0.01 for density in ms.densities.values())
+        assert torch.equal(mask_out, model(dummy_input))
+
+    def tearDown(self):
+        os.remove(MODEL_FILE)
+        os.remove(MASK_FILE)
+
+
+class QuantizedSpeedupTestCase(TestCase):
+    def test_quantized_speedup(self):
+        model = BackboneModel2()
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+        config_list = [{'quant_types': ['weight', 'output'], 'quant_bits': 8, 'op_types': ['Conv2d', 'Linear']}]
+        quantizer = QAT_Quantizer(model, config_list, optimizer, dummy_input)
+        quantizer.compress()
+        for _ in range(3):
+            optimizer.zero_grad()
+            F.cross_entropy(model(torch.randn(8, 1, 28, 28)), torch.randint(0, 10, (8,))).backward()
+            optimizer.step()
+        # quantize the weights after the last update
+        model(torch.randn(8, 1, 28, 28))
+        model.eval()
+        qat_out = model(dummy_input)
+        quantizer.export_model(MODEL_FILE, CALIBRATION_FILE)
+
+        model = BackboneModel2()
+        model.load_state_dict(torch.load(MODEL_FILE))
+        ms = QuantizedModelSpeedup(model, CALIBRATION_FILE)
+        ms.speedup_model()
+        assert ms.replaced_modules == {'conv1': 'Conv2d', 'conv2': 'Conv2d', 'fc1': 'Linear', 'fc2': 'Linear'}
+        assert ms.folded_bn_modules == ['bn1', 'bn2']
+        assert isinstance(model.bn1, nn.Identity)
+        assert isinstance(model.conv1, QuantizedModule)
+        assert isinstance(model.conv1.module, torch.nn.quantized.Conv2d)
+        assert isinstance(model.fc2.module, torch.nn.quantized.Linear)
+        # the inputs are quantized in inference, which are not in quantization aware training
+        assert (model(dummy_input) - qat_out).abs().max() < 0.05 * qat_out.abs().max()
+
+    def test_quantized_speedup_weight_only(self):
+        # the 8-bit weights of DoReFa can not be represented by int8, and are kept in float
+        for bits, linear_type in [(4, 'DynamicLinear'), (8, 'Float')]:
+            model = BackboneModel2()
+            config_list = [{'quant_types': ['weight'], 'quant_bits': bits, 'op_types': ['Conv2d', 'Linear']}]
+            quantizer = DoReFaQuantizer(model, config_list)
+            quantizer.compress()
+            quantizer.export_model(MODEL_FILE, CALIBRATION_FILE)
+
+            model = BackboneModel2()
+            model.load_state_dict(torch.load(MODEL_FILE))
+            model.eval()
+            float_out = model(dummy_input)
+            ms = QuantizedModelSpeedup(model, CALIBRATION_FILE)
+            ms.speedup_model()
+            assert ms.replaced_modules == {'conv1': 'Float', 'conv2': 'Float', 'fc1': linear_type, 'fc2': linear_type}
+            assert not ms.folded_bn_modules
+            assert (model(dummy_input) - float_out).abs().max() < 0.05 * float_out.abs().max()
+
+    def tearDown(self):
+        os.remove(MODEL_FILE)
+        os.remove(CALIBRATION_FILE)
+
+
 if __name__ == '__main__':
     main()
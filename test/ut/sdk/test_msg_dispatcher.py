@@ -2,6 +2,9 @@
 # Licensed under the MIT license.
 
 import json
+import os
+import shutil
+import tempfile
 from io import BytesIO
 from unittest import TestCase, main
 
@@ -37,6 +40,21 @@ class NaiveTuner(Tuner):
     def update_search_space(self, search_space):
         self.search_space = search_space
 
+    def import_data(self, data):
+        for entry in data:
+            self.trial_results.append((None, entry['parameter']['param'], extract_scalar_reward(entry['value']), None))
+
+    def load_checkpoint(self):
+        state = self._load_state()
+        if state is None:
+            return False
+        self.param = state['param']
+        self.trial_results = [tuple(result) for result in state['trial_results']]
+        return True
+
+    def save_checkpoint(self):
+        self._save_state({'param': self.param, 'trial_results': self.trial_results})
+
 
 _in_buf = BytesIO()
 _out_buf = BytesIO()
@@ -84,6 +102,45 @@ class MsgDispatcherTestCase(TestCase):
 
         self.assertEqual(len(_out_buf.read()), 0)  # no more commands
 
+    def test_resume_from_checkpoint(self):
+        _reverse_io()  # commands sent by dispatcher are written to Tuner's incoming stream and discarded
+        checkpoint_dir = tempfile.mkdtemp()
+        os.environ['NNI_CHECKPOINT_DIRECTORY'] = checkpoint_dir
+        dispatchers = []
+        try:
+            tuner = NaiveTuner()
+            dispatcher = MsgDispatcher(tuner)
+            dispatchers.append(dispatcher)
+            dispatcher.handle_request_trial_jobs(2)
+            dispatcher.process_command(CommandType.ReportMetricData,
+                                       {'parameter_id': 0, 'trial_job_id': 'A', 'type': 'FINAL', 'value': '10'})
+            dispatcher.handle_import_data([{'parameter': {'param': 100}, 'value': '1'}])
+            dispatcher.save_checkpoint()
+
+            tuner = NaiveTuner()
+            dispatcher = MsgDispatcher(tuner)
+            dispatchers.append(dispatcher)
+            dispatcher.load_checkpoint()
+            self.assertEqual(tuner.param, 4)
+            self.assertEqual(tuner.trial_results, [(0, 2, 10, False), (None, 100, 1, None)])
+            # on resume, finished trials and imported data are sent again, only new records should reach tuner
+            dispatcher.handle_import_data([
+                {'parameter': {'param': 2}, 'value': '10', 'trialJobId': 'A'},
+                {'parameter': {'param': 4}, 'value': '12', 'trialJobId': 'B'},
+                {'parameter': {'param': 100}, 'value': '1'}
+            ])
+            self.assertEqual(tuner.trial_results[2:], [(None, 4, 12, None)])
+        finally:
+            # the command queue workers are started with the dispatchers, which are never run in this test
+            for dispatcher in dispatchers:
+                dispatcher.stopping = True
+                dispatcher.default_worker.join()
+                dispatcher.assessor_worker.join()
+            del os.environ['NNI_CHECKPOINT_DIRECTORY']
+            shutil.rmtree(checkpoint_dir)
+            _in_buf.seek(0)
+            _in_buf.truncate()
+
     def _assert_params(self, parameter_id, param, trial_results, search_space):
         command, data = receive()
         self.assertIs(command, CommandType.NewTrialJob)
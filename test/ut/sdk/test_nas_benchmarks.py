@@ -0,0 +1,139 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+
+import numpy as np
+from playhouse.sqlite_ext import SqliteExtDatabase
+
+from nni.nas.benchmarks.bulk_loader import BulkLoader, produce_records
+from nni.nas.benchmarks.columnar import ColumnarBenchmark, export_columnar
+from nni.nas.benchmarks.nasbench201 import Nb201TrialConfig, Nb201TrialStats, Nb201IntermediateStats
+import nni.nas.benchmarks.nasbench201.query as nb201_query
+
+MODELS = [Nb201TrialConfig, Nb201TrialStats, Nb201IntermediateStats]
+
+
+def _arch(index):
+    ops = ['none', 'skip_connect', 'conv_1x1', 'conv_3x3', 'avg_pool_3x3']
+    return {'0_1': ops[index % 5], '0_2': ops[index // 5 % 5], '1_2': 'conv_3x3'}
+
+
+def _config_records(index):
+    trials = [(Nb201TrialStats, {'seed': seed, 'train_acc': 1., 'valid_acc': 1., 'test_acc': 1., 'ori_test_acc': 1.,
+                                 'parameters': 1., 'latency': 1., 'flops': 1., 'training_time': 1.,
+                                 'valid_evaluation_time': 1., 'test_evaluation_time': 1., 'ori_test_evaluation_time': 1.},
+               [(Nb201IntermediateStats, {'current_epoch': epoch, 'train_acc': float(seed)}, None) for epoch in [1, 2]])
+              for seed in range(2)]
+    return [(Nb201TrialConfig, {'arch': _arch(index % 5), 'num_epochs': 200, 'num_channels': 16, 'num_cells': 5,
+                                'dataset': 'cifar100'}, trials)]
+
+
+class NasBenchmarksTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = SqliteExtDatabase(os.path.join(self.tmp_dir, 'nasbench201.db'))
+        self.bind = self.db.bind_ctx(MODELS)
+        self.bind.__enter__()
+        self.db.create_tables(MODELS)
+        for index in range(10):
+            for dataset in ['cifar10-valid', 'cifar100']:
+                config = Nb201TrialConfig.create(arch=_arch(index), num_epochs=200, num_channels=16,
+                                                 num_cells=5, dataset=dataset)
+                for seed in range(2):
+                    trial = Nb201TrialStats.create(
+                        config=config, seed=seed, train_acc=index + seed, valid_acc=index * 2.0,
+                        test_acc=50.0 + seed, ori_test_acc=40.0, train_loss=None if seed else 1.5,
+                        valid_loss=0.5, test_loss=0.25, ori_test_loss=0.75, parameters=0.1 * index,
+                        latency=1.0, flops=10.0, training_time=100.0, valid_evaluation_time=1.0,
+                        test_evaluation_time=1.0, ori_test_evaluation_time=1.0)
+                    for epoch in [100, 200]:
+                        Nb201IntermediateStats.create(trial=trial, current_epoch=epoch, train_acc=float(epoch),
+                                                      valid_acc=None, test_loss=0.5)
+
+    def tearDown(self):
+        self.bind.__exit__(None, None, None)
+        self.db.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _query_both(self, *args, **kwargs):
+        expected = list(nb201_query.query_nb201_trial_stats(*args, **kwargs))
+        nb201_query.DATABASE_BACKEND = 'columnar'
+        try:
+            actual = list(nb201_query.query_nb201_trial_stats(*args, **kwargs))
+        finally:
+            nb201_query.DATABASE_BACKEND = 'sqlite'
+        return expected, actual
+
+    def test_columnar_query(self):
+        path = os.path.join(self.tmp_dir, 'nasbench201.columnar')
+        export_columnar(*MODELS, path)
+        benchmark = ColumnarBenchmark(path)
+        load_columnar = nb201_query.load_columnar
+        nb201_query.load_columnar = lambda name: benchmark
+        try:
+            for args in [(_arch(3), 200, 'cifar100'), (_arch(3), None, None), (None, 200, 'cifar10-valid'),
+                         (_arch(42), 200, None), (None, None, None)]:
+                for reduction in [None, 'mean']:
+                    expected, actual = self._query_both(*args, reduction=reduction)
+                    self.assertEqual(expected, actual)
+                expected, actual = self._query_both(*args, include_intermediates=True)
+                self.assertEqual(expected, actual)
+            self.assertEqual(len(actual), 40)
+
+            expected, actual = self._query_both(None, 200, None, include_intermediates=True,
+                                                intermediates_as_arrays=True)
+            self.assertEqual(len(expected), len(actual))
+            for expected_trial, actual_trial in zip(expected, actual):
+                self.assertEqual(expected_trial['intermediates'].keys(), actual_trial['intermediates'].keys())
+                for key, value in expected_trial['intermediates'].items():
+                    np.testing.assert_array_equal(value, actual_trial['intermediates'][key])
+        finally:
+            nb201_query.load_columnar = load_columnar
+
+    def test_query_intermediates(self):
+        trials = list(nb201_query.query_nb201_trial_stats(None, None, None, include_intermediates=True))
+        curves = list(nb201_query.query_nb201_trial_stats(None, None, None, include_intermediates=True,
+                                                          intermediates_as_arrays=True))
+        self.assertEqual(len(trials), 40)
+        for trial, curve in zip(trials, curves):
+            self.assertEqual(trial['intermediates'], list(Nb201IntermediateStats.select(
+                *[f for f in Nb201IntermediateStats._meta.sorted_fields if f.name != 'trial']
+            ).where(Nb201IntermediateStats.trial == trial['id']).dicts()))
+            self.assertEqual(curve['intermediates']['current_epoch'].tolist(), [100, 200])
+            self.assertEqual(curve['intermediates']['train_acc'].tolist(), [100., 200.])
+            self.assertTrue(np.isnan(curve['intermediates']['valid_acc']).all())
+        for trial in nb201_query.query_nb201_trial_stats(_arch(1), None, None, reduction='mean',
+                                                         include_intermediates=True):
+            self.assertEqual(trial['intermediates'], [])
+
+    def test_bulk_loader(self):
+        db = SqliteExtDatabase(os.path.join(self.tmp_dir, 'bulk.db'))
+        unique_fields = {Nb201TrialConfig: ['arch', 'num_epochs', 'dataset']}
+        with db.bind_ctx(MODELS):
+            with BulkLoader(db, MODELS, unique_fields=unique_fields, batch_size=7) as loader:
+                loader.insert_records(produce_records(_config_records, range(10), num_workers=2))
+                # existing configs are looked up by unique fields
+                self.assertEqual(loader.insert(Nb201TrialConfig, {'arch': _arch(3), 'num_epochs': 200,
+                                                                  'dataset': 'cifar100'}), 4)
+                self.assertEqual(loader.lookup(Nb201TrialConfig, {'arch': _arch(3), 'num_epochs': 200,
+                                                                  'dataset': 'cifar100'}), 4)
+                with self.assertRaises(KeyError):
+                    loader.lookup(Nb201TrialConfig, {'arch': _arch(3), 'num_epochs': 12, 'dataset': 'cifar100'})
+            self.assertEqual(db.pragma('journal_mode'), 'delete')
+            self.assertIn('nb201trialstats_config_id', [index.name for index in db.get_indexes('nb201trialstats')])
+            self.assertEqual(Nb201TrialConfig.select().count(), 5)
+            self.assertEqual(Nb201TrialStats.select().count(), 20)
+            self.assertEqual(Nb201IntermediateStats.select().count(), 40)
+            for config in Nb201TrialConfig.select():
+                self.assertEqual(config.trial_stats.count(), 4)
+                for trial in config.trial_stats:
+                    self.assertEqual([t.train_acc for t in trial.intermediates], [float(trial.seed)] * 2)
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,23 @@
 # Licensed under the MIT license.
 
 import json
+import shutil
+import tempfile
 from unittest import TestCase, main
 from copy import deepcopy
+import numpy as np
 import torch
 
+from schema import SchemaError
+
 from nni.algorithms.hpo.networkmorphism_tuner import NetworkMorphismTuner
+from nni.algorithms.hpo.networkmorphism_tuner.networkmorphism_tuner import NetworkMorphismClassArgsValidator
+from nni.algorithms.hpo.networkmorphism_tuner.bayesian import (
+    EditDistanceCache,
+    contain,
+    edit_distance,
+    edit_distance_matrix,
+)
 from nni.algorithms.hpo.networkmorphism_tuner.graph import graph_to_json, json_to_graph
 from nni.algorithms.hpo.networkmorphism_tuner.graph_transformer import (
     to_deeper_graph,
@@ -14,6 +26,7 @@ from nni.algorithms.hpo.networkmorphism_tuner.graph_transformer import (
     to_wider_graph,
 )
 from nni.algorithms.hpo.networkmorphism_tuner.layers import layer_description_extractor
+from nni.algorithms.hpo.networkmorphism_tuner.model_store import ModelStore
 from nni.algorithms.hpo.networkmorphism_tuner.nn import CnnGenerator
 
 
@@ -183,6 +196,85 @@ class NetworkMorphismTestCase(TestCase):
         tuner.add_model(0.9, 1)
         self.assertEqual(tuner.get_best_model_id(), 1)
 
+    def test_edit_distance_matrix(self):
+        """ unittest for the cached edit-distance matrix
+        """
+        graph_init = CnnGenerator(10, (32, 32, 3)).generate()
+        graphs = [graph_init, to_wider_graph(deepcopy(graph_init)), to_deeper_graph(deepcopy(graph_init))]
+        graphs.append(to_skip_connection_graph(deepcopy(graphs[2])))
+        descriptors = np.array([graph.extract_descriptor() for graph in graphs])
+
+        cache = EditDistanceCache()
+        distance_matrix = edit_distance_matrix(descriptors, cache=cache)
+        for i, x in enumerate(descriptors):
+            for j, y in enumerate(descriptors):
+                expected = 0 if i == j else edit_distance(x, y)
+                self.assertAlmostEqual(distance_matrix[i][j], expected)
+        # the second computation is served from the cache
+        self.assertTrue(np.allclose(edit_distance_matrix(descriptors[:2], descriptors, cache), distance_matrix[:2]))
+
+        self.assertTrue(contain(list(descriptors[:2]), graphs[1].extract_descriptor(), cache))
+        self.assertFalse(contain(list(descriptors[:2]), descriptors[3], cache))
+        self.assertFalse(contain([], descriptors[0], cache))
+
+    def test_parallel_generate(self):
+        """ unittest for generating with a pool of processes and a time budget
+        """
+        path = tempfile.mkdtemp()
+        for kwargs in [{"generate_workers": 2}, {"generate_time_budget": 0.}]:
+            tuner = NetworkMorphismTuner(path=path, t_min=0.1, **kwargs)
+            for parameter_id in range(3):
+                tuner.generate_parameters(parameter_id)
+                tuner.receive_trial_result(parameter_id, {}, 0.1 * parameter_id)
+            graph, father_id = tuner.bo.generate(tuner.descriptors)
+            self.assertIn(father_id, range(3))
+            self.assertFalse(contain(tuner.descriptors, graph.extract_descriptor()))
+            # the processes and the files of the model store are closed when the experiment exits
+            tuner._on_exit()
+            self.assertIsNone(tuner.bo.pool)
+            self.assertTrue(tuner.model_store.data_file.closed and tuner.model_store.index_file.closed)
+        shutil.rmtree(path)
+
+    def test_class_args(self):
+        """ unittest for validating the class arguments
+        """
+        validator = NetworkMorphismClassArgsValidator()
+        validator.validate_class_args(generate_workers=2, generate_time_budget=10)
+        validator.validate_class_args(generate_time_budget=2.5)
+        with self.assertRaises(SchemaError):
+            validator.validate_class_args(generate_time_budget=-1)
+
+    def test_model_store(self):
+        """ unittest for storing graphs as deltas of their fathers
+        """
+        path = tempfile.mkdtemp()
+        graphs = [CnnGenerator(10, (32, 32, 3)).generate()]
+        for transform in [to_wider_graph, to_deeper_graph, to_skip_connection_graph, to_deeper_graph, to_wider_graph]:
+            graphs.append(transform(deepcopy(graphs[-1])))
+        # not a morphism of its father
+        graphs.append(CnnGenerator(10, (32, 32, 3)).generate())
+        expected = [json.dumps(graph.produce_json_model()) for graph in graphs]
+
+        store = ModelStore(path, cache_size=2, snapshot_interval=3)
+        for model_id, graph in enumerate(graphs):
+            store.add(model_id, graph, model_id - 1)
+        self.assertEqual([store.index[model_id][2:] for model_id in range(len(graphs))],
+                         [(-1, 0), (0, 1), (1, 2), (2, 3), (-1, 0), (4, 1), (-1, 0)])
+        store.cache.clear()
+        for model_id in reversed(range(len(graphs))):
+            self.assertEqual(json.dumps(store.get(model_id).produce_json_model()), expected[model_id])
+        self.assertEqual(len(store.cache), 2)
+        # the returned graph is a copy
+        store.get(3).clear_operation_history()
+        self.assertEqual(json.dumps(store.get(3).produce_json_model()), expected[3])
+        store.close()
+
+        store = ModelStore(path, append=True)
+        self.assertEqual(len(store), len(graphs))
+        self.assertEqual(json.dumps(store.get(5).produce_json_model()), expected[5])
+        store.close()
+        shutil.rmtree(path)
+
 
 if __name__ == "__main__":
     main()
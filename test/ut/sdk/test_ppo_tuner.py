@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import threading
+import time
+from unittest import TestCase, main, skipIf
+
+import numpy as np
+
+try:
+    from nni.algorithms.hpo.ppo_tuner import PPOTuner
+except ImportError:
+    PPOTuner = None
+
+
+class FakePPOModel:
+    """ Generates ``i % 3`` as the action of the ``i``-th trial, and blocks training until ``release`` is set. """
+
+    def __init__(self, nsteps):
+        self.nsteps = nsteps
+        self.inferences = 0
+        self.cur_update = 1
+        self.trained = []
+        self.release = threading.Event()
+
+    def inference(self, num):
+        actions = np.asarray([[(self.inferences * num + i) % 3 for i in range(num)] for _ in range(self.nsteps)])
+        self.inferences += 1
+        zeros = np.zeros((self.nsteps, num), dtype=np.float32)
+        dones = np.ones((self.nsteps, num), dtype=bool)
+        return actions, actions, zeros, zeros, dones, np.zeros(num, dtype=np.float32)
+
+    def compute_rewards(self, trials_info, trials_result):
+        pass
+
+    def train(self, trials_info, nenvs):
+        assert self.release.wait(10)
+        self.trained.append(list(trials_info.results))
+
+    def get_weights(self):
+        return [np.asarray(len(self.trained))]
+
+
+@skipIf(PPOTuner is None, 'dependencies of PPOTuner are not installed')
+class PPOTunerTestCase(TestCase):
+    def _create_tuner(self, max_pending_batches):
+        search_space = {'layer': {'_type': 'layer_choice', '_value': ['a', 'b', 'c']}}
+        tuner = PPOTuner('maximize', trials_per_update=2, minibatch_size=1, max_pending_batches=max_pending_batches)
+        # the model is replaced, so the search space is processed without building the policy network
+        tuner.search_space = search_space
+        tuner.actions_spaces, tuner.actions_to_config, tuner.full_act_space, _, nsteps = \
+            tuner._process_nas_space(search_space)
+        tuner.model = FakePPOModel(nsteps)
+        return tuner
+
+    def _wait_training(self, tuner):
+        for _ in range(100):
+            with tuner.lock:
+                if tuner.training_batches == 0:
+                    return
+            time.sleep(0.1)
+        self.fail('training is not finished')
+
+    def test_pending_batches(self):
+        tuner = self._create_tuner(max_pending_batches=2)
+        sent = []
+        tuner.model.release.clear()
+        params = tuner.generate_multiple_parameters(list(range(5)), st_callback=lambda *args: sent.append(args))
+        # two batches of two trials are pending, the fifth request waits for a model update
+        self.assertEqual([p['layer']['_value'] for p in params], ['a', 'b', 'c', 'a'])
+        self.assertEqual(tuner.model.inferences, 2)
+        self.assertEqual(tuner.credit, 1)
+
+        # results of the first batch arrive out of order
+        tuner.receive_trial_result(1, params[1], 1.)
+        tuner.receive_trial_result(0, params[0], 2.)
+        # the first batch is training, no more batch can be generated before it finishes
+        self.assertEqual(tuner.training_batches, 1)
+        self.assertEqual(tuner.model.inferences, 2)
+        self.assertEqual(sent, [])
+
+        # the failed trial is assigned with the mean result of its batch
+        tuner.receive_trial_result(3, params[3], 4.)
+        tuner.trial_end(2, False)
+        self.assertEqual(tuner.training_batches, 2)
+        self.assertEqual(sent, [])
+
+        tuner.model.release.set()
+        self._wait_training(tuner)
+        # the batches are trained in order, with the results ordered by the trials
+        self.assertEqual(tuner.model.trained, [[2., 1.], [4., 4.]])
+        self.assertEqual(tuner.model.inferences, 3)
+        self.assertEqual(sent, [(4, {'layer': {'_value': 'b', '_idx': 1}})])
+        self.assertEqual(tuner.credit, 0)
+        self.assertEqual(tuner.timings['train']['count'], 2)
+
+    def test_single_pending_batch(self):
+        tuner = self._create_tuner(max_pending_batches=1)
+        sent = []
+        tuner.model.release.set()
+        params = tuner.generate_multiple_parameters(list(range(3)), st_callback=lambda *args: sent.append(args))
+        self.assertEqual(len(params), 2)
+        self.assertEqual(tuner.credit, 1)
+
+        tuner.receive_trial_result(0, params[0], 1.)
+        self.assertEqual(sent, [])
+        tuner.receive_trial_result(1, params[1], 3.)
+        self._wait_training(tuner)
+        self.assertEqual(tuner.model.trained, [[1., 3.]])
+        self.assertEqual([param_id for param_id, _ in sent], [2])
+
+    def test_checkpoint_after_training(self):
+        tuner = self._create_tuner(max_pending_batches=2)
+        tuner.model.release.clear()
+        params = tuner.generate_multiple_parameters(list(range(2)), st_callback=lambda *args: None)
+        tuner.receive_trial_result(0, params[0], 1.)
+        tuner.receive_trial_result(1, params[1], 2.)
+        self.assertEqual(tuner.training_batches, 1)
+
+        states = []
+        tuner._save_state = states.append
+        saver = threading.Thread(target=tuner.save_checkpoint)
+        saver.start()
+        # the checkpoint waits for the training, without blocking the tuner
+        saver.join(0.5)
+        self.assertTrue(saver.is_alive())
+        with tuner.lock:
+            self.assertEqual(states, [])
+        tuner.model.release.set()
+        saver.join(10)
+        self.assertFalse(saver.is_alive())
+        self.assertEqual(states[0]['weights'][0], 1)
+        self.assertEqual(states[0]['batches'], [])
+
+
+if __name__ == '__main__':
+    main()
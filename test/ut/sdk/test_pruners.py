@@ -1,14 +1,18 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import copy
 import os
+import random
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.utils.data
 import math
 import sys
+import tempfile
 import unittest
+import numpy as np
 from unittest import TestCase, main
 from nni.algorithms.compression.pytorch.pruning import LevelPruner, SlimPruner, FPGMPruner, L1FilterPruner, \
     L2FilterPruner, AGPPruner, ActivationMeanRankFilterPruner, ActivationAPoZRankFilterPruner, \
@@ -304,6 +308,80 @@ class PrunerTestCase(TestCase):
             prune_config['agp']['config_list'][0]['op_types'] = ['default']
             _test_agp(pruning_algorithm)
 
+    def test_simulated_annealing_pruner(self):
+        calls = []
+        def evaluator(model):
+            calls.append(1)
+            # prefer pruning the first conv
+            return -sum(wrapper.module.weight.abs().sum().item() * (i + 1)
+                        for i, wrapper in enumerate(model.modules()) if hasattr(wrapper, 'weight_mask'))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pruner = SimulatedAnnealingPruner(Model(), prune_config['simulatedannealing']['config_list'], evaluator,
+                                              stop_temperature=60, num_perturbations=2, experiment_data_dir=tmp_dir,
+                                              cache_decimals=3)
+            pruner.compress()
+            # the perturbations after the accepted one are not recorded
+            assert len(pruner._search_history) <= sum(timing['perturbations'] for timing in pruner._iteration_timings)
+            assert len(calls) == sum(timing['evaluations'] for timing in pruner._iteration_timings)
+            assert len(pruner._iteration_timings) == 5
+            assert os.path.exists(os.path.join(tmp_dir, 'search_timings.csv'))
+
+            # the sparsities equal after rounding are evaluated once
+            calls.clear()
+            pruner._evaluation_cache.clear()
+            config_list = [{'sparsity': 0.5, 'op_types': ['Conv2d'], 'op_names': ['conv1']}]
+            results, evaluations = pruner._evaluate_perturbations([([0.5001], config_list), ([0.4999], config_list)])
+            assert evaluations == 1 and len(calls) == 1 and results[0] == results[1]
+            assert pruner._evaluate_perturbations([([0.5], config_list)]) == (results[:1], 0)
+
+            # the perturbations evaluated in processes are accepted as if they were evaluated serially
+            model = nn.Sequential(nn.Conv2d(1, 8, 3), nn.ReLU(), nn.Conv2d(8, 16, 3))
+            results = []
+            for num_workers in [1, 2]:
+                np.random.seed(0)
+                pruner = SimulatedAnnealingPruner(copy.deepcopy(model), [{'sparsity': 0.5, 'op_types': ['Conv2d']}], evaluator,
+                                                  stop_temperature=60, experiment_data_dir=tmp_dir,
+                                                  num_perturbations=3, num_workers=num_workers)
+                config_list = pruner.compress(return_config_list=True)
+                results.append((config_list, [item['performance'] for item in pruner._search_history]))
+            assert results[0] == results[1]
+
+    def test_net_adapt_pruner(self):
+        def short_term_fine_tuner(model):
+            # a random update, which is reproducible with the random states seeded for each layer
+            with torch.no_grad():
+                for param in model.parameters():
+                    param.add_(torch.randn_like(param) * 0.01)
+
+        def evaluator(model):
+            return -sum(module.weight.abs().sum().item() for module in model.modules() if isinstance(module, nn.Conv2d))
+
+        # the layers evaluated in processes are compared as if they were evaluated serially
+        model = nn.Sequential(nn.Conv2d(1, 8, 3), nn.ReLU(), nn.Conv2d(8, 16, 3))
+        results = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for num_workers in [1, 2]:
+                random.seed(0)
+                numpy_state, torch_state = np.random.get_state(), torch.get_rng_state()
+                pruner = NetAdaptPruner(copy.deepcopy(model), [{'sparsity': 0.3, 'op_types': ['Conv2d']}],
+                                        short_term_fine_tuner, evaluator, sparsity_per_iteration=0.1,
+                                        experiment_data_dir=tmp_dir, num_workers=num_workers)
+                pruner.compress()
+                # the random states of the caller are not changed by the layers, only the base seed is drawn
+                python_value = random.random()
+                random.seed(0)
+                random.randrange(1 << 31)
+                assert python_value == random.random()
+                assert np.array_equal(np.random.get_state()[1], numpy_state[1])
+                assert torch.equal(torch.get_rng_state(), torch_state)
+                results.append((pruner._config_list_generated, pruner._final_performance,
+                                {k: v.clone() for k, v in pruner.bound_model.state_dict().items()}))
+            assert sorted(os.listdir(tmp_dir)) == ['search_result.json']
+        assert results[0][:2] == results[1][:2]
+        for k, v in results[0][2].items():
+            assert torch.equal(v, results[1][2][k])
+
     def testAMC(self):
         model = MobileNet(n_class=10)
 
@@ -4,7 +4,7 @@
 from unittest import TestCase, main
 
 import nni
-from nni.utils import split_index
+from nni.utils import split_import_data, split_index
 
 
 class UtilsTestCase(TestCase):
@@ -83,6 +83,21 @@ class UtilsTestCase(TestCase):
         params = split_index(nested_params_with_index)
         self.assertEqual(params, nested_params)
 
+    def test_split_index_list(self):
+        params_with_index = {"layers": [{"_index": 1, "_value": {"units": {"_index": 0, "_value": 32}}}, 3]}
+        self.assertEqual(split_index(params_with_index), {"layers": [{"units": 32}, 3]})
+
+    def test_split_import_data(self):
+        data = [
+            {"parameter": {"x": 1}, "value": 0.5},
+            {"parameter": {"x": 2}, "value": {"default": 0.6, "loss": 1.2}},
+            {"parameter": {"x": 3}, "value": None},
+            {"parameter": {"x": 4}, "value": {"default": 0.8}, "trialJobId": "abc"}
+        ]
+        parameters, rewards = split_import_data(data)
+        self.assertEqual(parameters, [{"x": 1}, {"x": 2}, {"x": 4}])
+        self.assertEqual(rewards, [0.5, 0.6, 0.8])
+
 
 if __name__ == '__main__':
     main()